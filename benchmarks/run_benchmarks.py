@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks/run_benchmarks.py
+规模基准测试：在合成 WoS 语料（synthetic_wos.py）上逐阶段计时
+阶段：cleaning / graph / d_index / pair_timeline / novelty / similarity / td / entropy
+- 每个 (规模, 阶段) 在独立子进程中运行：前置阶段先计算（不计时），
+  再测目标阶段的耗时、峰值内存（RSS）与吞吐量（论文/秒），互不干扰峰值内存
+- 结果写入 benchmarks/results/<时间戳>.json；--check 与 baselines.json 比较，
+  超出容差即视为性能回退并以非零状态退出；--update-baselines 用本次结果更新基线
+用法：
+  python benchmarks/run_benchmarks.py --sizes 10k 100k
+  python benchmarks/run_benchmarks.py --sizes 10k --check
+  python benchmarks/run_benchmarks.py --sizes 1m 10m --stages graph d_index   # 大内存机器
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(BENCH_DIR) not in sys.path:
+    sys.path.insert(0, str(BENCH_DIR))
+
+from synthetic_wos import RAW_COLUMNS, GENERATOR_VERSION, parse_size, require_pyarrow, size_label, write_corpus
+
+DATA_DIR = BENCH_DIR / 'data'
+RESULTS_DIR = BENCH_DIR / 'results'
+BASELINES_PATH = BENCH_DIR / 'baselines.json'
+
+DEFAULT_SIZES = ['10k', '100k']
+DEFAULT_TIME_TOLERANCE = 0.25    # 耗时超出基线 25% 视为回退
+DEFAULT_MEMORY_TOLERANCE = 0.20  # 峰值内存超出基线 20% 视为回退
+MIN_SECONDS = 0.2                # 低于该耗时的阶段只比较内存（计时噪声过大）
+MIN_MEMORY_MB = 16               # 峰值内存增量低于该值时不比较
+
+# 阶段 → (前置步骤, 计时对象的论文表: raw / background / target)；前置步骤为 StageContext.run_<名称>
+STAGES = {
+    'cleaning': ((), 'raw'),
+    'graph': ((), 'background'),
+    'd_index': (('graph',), 'target'),
+    'pair_timeline': ((), 'background'),
+    'novelty': (('pair_timeline',), 'target'),
+    'similarity': ((), 'background'),
+    'td': (('similarity',), 'target'),
+    'entropy': (('topic_analyzer',), 'target'),
+}
+
+def log(msg):
+    print(f"[bench] {msg}", flush=True)
+
+# ============================================================================
+#  峰值内存
+# ============================================================================
+def reset_peak_rss():
+    """重置进程的峰值 RSS（Linux: /proc/self/clear_refs），不支持时返回 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """进程峰值 RSS（MB）；优先 /proc 的 VmHWM（可重置），否则 getrusage（进程生命周期内的峰值）"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+# ============================================================================
+#  数据集
+# ============================================================================
+def dataset_dir(n):
+    return DATA_DIR / f"wos_{size_label(n)}"
+
+def ensure_dataset(n, seed=0):
+    """返回规模为 n 的合成语料目录；不存在或生成器版本变化时重新生成"""
+    out = dataset_dir(n)
+    meta_path = out / 'meta.json'
+    if meta_path.exists():
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('generator_version') == GENERATOR_VERSION and meta.get('seed') == seed:
+            return out, meta
+    log(f"生成合成语料 {size_label(n)} → {out}")
+    return out, write_corpus(out, n, seed=seed)
+
+# ============================================================================
+#  阶段实现（在子进程中运行）
+# ============================================================================
+def _analysis_config(section, output_key, output_dir):
+    """读取 config.json 的分析模块配置，输出目录改到临时目录"""
+    with open(PROJECT_ROOT / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)[section]
+    config['output'] = {**config.get('output', {}), output_key: str(output_dir)}
+    return config
+
+class StageContext:
+    """一个子进程内的输入数据与前置阶段产物"""
+
+    def __init__(self, data_dir, work_dir):
+        self.data_dir = Path(data_dir)
+        self.work_dir = Path(work_dir)
+        self.frames = {}
+        self.state = {}
+
+    def frame(self, name):
+        if name not in self.frames:
+            if name == 'raw':
+                import pandas as pd
+                self.frames[name] = pd.read_parquet(self.data_dir / 'raw.parquet')
+            else:
+                from python_analysis.columnar import load_cleaned
+                file = 'all_data.parquet' if name == 'background' else 'target_data.parquet'
+                self.frames[name] = load_cleaned(self.data_dir / file)
+        return self.frames[name]
+
+    # ---- 清洗 ----------------------------------------------------------
+    def run_cleaning(self):
+        from scripts.preprocess_wos_excel import clean_frame, deduplicate_records
+        field_mapping = {col: [col] for col in RAW_COLUMNS}
+        cleaning = {'drop_conference': True, 'conference_filter': {}, 'min_year': None, 'doi_workers': 1}
+        df = clean_frame(self.frame('raw'), field_mapping, set(RAW_COLUMNS), cleaning, verbose=False)
+        return deduplicate_records(df, verbose=False)
+
+    # ---- 颠覆性 --------------------------------------------------------
+    def disrupt_config(self):
+        return _analysis_config('disrupt', 'disrupt_dir', self.work_dir / 'disrupt')
+
+    def run_graph(self):
+        from python_analysis.disrupt_calculator import DisruptionIndexCalculator
+        calculator = DisruptionIndexCalculator(self.disrupt_config())
+        self.state['graph'] = calculator.build_citation_network(self.frame('background'))
+        return self.state['graph']
+
+    def run_d_index(self):
+        from python_analysis.disrupt_calculator import calculate_paper_scores
+        scores, _ = calculate_paper_scores(self.frame('background'), self.frame('target'), self.state['graph'])
+        return scores
+
+    # ---- 新颖性 --------------------------------------------------------
+    def novelty(self):
+        if 'novelty_analyzer' not in self.state:
+            from python_analysis.novelty_analyzer import NoveltyAnalyzer
+            config = _analysis_config('novelty', 'novelty_dir', self.work_dir / 'novelty')
+            self.state['novelty_analyzer'] = NoveltyAnalyzer(config)
+        analyzer = self.state['novelty_analyzer']
+        cols = analyzer.config['columns']
+        return analyzer, (cols['id'], cols['keywords'], cols['year']), cols['journal']
+
+    def run_pair_timeline(self):
+        analyzer, (id_col, keywords_col, year_col), _ = self.novelty()
+        self.state['pair_timeline'] = analyzer._build_pair_timeline(self.frame('background'), id_col,
+                                                                    keywords_col, year_col)
+        return self.state['pair_timeline']
+
+    def run_novelty(self):
+        analyzer, (id_col, keywords_col, year_col), journal_col = self.novelty()
+        return analyzer._calculate_target_novelty(self.frame('target'), self.state['pair_timeline'],
+                                                  id_col, journal_col, keywords_col, year_col)
+
+    # ---- 跨学科性（TD） ------------------------------------------------
+    def interdisciplinary(self):
+        if 'td_analyzer' not in self.state:
+            from python_analysis.interdisciplinary import InterdisciplinaryAnalyzer
+            config = _analysis_config('interdisciplinary', 'interdisciplinary_dir', self.work_dir / 'td')
+            self.state['td_analyzer'] = InterdisciplinaryAnalyzer(config)
+        return self.state['td_analyzer'], self.state['td_analyzer'].config['columns']
+
+    def run_similarity(self):
+        analyzer, cols = self.interdisciplinary()
+        self.state['knowledge'] = analyzer.build_knowledge_base(self.frame('background'), cols['id'],
+                                                                cols['category'])
+        return self.state['knowledge']
+
+    def run_td(self):
+        analyzer, cols = self.interdisciplinary()
+        knowledge = self.state['knowledge']
+        analyzer.load_knowledge_base(knowledge)
+        return analyzer.score_papers(self.frame('target'), knowledge['paper_categories'], cols['id'],
+                                     cols['journal'], cols['refs'])
+
+    # ---- 领域熵 --------------------------------------------------------
+    def run_topic_analyzer(self):
+        from python_analysis.topic_analyzer import InterdisciplinaryEntropyAnalyzer
+        config = _analysis_config('topic', 'topic_dir', self.work_dir / 'topic')
+        # 关键词 → 领域 映射不读写持久化缓存，每次运行的工作量相同
+        config['parameters'] = {**config.get('parameters', {}), 'keyword_cache_dir': None}
+        self.state['topic_analyzer'] = InterdisciplinaryEntropyAnalyzer(config)
+        return self.state['topic_analyzer']
+
+    def run_entropy(self):
+        analyzer = self.state['topic_analyzer']
+        cols = analyzer.config['columns']
+        return analyzer.paper_scores(self.frame('target'), cols['id'], cols['journal'])
+
+def run_worker(stage, data_dir):
+    """子进程入口：准备输入与前置阶段后，只测量目标阶段；结果以 JSON 打印到标准输出"""
+    prerequisites, table = STAGES[stage]
+    with tempfile.TemporaryDirectory(prefix='bench_') as work_dir:
+        context = StageContext(data_dir, work_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = len(context.frame(table))
+            for name in prerequisites:
+                getattr(context, f"run_{name}")()
+
+            import gc
+            gc.collect()
+            base_rss = current_rss_mb()
+            reset_peak_rss()
+            started = time.perf_counter()
+            getattr(context, f"run_{stage}")()
+            seconds = time.perf_counter() - started
+            peak = peak_rss_mb()
+    return {
+        'stage': stage,
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'throughput': round(rows / seconds, 1) if seconds > 0 else None,
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+        'rss_growth_mb': None if peak is None or base_rss is None else round(peak - base_rss, 1),
+    }
+
+# ============================================================================
+#  调度与回退检查
+# ============================================================================
+def run_stage(stage, data_dir, timeout=None):
+    """在独立子进程中运行一个阶段"""
+    cmd = [sys.executable, str(Path(__file__).resolve()), '--worker', stage, '--data', str(data_dir)]
+    try:
+        proc = subprocess.run(cmd, cwd=str(PROJECT_ROOT), capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'stage': stage, 'status': 'timeout', 'error': f"超过 {timeout} 秒"}
+    if proc.returncode != 0:
+        error = (proc.stderr or proc.stdout).strip().splitlines()
+        return {'stage': stage, 'status': 'failed', 'error': error[-1] if error else f"退出码 {proc.returncode}"}
+    return {**json.loads(proc.stdout.strip().splitlines()[-1]), 'status': 'ok'}
+
+def machine_info():
+    import numpy as np
+    import pandas as pd
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+def load_baselines(path=BASELINES_PATH):
+    if not Path(path).exists():
+        return {'sizes': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(results, baselines, time_tolerance=DEFAULT_TIME_TOLERANCE, memory_tolerance=DEFAULT_MEMORY_TOLERANCE):
+    """与基线比较，返回回退列表 [(规模, 阶段, 指标, 本次, 基线)]"""
+    regressions = []
+    for label, stages in results['sizes'].items():
+        for stage, record in stages.items():
+            base = baselines.get('sizes', {}).get(label, {}).get(stage)
+            if not base or record.get('status') != 'ok':
+                continue
+            if max(record['seconds'], base['seconds']) >= MIN_SECONDS \
+                    and record['seconds'] > base['seconds'] * (1 + time_tolerance):
+                regressions.append((label, stage, 'seconds', record['seconds'], base['seconds']))
+            now, before = record.get('rss_growth_mb'), base.get('rss_growth_mb')
+            if now is not None and before is not None and max(now, before) >= MIN_MEMORY_MB \
+                    and now > before * (1 + memory_tolerance):
+                regressions.append((label, stage, 'rss_growth_mb', now, before))
+    return regressions
+
+def format_table(results, baselines):
+    lines = [f"{'规模':<6}{'阶段':<15}{'行数':>10}{'耗时(s)':>10}{'基线(s)':>10}{'论文/秒':>12}"
+             f"{'峰值RSS(MB)':>13}{'增量(MB)':>10}  状态"]
+    for label, stages in results['sizes'].items():
+        for stage, r in stages.items():
+            base = baselines.get('sizes', {}).get(label, {}).get(stage, {})
+            if r.get('status') != 'ok':
+                lines.append(f"{label:<6}{stage:<15}{'':>10}{'':>10}{'':>10}{'':>12}{'':>13}{'':>10}  "
+                             f"{r.get('status')}: {r.get('error', '')}")
+                continue
+            lines.append(f"{label:<6}{stage:<15}{r['rows']:>10}{r['seconds']:>10.3f}"
+                         f"{base.get('seconds', float('nan')):>10.3f}{r['throughput'] or 0:>12.0f}"
+                         f"{r['peak_rss_mb'] or 0:>13.1f}{r['rss_growth_mb'] or 0:>10.1f}  ok")
+    return '\n'.join(lines)
+
+def run_suite(sizes, stages, seed=0, timeout=None):
+    results = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'machine': machine_info(),
+               'seed': seed, 'sizes': {}}
+    for label in sizes:
+        n = parse_size(label)
+        label = size_label(n)
+        data_dir, meta = ensure_dataset(n, seed)
+        results['sizes'][label] = {}
+        results.setdefault('datasets', {})[label] = meta['stats']
+        for stage in stages:
+            if stage == 'cleaning' and not (data_dir / 'raw.parquet').exists():
+                results['sizes'][label][stage] = {'stage': stage, 'status': 'skipped', 'error': '无 raw.parquet'}
+                continue
+            log(f"{label} / {stage} ...")
+            record = run_stage(stage, data_dir, timeout)
+            results['sizes'][label][stage] = record
+            if record['status'] == 'ok':
+                log(f"  {record['seconds']:.3f}s, {record['throughput']} 篇/秒, 峰值 {record['peak_rss_mb']} MB")
+            else:
+                log(f"  {record['status']}: {record.get('error')}")
+    return results
+
+def update_baselines(results, path=BASELINES_PATH):
+    """用本次成功的阶段结果覆盖基线中对应的 (规模, 阶段)"""
+    baselines = load_baselines(path)
+    baselines['machine'] = results['machine']
+    baselines['updated'] = results['timestamp']
+    for label, stages in results['sizes'].items():
+        target = baselines.setdefault('sizes', {}).setdefault(label, {})
+        for stage, record in stages.items():
+            if record.get('status') == 'ok':
+                target[stage] = {k: record[k] for k in ('rows', 'seconds', 'throughput', 'peak_rss_mb',
+                                                        'rss_growth_mb')}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    log(f"基线已更新: {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="合成 WoS 语料上的规模基准测试")
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="规模，如 10k 100k 1m 10m")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, help="单个阶段的超时（秒）")
+    parser.add_argument('--check', action='store_true', help="与 baselines.json 比较，出现回退时退出码为 1")
+    parser.add_argument('--time-tolerance', type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument('--update-baselines', action='store_true', help="用本次结果更新 baselines.json")
+    parser.add_argument('--worker', choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # 合成语料以 Parquet 存储：在生成数据、启动子进程之前检查
+    require_pyarrow()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.data)))
+        return 0
+
+    results = run_suite(args.sizes, args.stages, seed=args.seed, timeout=args.timeout)
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baselines = load_baselines()
+    print()
+    print(format_table(results, baselines))
+    log(f"结果: {out}")
+
+    status = 0
+    if args.check:
+        regressions = compare(results, baselines, args.time_tolerance, args.memory_tolerance)
+        for label, stage, metric, now, before in regressions:
+            log(f"回退: {label} / {stage} {metric} {now} > 基线 {before}")
+        if not regressions:
+            log("未发现性能回退")
+        status = 1 if regressions else 0
+    if args.update_baselines:
+        update_baselines(results)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
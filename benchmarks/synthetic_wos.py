@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks/synthetic_wos.py
+合成 WoS 语料生成器（用于规模基准测试）
+- 年份：按指数增长分布在 [start_year, end_year]，论文按年份排序
+- 期刊：Zipf 规模分布，每种期刊带 1~3 个相邻学科，论文继承期刊学科
+- 关键词：Zipf 词频，每篇 3~8 个；高频词中穿插领域词表词条，使领域熵有命中
+- 引文：只引用更早年份的论文，被引概率正比于 Pareto 适应度（重尾入度），
+  另有一部分引用指向语料外的 DOI；少量论文缺失 DOI
+同一 (规模, 种子) 总是生成相同的数据。输出三个 Parquet 文件：
+  all_data.parquet / target_data.parquet  清洗结果形态（load_cleaned 可直接读取）
+  raw.parquet                             WoS 导出形态（供清洗阶段计时），含会议论文与重复记录
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 分析模块可回退到 CSV，但合成语料只以 Parquet 写出
+    pa = pq = None
+
+def require_pyarrow():
+    """生成与读取合成语料都需要 pyarrow（见 requirements.txt），缺失时给出明确提示并退出"""
+    if pq is None:
+        sys.exit("[synthetic] 错误: 需要 pyarrow（pip install -r requirements.txt）")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from python_analysis.columnar import ParquetAppender
+
+TAXONOMY_PATH = PROJECT_ROOT / 'data' / 'taxonomy' / 'fos_dict.json'
+GENERATOR_VERSION = 1
+
+# 生成参数（均可通过 SyntheticWoS / write_corpus 的关键字参数覆盖）
+DEFAULT_SPEC = {
+    'start_year': 1990,
+    'end_year': 2024,
+    'growth_rate': 0.07,         # 年发文量增长率
+    'papers_per_journal': 500,   # 期刊数 ≈ 论文数 / 该值（至少 100 种）
+    'journal_zipf': 0.8,
+    'n_categories': 250,
+    'keyword_zipf': 1.05,
+    'keywords_per_paper': (3, 8),
+    'refs_mean': 25.0,           # 每篇参考文献数（对数正态）的均值
+    'refs_sigma': 0.6,
+    'external_ref_share': 0.3,   # 指向语料外 DOI 的引用比例
+    'fitness_alpha': 2.5,        # Pareto 适应度指数，越小入度越重尾
+    'citation_window': 10,       # 近期引用窗口（年）
+    'window_share': 0.8,         # 落在近期窗口内的语料内引用比例
+    'missing_doi_share': 0.03,
+    'target_journals': 10,       # 目标数据 = 发文量最多的若干期刊
+    'conference_share': 0.02,    # 原始数据中的会议论文比例
+    'duplicate_share': 0.01,     # 原始数据中的重复记录比例
+}
+
+CLEANED_COLUMNS = ['DOI', 'Source Title', 'Publication Year', 'Keywords', 'WoS Categories', 'citing',
+                   'Article Title']
+RAW_COLUMNS = ['DOI', 'Source Title', 'Publication Year', 'Keywords', 'WoS Categories', 'Cited References',
+               'Article Title']
+
+def log(msg):
+    print(f"[synthetic] {msg}")
+
+def parse_size(label):
+    """规模标签 → 论文数：10k / 100k / 1m / 10m / 2500"""
+    text = str(label).strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if scale > 1 else text
+    return int(float(number) * scale)
+
+def size_label(n):
+    for unit, scale in (('m', 1_000_000), ('k', 1_000)):
+        if n >= scale and n % scale == 0:
+            return f"{n // scale}{unit}"
+    return str(n)
+
+def _zipf_cdf(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+def _taxonomy_terms():
+    """领域词表中的全部词条（词表缺失时返回空列表）"""
+    if not TAXONOMY_PATH.exists():
+        return []
+    with open(TAXONOMY_PATH, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    fields = data.get('fields', data)
+    return sorted({term for terms in fields.values() for term in terms})
+
+# ============================================================================
+#  语料骨架：年份、期刊、学科、关键词词表、引文适应度
+# ============================================================================
+class SyntheticWoS:
+    """按规格生成合成语料；大规模时按块产出，内存占用与块大小成正比"""
+
+    def __init__(self, n_papers, seed=0, **spec):
+        unknown = set(spec) - set(DEFAULT_SPEC)
+        if unknown:
+            raise ValueError(f"未知的生成参数: {sorted(unknown)}")
+        self.n = int(n_papers)
+        self.seed = seed
+        self.spec = {**DEFAULT_SPEC, **spec}
+        self.rng = np.random.default_rng(seed)
+        self._build_skeleton()
+
+    def _build_skeleton(self):
+        spec, rng, n = self.spec, self.rng, self.n
+
+        # 年份：指数增长，排序后论文编号即时间顺序
+        years = np.arange(spec['start_year'], spec['end_year'] + 1)
+        weights = np.exp(spec['growth_rate'] * (years - years[0]))
+        self.years = np.sort(rng.choice(years, size=n, p=weights / weights.sum())).astype(np.int32)
+        # 每篇论文可引用的范围：严格更早年份的论文 [0, cite_limit)，近期窗口为 [window_start, cite_limit)
+        self.cite_limit = np.searchsorted(self.years, self.years, side='left')
+        self.window_start = np.searchsorted(self.years, self.years - spec['citation_window'], side='left')
+
+        # 期刊：Zipf 规模；名称避开会议判定规则
+        n_journals = max(100, n // spec['papers_per_journal'])
+        self.journal_names = np.array([f"JOURNAL OF SYNTHETIC RESEARCH {i:05d}" for i in range(n_journals)],
+                                      dtype=object)
+        self.journals = np.searchsorted(_zipf_cdf(n_journals, spec['journal_zipf']), rng.random(n))
+        self.journals = np.minimum(self.journals, n_journals - 1)
+
+        # 学科：每种期刊 1~3 个相邻学科（相邻学科频繁共现，相似性矩阵有结构）
+        n_cat = spec['n_categories']
+        self.category_names = [f"Synthetic Science {i:03d}" for i in range(n_cat)]
+        first = rng.integers(0, n_cat, size=n_journals)
+        width = rng.integers(1, 4, size=n_journals)
+        self.journal_categories = [
+            '; '.join(self.category_names[(f + k) % n_cat] for k in range(w)) for f, w in zip(first, width)
+        ]
+
+        # 关键词词表：规模随语料次线性增长，高频段每隔一位穿插一个领域词条
+        vocab_size = max(2000, int(40 * n ** 0.6))
+        terms = _taxonomy_terms()
+        vocab = np.array([f"synthetic term {i}" for i in range(vocab_size)], dtype=object)
+        slots = np.arange(1, 2 * len(terms), 2)[:vocab_size]
+        vocab[slots] = terms[:len(slots)]
+        self.vocabulary = vocab
+        self.keyword_cdf = _zipf_cdf(vocab_size, spec['keyword_zipf'])
+
+        # 引文适应度：Pareto 重尾；累积和（首位补 0）用于按适应度抽样被引论文
+        fitness = rng.pareto(spec['fitness_alpha'], size=n) + 1.0
+        self.fitness_cdf = np.concatenate([[0.0], np.cumsum(fitness)])
+
+        # 目标期刊：发文量最多的若干种
+        counts = np.bincount(self.journals, minlength=n_journals)
+        self.target_journal_ids = np.argsort(-counts, kind='stable')[:spec['target_journals']]
+
+    # ------------------------------------------------------------------
+    def dois(self, ids):
+        return np.array([f"10.5555/syn.{i}" for i in ids], dtype=object)
+
+    def _keywords(self, rng, count):
+        low, high = self.spec['keywords_per_paper']
+        lengths = rng.integers(low, high + 1, size=count)
+        ranks = np.searchsorted(self.keyword_cdf, rng.random(int(lengths.sum())))
+        flat = self.vocabulary[np.minimum(ranks, len(self.vocabulary) - 1)]
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        # 同一论文内重复抽到的关键词只保留一次
+        return [list(dict.fromkeys(flat[a:b])) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def _references(self, rng, ids):
+        """每篇论文的引用 DOI 列表（语料内 + 语料外），按论文去重"""
+        spec = self.spec
+        mu = np.log(spec['refs_mean']) - spec['refs_sigma'] ** 2 / 2
+        lengths = np.rint(rng.lognormal(mu, spec['refs_sigma'], size=len(ids))).astype(np.int64)
+        owner = np.repeat(np.arange(len(ids)), lengths)
+
+        external = rng.random(len(owner)) < spec['external_ref_share']
+        limit = self.cite_limit[ids][owner]
+        internal = ~external & (limit > 0)
+        # 按适应度在 [low, limit) 中抽样：cdf[low] + u × (cdf[limit] - cdf[low]) 在累积和上二分查找；
+        # 多数引用落在近期窗口内（引用老化），其余可指向任意更早的论文
+        cdf = self.fitness_cdf
+        high = limit[internal]
+        low = np.where(rng.random(len(high)) < spec['window_share'], self.window_start[ids][owner][internal], 0)
+        low = np.where(low < high, low, 0)
+        u = cdf[low] + rng.random(len(high)) * (cdf[high] - cdf[low])
+        targets = np.full(len(owner), -1, dtype=np.int64)
+        targets[internal] = np.minimum(np.searchsorted(cdf, u, side='right') - 1, high - 1)
+        ext_ids = np.searchsorted(_zipf_cdf(max(1000, self.n), 1.0), rng.random(int(external.sum())))
+
+        refs = pd.DataFrame({'owner': owner, 'target': targets})
+        refs['doi'] = None
+        refs.loc[internal, 'doi'] = self.dois(targets[internal])
+        refs.loc[external, 'doi'] = np.array([f"10.7777/ext.{i}" for i in ext_ids], dtype=object)
+        refs = refs.dropna(subset=['doi']).drop_duplicates(subset=['owner', 'doi'])
+
+        # owner 有序，按论文切片
+        bounds = np.searchsorted(refs['owner'].to_numpy(), np.arange(len(ids) + 1), side='left')
+        dois = refs['doi'].tolist()
+        return [dois[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def chunk(self, start, stop):
+        """生成编号 [start, stop) 论文的清洗结果形态 DataFrame"""
+        rng = np.random.default_rng([self.seed, start])
+        ids = np.arange(start, stop)
+        doi = self.dois(ids)
+        doi[rng.random(len(ids)) < self.spec['missing_doi_share']] = None
+        journal_ids = self.journals[ids]
+        categories = np.array(self.journal_categories, dtype=object)[journal_ids]
+        return pd.DataFrame({
+            'DOI': doi,
+            'Source Title': self.journal_names[journal_ids],
+            'Publication Year': pd.array(self.years[ids], dtype='Int32'),
+            'Keywords': ['; '.join(k) for k in self._keywords(rng, len(ids))],
+            'WoS Categories': [c.split('; ') for c in categories],
+            'citing': self._references(rng, ids),
+            'Article Title': [f"Synthetic study of case {i}" for i in ids],
+        })
+
+    def is_target(self, df):
+        target_names = set(self.journal_names[self.target_journal_ids])
+        return df['Source Title'].isin(target_names).to_numpy()
+
+# ============================================================================
+#  原始 WoS 导出形态
+# ============================================================================
+def to_raw(df, rng, conference_share=0.0, duplicate_share=0.0):
+    """清洗结果 → WoS 导出形态：分号分隔文本列与参考文献全文，附加会议论文与重复记录"""
+    years = df['Publication Year'].astype('Int64')
+    raw = pd.DataFrame({
+        'DOI': df['DOI'],
+        'Source Title': df['Source Title'],
+        'Publication Year': years.astype('string'),
+        'Keywords': df['Keywords'],
+        'WoS Categories': df['WoS Categories'].map('; '.join),
+        'Cited References': [
+            '; '.join(f"Author {k % 97}, {year - 1 - k % 5}, J SYNTH, V{k % 40 + 1}, P{k + 1}, DOI {d}"
+                      for k, d in enumerate(refs))
+            for refs, year in zip(df['citing'], years.fillna(2000).astype(int))
+        ],
+        'Article Title': df['Article Title'],
+    })
+    n = len(raw)
+    parts = [raw]
+    n_conf = int(n * conference_share)
+    if n_conf:
+        conf = raw.sample(n=n_conf, random_state=int(rng.integers(1 << 31))).copy()
+        conf['Source Title'] = [f"PROCEEDINGS OF THE {y} IEEE INTERNATIONAL CONFERENCE ON SYNTHETIC SYSTEMS"
+                                for y in conf['Publication Year'].fillna('2020')]
+        conf['DOI'] = None
+        parts.append(conf)
+    n_dup = int(n * duplicate_share)
+    if n_dup:
+        parts.append(raw.sample(n=n_dup, random_state=int(rng.integers(1 << 31))))
+    return pd.concat(parts, ignore_index=True)
+
+def _raw_schema():
+    return pa.schema([pa.field(col, pa.string()) for col in RAW_COLUMNS])
+
+def write_corpus(out_dir, n_papers, seed=0, chunk_rows=100_000, raw=True, **spec):
+    """生成合成语料并写出到 out_dir，返回元数据（同时写入 meta.json）"""
+    if pq is None:
+        raise ImportError("生成合成语料需要 pyarrow（见 requirements.txt）")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    generator = SyntheticWoS(n_papers, seed=seed, **spec)
+    log(f"生成 {n_papers} 篇论文 → {out_dir}")
+
+    all_writer = ParquetAppender(out_dir / 'all_data.parquet')
+    target_writer = ParquetAppender(out_dir / 'target_data.parquet')
+    raw_writer = pq.ParquetWriter(out_dir / 'raw.parquet', _raw_schema(), compression='zstd') if raw else None
+    raw_rng = np.random.default_rng([seed, 1])
+    stats = {'papers': 0, 'target_papers': 0, 'raw_rows': 0, 'references': 0, 'internal_references': 0}
+    in_degree = np.zeros(generator.n, dtype=np.int64)
+    try:
+        for start in range(0, generator.n, chunk_rows):
+            df = generator.chunk(start, min(start + chunk_rows, generator.n))
+            all_writer.write(df)
+            target = df[generator.is_target(df)]
+            if len(target):
+                target_writer.write(target)
+            if raw_writer is not None:
+                raw_df = to_raw(df, raw_rng, generator.spec['conference_share'], generator.spec['duplicate_share'])
+                raw_writer.write_table(pa.Table.from_pandas(raw_df, schema=_raw_schema(), preserve_index=False))
+                stats['raw_rows'] += len(raw_df)
+
+            refs = pd.Series(df['citing']).explode().dropna()
+            internal = refs[refs.str.startswith('10.5555/syn.')]
+            np.add.at(in_degree, internal.str.slice(len('10.5555/syn.')).astype(np.int64).to_numpy(), 1)
+            stats['papers'] += len(df)
+            stats['target_papers'] += len(target)
+            stats['references'] += len(refs)
+            stats['internal_references'] += len(internal)
+            log(f"  {stats['papers']}/{generator.n}")
+    finally:
+        all_writer.close()
+        target_writer.close()
+        if raw_writer is not None:
+            raw_writer.close()
+
+    cited = np.sort(in_degree)[::-1]
+    meta = {
+        'generator_version': GENERATOR_VERSION,
+        'n_papers': generator.n,
+        'seed': seed,
+        'spec': {k: list(v) if isinstance(v, tuple) else v for k, v in generator.spec.items()},
+        'stats': {
+            **stats,
+            'journals': len(generator.journal_names),
+            'vocabulary': len(generator.vocabulary),
+            'max_in_degree': int(cited[0]) if len(cited) else 0,
+            # 被引最多的 1% 论文获得的语料内引用占比（重尾程度）
+            'top1pct_citation_share': float(cited[:max(1, len(cited) // 100)].sum() / max(1, cited.sum())),
+        },
+    }
+    with open(out_dir / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    log(f"完成: {json.dumps(meta['stats'], ensure_ascii=False)}")
+    return meta
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 WoS 语料")
+    parser.add_argument('size', help="论文数，如 10k / 100k / 1m / 10m")
+    parser.add_argument('--out', help="输出目录（默认 benchmarks/data/wos_<size>）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--no-raw', action='store_true', help="不写原始导出形态（跳过清洗阶段的数据）")
+    args = parser.parse_args()
+    require_pyarrow()
+
+    n = parse_size(args.size)
+    out = Path(args.out) if args.out else Path(__file__).resolve().parent / 'data' / f"wos_{size_label(n)}"
+    write_corpus(out, n, seed=args.seed, chunk_rows=args.chunk_rows, raw=not args.no_raw)
+
+if __name__ == "__main__":
+    main()
@@ -167,6 +167,13 @@ def show_outputs_info():
             subdir_files = sum(1 for _ in subdir.rglob("*") if _.is_file())
             print(f"    {subdir.name}/ ({subdir_files} 个文件)")
 
+def clean_keyword_caches(max_age_days=30):
+    """清理长期未使用的关键词 → 领域 映射缓存（按修改时间，跳过正在使用的文件）"""
+    from python_analysis.field_index import prune_keyword_caches
+    cache_dir = Path(__file__).parent / "data" / "cache"
+    removed = prune_keyword_caches(cache_dir, max_age_days=max_age_days)
+    print(f"[清理] 删除 {removed} 个超过 {max_age_days} 天未使用的关键词映射缓存")
+
 def main():
     """主函数 - 提供清理选项"""
     print("=" * 50)
@@ -179,9 +186,10 @@ def main():
         print("  2. 清理特定类型文件 (.csv, .json, .png等)")
         print("  3. 按文件名模式清理")
         print("  4. 查看outputs文件夹信息")
-        print("  5. 退出")
+        print("  5. 清理30天未使用的关键词映射缓存 (data/cache)")
+        print("  6. 退出")
         
-        choice = input("\n请输入选择 (1-5): ").strip()
+        choice = input("\n请输入选择 (1-6): ").strip()
         
         if choice == '1':
             print("\n⚠️ 警告: 这将删除outputs文件夹下所有文件!")
@@ -201,6 +209,9 @@ def main():
             show_outputs_info()
 
         elif choice == '5':
+            clean_keyword_caches()
+
+        elif choice == '6':
             print("退出程序")
 
             break
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/artifact_cache.py
+中间结果的内容寻址缓存
+- 键：sha256(产物名 + 输入指纹 + 代码版本 + 相关参数)；输入指纹由数据内容计算，
+  代码版本为计算函数源码的哈希，任一变化都会得到新键，旧产物不再被命中
+- 存储：pickle 二进制文件，位于 data/cache/artifacts，文件名含产物名与键
+- 淘汰：命中时刷新文件修改时间；写入后按修改时间删除最久未用的产物，
+  使目录总大小不超过上限（LRU）
+各分析模块用它缓存引文网络、关键词对时间线、学科相似性矩阵与论文级得分，
+参数只影响期刊聚合时（如 top_k），重跑只重新计算聚合。
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 产物文件格式版本，存储结构变化时递增，使旧产物失效
+ARTIFACT_FORMAT = 1
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_DIR = PROJECT_ROOT / 'data' / 'cache' / 'artifacts'
+DEFAULT_MAX_MB = 1024
+
+def log(msg):
+    print(f"[cache] {msg}")
+
+# ============================================================================
+#  指纹
+# ============================================================================
+def _flatten(value):
+    """列表型单元格转为可哈希的文本"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return '\x1f'.join(map(str, value))
+    return value
+
+def frame_fingerprint(df):
+    """DataFrame 内容指纹（列名 + 各列取值，与行索引无关）"""
+    digest = hashlib.sha256()
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == object:
+            values = values.map(_flatten)
+        digest.update(str(col).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    digest.update(str(len(df)).encode('utf-8'))
+    return digest.hexdigest()
+
+def code_version(*objects):
+    """计算函数 / 类源码的哈希，代码修改后自动使对应产物失效"""
+    digest = hashlib.sha256()
+    for obj in objects:
+        try:
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            source = getattr(obj, '__qualname__', repr(obj))
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+# ============================================================================
+#  缓存
+# ============================================================================
+class ArtifactCache:
+    """内容寻址的产物缓存
+
+    Args:
+        cache_dir: 产物目录
+        max_bytes: 目录总大小上限，超出时按最久未用淘汰
+        enabled: False 时每次都重新计算且不写入
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB << 20, enabled=True):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def key(name, inputs=(), params=None, code=None):
+        """产物键：名称、输入指纹、参数与代码版本的哈希"""
+        payload = json.dumps({
+            'format': ARTIFACT_FORMAT,
+            'name': name,
+            'inputs': list(inputs),
+            'params': params or {},
+            'code': code,
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, name, key):
+        return self.cache_dir / f"{name}_{key[:24]}.pkl"
+
+    def get(self, name, key):
+        """读取产物，不存在或损坏时返回 (False, None)"""
+        path = self.path(name, key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return False, None
+        try:
+            os.utime(path)  # 刷新最近使用时间
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, name, key, value):
+        """原子写入产物（先写临时文件再替换），并执行容量淘汰"""
+        path = self.path(name, key)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(self.cache_dir), prefix=path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            log(f"写入产物失败 {path.name}: {e}")
+            return
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """删除最久未用的产物，直到目录总大小不超过上限"""
+        entries = []
+        for path in self.cache_dir.glob('*.pkl'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def fetch(self, name, key, compute):
+        """按键取产物，未命中时调用 compute() 计算并写入"""
+        if self.enabled:
+            found, value = self.get(name, key)
+            if found:
+                self.hits += 1
+                log(f"命中 {name}")
+                return value
+        self.misses += 1
+        value = compute()
+        if self.enabled and value is not None:
+            self.put(name, key, value)
+        return value
+
+    def cached(self, name, compute, inputs=(), params=None, code=None):
+        """fetch 的便捷形式：由输入指纹、参数与代码版本直接计算键"""
+        return self.fetch(name, self.key(name, inputs, params, code), compute)
+
+    def stats_line(self):
+        return f"产物缓存: 命中 {self.hits}, 计算 {self.misses}, 淘汰 {self.evictions}"
+
+_CACHE = None
+
+def get_artifact_cache():
+    """按 config.json 的 artifact_cache 配置返回进程内共享的缓存"""
+    global _CACHE
+    if _CACHE is None:
+        config_path = PROJECT_ROOT / 'config.json'
+        settings = {}
+        if config_path.exists():
+            with open(config_path, 'r', encoding='utf-8') as f:
+                settings = json.load(f).get('artifact_cache', {})
+        cache_dir = Path(settings.get('cache_dir', DEFAULT_CACHE_DIR))
+        if not cache_dir.is_absolute():
+            cache_dir = PROJECT_ROOT / cache_dir
+        _CACHE = ArtifactCache(cache_dir, max_bytes=int(settings.get('max_mb', DEFAULT_MAX_MB)) << 20,
+                               enabled=settings.get('enabled', True))
+    return _CACHE
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/category_encoding.py
+WoS学科编码模块
+将多标签的 WoS Categories 字段拆分为规范学科，
+以 CSR 形式（indptr + 小整数 indices）保存每篇论文的学科 id，
+供 run_kua / interdisciplinary / diversity_engine 等TD模块共用。
+"""
+import ast
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# WoS 多个学科之间用 "; " 分隔；学科名内部的逗号（如 "Engineering, Biomedical"）不拆分
+CATEGORY_SEPARATORS = (';', '|')
+
+def canonical_category(name):
+    """规范化单个学科名：去首尾空白、合并连续空白"""
+    return ' '.join(str(name).split())
+
+def split_categories(value):
+    """把一个 WoS Categories 字段拆分为规范学科列表（保持顺序、去重）"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        items = list(value)
+    else:
+        if value is None or pd.isna(value):
+            return []
+        text = str(value).strip()
+        items = None
+        if text.startswith('[') and text.endswith(']'):
+            try:
+                items = list(ast.literal_eval(text))
+            except (ValueError, SyntaxError):
+                items = None
+        if items is None:
+            for sep in CATEGORY_SEPARATORS:
+                text = text.replace(sep, CATEGORY_SEPARATORS[0])
+            items = text.split(CATEGORY_SEPARATORS[0])
+
+    seen = []
+    for item in items:
+        cat = canonical_category(item)
+        if cat and cat not in seen:
+            seen.append(cat)
+    return seen
+
+def _index_dtype(n_categories):
+    """按学科数选择最小的整数类型"""
+    if n_categories <= np.iinfo(np.int16).max:
+        return np.int16
+    return np.int32
+
+class CategoryEncoding:
+    """论文 → 学科id 的 CSR 编码
+
+    Attributes:
+        categories: 学科名列表，下标即学科id
+        indptr: 长度为 n_papers+1 的偏移数组
+        indices: 所有论文学科id拼接而成的小整数数组
+    """
+
+    def __init__(self, categories, indptr, indices):
+        self.categories = list(categories)
+        self.category_index = {cat: i for i, cat in enumerate(self.categories)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=_index_dtype(len(self.categories)))
+
+    @classmethod
+    def from_values(cls, values, categories=None):
+        """从 WoS Categories 字段序列构建编码
+
+        Args:
+            values: 可迭代的学科字段（字符串 / 列表）
+            categories: 可选的既有学科表；给定时不在表中的学科被忽略
+        """
+        category_lists = [split_categories(v) for v in values]
+        if categories is None:
+            categories = sorted({c for cats in category_lists for c in cats})
+        index = {cat: i for i, cat in enumerate(categories)}
+
+        ids = [[index[c] for c in cats if c in index] for cats in category_lists]
+        lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        indices = np.fromiter((i for x in ids for i in x), dtype=np.int64, count=int(lengths.sum()))
+        return cls(categories, indptr, indices)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def n_categories(self):
+        return len(self.categories)
+
+    @property
+    def lengths(self):
+        return np.diff(self.indptr)
+
+    def row(self, i):
+        """第i篇论文的学科id数组"""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def names(self, i):
+        """第i篇论文的学科名列表"""
+        return [self.categories[c] for c in self.row(i)]
+
+    def gather(self, row_ids):
+        """取出若干篇论文的全部学科id，返回 (所属位置, 学科id) 两个数组"""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        starts = self.indptr[row_ids]
+        lengths = self.indptr[row_ids + 1] - starts
+        owner = np.repeat(np.arange(len(row_ids)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return owner, self.indices[np.repeat(starts, lengths) + offsets].astype(np.int64)
+
+    def incidence(self):
+        """论文 × 学科 0/1 稀疏矩阵"""
+        rows = np.repeat(np.arange(len(self)), self.lengths)
+        matrix = sparse.csr_matrix((np.ones(len(self.indices)), (rows, self.indices.astype(np.int64))),
+                                   shape=(len(self), self.n_categories))
+        matrix.data[:] = 1.0
+        return matrix
+
+    def nbytes(self):
+        """编码占用的字节数"""
+        return self.indptr.nbytes + self.indices.nbytes
+
+# ============================================================================
+#  学科相似性
+# ============================================================================
+def co_occurrence_matrix(incidence, min_labels=1):
+    """由 论文×学科 0/1 矩阵构建学科共现矩阵
+
+    每篇论文中每个学科计一次（对角线），每对不同学科计一次（非对角线）；
+    学科数少于 min_labels 的论文不参与统计。
+    """
+    incidence = sparse.csr_matrix(incidence, dtype=float)
+    keep = np.asarray(incidence.sum(axis=1)).ravel() >= min_labels
+    incidence = incidence[keep]
+    return (incidence.T @ incidence).toarray()
+
+def salton_similarity(co_occurrence):
+    """Salton余弦相似性矩阵（向量化），对角线为1"""
+    co_occurrence = np.asarray(co_occurrence, dtype=float)
+    norms = np.sqrt((co_occurrence ** 2).sum(axis=1))
+    denom = np.outer(norms, norms)
+    similarity = np.divide(co_occurrence @ co_occurrence.T, denom,
+                           out=np.zeros_like(denom), where=denom > 0)
+    np.fill_diagonal(similarity, 1.0)
+    return similarity
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/columnar.py
+清洗结果的列式存储（Parquet）
+- citing / WoS Categories 保存为原生 list<string> 列，Publication Year 保存为整数
+- Keywords 保存原文：各分析模块的拆分规则不同（分号 / 逗号 / 竖线 / 顿号），由模块自行拆分
+- 各分析模块通过 load_cleaned 读取：同名 .parquet 存在且不旧于 CSV 时优先读取，并且只读取需要的列；
+  否则回退到 CSV，并把列表列解析为 Python 列表，使两种来源得到相同的数据形态
+"""
+import ast
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 已列入 requirements.txt；未安装时回退为只读写 CSV
+    pa = pq = None
+
+try:
+    from python_analysis.category_encoding import split_categories
+except ImportError:
+    from category_encoding import split_categories
+
+YEAR_COLUMN = 'Publication Year'
+
+def parquet_available():
+    return pq is not None
+
+def columnar_path(csv_path):
+    """CSV 对应的 Parquet 文件路径（同目录同名）"""
+    return Path(csv_path).with_suffix('.parquet')
+
+# ============================================================================
+#  列表列 / 年份列规范化
+# ============================================================================
+def _literal_list(value):
+    """解析字符串化的列表，失败返回 None"""
+    if value.startswith('[') and value.endswith(']'):
+        try:
+            return [str(v) for v in ast.literal_eval(value)]
+        except (ValueError, SyntaxError):
+            return None
+    return None
+
+def parse_citing(value):
+    """citing 字段 → DOI 列表"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(v) for v in value]
+    if isinstance(value, str):
+        return _literal_list(value.strip()) or []
+    return []
+
+LIST_PARSERS = {
+    'citing': parse_citing,
+    'WoS Categories': split_categories,
+}
+
+def parse_year(values):
+    """出版年份 → 可空整数（兼容 2021 / 2021.0 / 2021-03-01 等格式）"""
+    years = pd.Series(values).astype('string').str.extract(r'^\s*(\d{4})', expand=False)
+    return pd.to_numeric(years, errors='coerce').astype('Int32')
+
+def flatten_list_columns(df):
+    """写 CSV 前把 WoS Categories 列表还原为 WoS 的分号分隔文本（citing 保持列表文本形式）"""
+    flat = {}
+    for col in ('WoS Categories',):
+        if col in df.columns and df[col].map(lambda v: isinstance(v, list)).any():
+            flat[col] = df[col].map(lambda v: '; '.join(v) or None if isinstance(v, list) else v)
+    return df.assign(**flat) if flat else df
+
+def to_columnar(df):
+    """把清洗结果转换为列式形态：列表列为 Python 列表，年份为 Int32"""
+    df = df.copy()
+    for col, parser in LIST_PARSERS.items():
+        if col in df.columns:
+            df[col] = pd.Series([parser(v) for v in df[col]], index=df.index, dtype=object)
+    if YEAR_COLUMN in df.columns:
+        df[YEAR_COLUMN] = parse_year(df[YEAR_COLUMN])
+    return df
+
+# ============================================================================
+#  写出
+# ============================================================================
+def arrow_schema(df):
+    """清洗结果的固定 Arrow 模式：列表列 list<string>、年份 int32，其余均为字符串
+
+    WoS 导出的其余字段都是文本；固定模式保证分块写出时各块类型一致
+    （某块某列全为空值时不会被推断为 null 或 float 类型）。
+    """
+    fields = []
+    for col in df.columns:
+        if col in LIST_PARSERS:
+            fields.append(pa.field(col, pa.list_(pa.string())))
+        elif col == YEAR_COLUMN:
+            fields.append(pa.field(col, pa.int32()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+def _to_table(df, schema):
+    df = to_columnar(df)
+    for field in schema:
+        if pa.types.is_string(field.type):
+            # 数值 / 混合类型列统一转为字符串，空值保留为 null；空字符串与 CSV 读取一致按 null 保存
+            df[field.name] = df[field.name].astype('string').replace('', pd.NA)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def write_parquet(df, path):
+    """把清洗结果写为 Parquet"""
+    pq.write_table(_to_table(df, arrow_schema(df)), path, compression='zstd')
+    return path
+
+class ParquetAppender:
+    """分块追加写 Parquet（流式清洗使用），模式由第一块确定"""
+
+    def __init__(self, path):
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, df):
+        if self.writer is None:
+            self.schema = arrow_schema(df)
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        self.writer.write_table(_to_table(df, self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+# ============================================================================
+#  读取
+# ============================================================================
+def _prefer_parquet(csv_path, parquet_path):
+    if pq is None or not parquet_path.exists():
+        return False
+    return not csv_path.exists() or parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+
+def load_cleaned(path, columns=None):
+    """读取清洗结果，优先使用 Parquet
+
+    Args:
+        path: 配置中的数据文件路径（通常为 .csv）
+        columns: 需要的列；None 表示全部列。文件中不存在的列被忽略
+
+    Returns:
+        DataFrame：citing / WoS Categories 为 Python 列表，Keywords 为原文，年份为 Int32
+    """
+    path = Path(path)
+    parquet_path = path if path.suffix == '.parquet' else columnar_path(path)
+    wanted = None if columns is None else list(dict.fromkeys(columns))
+
+    if _prefer_parquet(path, parquet_path):
+        available = pq.read_schema(parquet_path).names
+        table = pq.read_table(parquet_path, columns=None if wanted is None else
+                              [c for c in wanted if c in available])
+        # 列表列直接转为 Python 列表，不经过 to_pandas 的 ndarray 中间结果
+        list_columns = [f.name for f in table.schema if pa.types.is_list(f.type)]
+        df = table.drop_columns(list_columns).to_pandas(ignore_metadata=True)
+        for name in list_columns:
+            values = table.column(name).to_pylist()
+            if name not in LIST_PARSERS:
+                # 旧版本写出的 list<string> 关键词列还原为分号分隔原文
+                values = ['; '.join(v) or None if v is not None else None for v in values]
+            df[name] = values
+        df = df[table.column_names]
+        if YEAR_COLUMN in df.columns:
+            df[YEAR_COLUMN] = df[YEAR_COLUMN].astype('Int32')
+        return df
+
+    df = pd.read_csv(path, usecols=None if wanted is None else (lambda c: c in wanted))
+    return to_columnar(df)
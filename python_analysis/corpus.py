@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/corpus.py
+共享语料对象
+全量数据（背景）与目标数据只加载、解析一次，保存为驻留的整数编码：
+- DOI / 关键词原文 / 期刊：两张表共用同一套词表，id 可跨表比较
+- 参考文献：CSR（indptr + 词表id）；学科：CategoryEncoding（两表共用学科表）
+- 关键词保存原文：各分析模块的拆分规则不同，由模块自行拆分
+- 年份：int32，缺失为 -1
+各分析模块接受 corpus 参数，通过 to_frame 取得与 load_cleaned 相同形态的数据，
+因此多模块运行只付一次解析成本，且所有模块看到完全相同的解析结果。
+引文网络与关键词对时间线直接读取整数编码（references / keyword_terms），
+缓存键用 fingerprint 计算，不组装 DataFrame。
+"""
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from python_analysis.category_encoding import CategoryEncoding, split_categories
+    from python_analysis.columnar import load_cleaned, parse_citing
+except ImportError:
+    from category_encoding import CategoryEncoding, split_categories
+    from columnar import load_cleaned, parse_citing
+
+# 语料中的角色 → 默认列名
+DEFAULT_COLUMNS = {
+    'id': 'DOI',
+    'journal': 'Source Title',
+    'year': 'Publication Year',
+    'keywords': 'Keywords',
+    'refs': 'citing',
+    'category': 'WoS Categories',
+    'title': 'Article Title',
+    'abstract': 'Abstract',
+}
+# 以原始文本保留在 frame 中的角色
+TEXT_ROLES = ('title', 'abstract')
+MISSING_YEAR = -1
+# save 写出的语料文件格式；对象结构变化时递增，旧文件需由 corpus 阶段重新生成
+CORPUS_FORMAT = 2
+
+def log(msg):
+    print(f"[corpus] {msg}")
+
+class Vocabulary:
+    """字符串 → 连续整数id 的驻留表"""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+        self._digest = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def _intern(self, value):
+        i = self.index.get(value)
+        if i is None:
+            value = sys.intern(value)
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def encode(self, values):
+        """编码一组字符串，空值编码为 -1；每个不同取值只查一次词表"""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        ids = np.fromiter((self._intern(str(v)) for v in uniques), dtype=np.int64, count=len(uniques))
+        return np.append(ids, -1)[codes]
+
+    def decode(self, ids):
+        """id 数组 → 对象数组，-1 解码为 None"""
+        values = np.array(self.values + [None], dtype=object)
+        return values[np.asarray(ids, dtype=np.int64)]
+
+    def digest(self):
+        """词表内容指纹（词表只增不改，按长度缓存）"""
+        if self._digest is None or self._digest[0] != len(self.values):
+            hashed = pd.util.hash_pandas_object(pd.Series(self.values, dtype=object), index=False)
+            self._digest = (len(self.values), hashlib.sha256(hashed.to_numpy().tobytes()).hexdigest())
+        return self._digest[1]
+
+class Ragged:
+    """每篇论文的变长 id 列表（CSR：indptr + indices）"""
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    @classmethod
+    def from_lists(cls, lists, vocab):
+        lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+        indices = vocab.encode([v for items in lists for v in items])
+        return cls(np.concatenate([[0], np.cumsum(lengths)]), indices)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def lengths(self):
+        return np.diff(self.indptr)
+
+    def row(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def lists(self, vocab):
+        """解码为每篇论文的字符串列表"""
+        flat = vocab.decode(self.indices).tolist()
+        return [flat[a:b] for a, b in zip(self.indptr[:-1].tolist(), self.indptr[1:].tolist())]
+
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+    def take(self, rows):
+        """按行号取子集（行号 -1 为空行）"""
+        rows = np.asarray(rows, dtype=np.int64)
+        valid = rows >= 0
+        safe = np.where(valid, rows, 0)
+        lengths = np.where(valid, self.lengths[safe], 0)
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.repeat(self.indptr[safe] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return Ragged(indptr, self.indices[positions])
+
+def _splitter_key(splitter):
+    return f"{splitter.__module__}.{splitter.__qualname__}"
+
+class PaperTable:
+    """一张论文表（全量数据或目标数据）的解析结果"""
+
+    def __init__(self, corpus, frame, doi_ids, journal_ids, years, keyword_ids, references, categories):
+        self.corpus = corpus
+        self.frame = frame
+        self.doi_ids = doi_ids
+        self.journal_ids = journal_ids
+        self.years = years
+        self.keyword_ids = keyword_ids
+        self.references = references
+        self.categories = categories
+        self._terms = {}
+
+    def __len__(self):
+        return len(self.doi_ids)
+
+    def paper_ids(self):
+        return self.corpus.dois.decode(self.doi_ids)
+
+    def journal_names(self):
+        return self.corpus.journals.decode(self.journal_ids)
+
+    def keyword_texts(self):
+        return self.corpus.keywords.decode(self.keyword_ids)
+
+    def reference_lists(self):
+        return self.references.lists(self.corpus.dois)
+
+    def category_lists(self):
+        encoding = self.categories
+        flat = np.array(encoding.categories + [None], dtype=object)[encoding.indices.astype(np.int64)].tolist()
+        return [flat[a:b] for a, b in zip(encoding.indptr[:-1].tolist(), encoding.indptr[1:].tolist())]
+
+    def keyword_terms(self, splitter):
+        """按分析模块自己的拆分规则得到每篇论文的关键词词条
+
+        Args:
+            splitter: 关键词原文 → 词条列表（如 novelty 的 clean_keywords）
+
+        Returns:
+            Ragged：词条id（Corpus.term_vocabulary(splitter) 中的 id），保留拆分结果的顺序与重复；
+            缺失关键词的论文为空行
+        """
+        key = _splitter_key(splitter)
+        if key not in self._terms:
+            self._terms[key] = self.corpus.text_terms(splitter).take(self.keyword_ids)
+        return self._terms[key]
+
+    def fingerprint(self, roles):
+        """指定角色的内容指纹（整数编码 + 所用词表），供产物缓存使用"""
+        corpus = self.corpus
+        parts = {
+            'id': lambda: ([self.doi_ids], corpus.dois),
+            'journal': lambda: ([self.journal_ids], corpus.journals),
+            'year': lambda: ([self.years], None),
+            'keywords': lambda: ([self.keyword_ids], corpus.keywords),
+            'refs': lambda: ([self.references.indptr, self.references.indices], corpus.dois),
+        }
+        digest = hashlib.sha256()
+        for role in roles:
+            arrays, vocab = parts[role]()
+            digest.update(role.encode('utf-8'))
+            for array in arrays:
+                digest.update(np.ascontiguousarray(array).tobytes())
+            if vocab is not None:
+                digest.update(vocab.digest().encode('utf-8'))
+        digest.update(str(len(self)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def year_series(self):
+        years = pd.Series(self.years, dtype='Int32')
+        return years.mask(years == MISSING_YEAR)
+
+    def to_frame(self, columns):
+        """按 {列名: 角色} 组装 DataFrame，形态与 load_cleaned 的返回一致
+
+        参考文献、学科为 Python 列表，关键词为原文，年份为 Int32；未加载的角色被忽略。
+        """
+        builders = {
+            'id': self.paper_ids,
+            'journal': self.journal_names,
+            'year': self.year_series,
+            'keywords': self.keyword_texts,
+            'refs': self.reference_lists,
+            'category': self.category_lists,
+        }
+        data = {}
+        for name, role in columns.items():
+            if role in TEXT_ROLES:
+                if role in self.frame.columns:
+                    data[name] = self.frame[role].to_numpy()
+            elif role in self.corpus.roles:
+                values = builders[role]()
+                data[name] = values if role == 'year' else pd.Series(values, dtype=object)
+        return pd.DataFrame({name: pd.Series(values).reset_index(drop=True) for name, values in data.items()})
+
+class Corpus:
+    """全量数据 + 目标数据的共享语料
+
+    Attributes:
+        background / target: PaperTable
+        dois / keywords / journals: 两表共用的 Vocabulary（keywords 为关键词原文）
+        roles: 实际加载到的角色
+    """
+
+    def __init__(self, columns=None):
+        self.columns = {**DEFAULT_COLUMNS, **(columns or {})}
+        self.dois = Vocabulary()
+        self.keywords = Vocabulary()
+        self.journals = Vocabulary()
+        self.roles = set()
+        self.categories = []
+        self.background = self.target = None
+        self._text_terms = {}
+        self.format = CORPUS_FORMAT
+
+    @classmethod
+    def from_frames(cls, background_df, target_df, columns=None):
+        corpus = cls(columns)
+        corpus.roles = {role for role, col in corpus.columns.items()
+                        if col in background_df.columns or col in target_df.columns}
+        category_col = corpus.columns['category']
+        # 两表共用一张学科表，学科id可跨表比较
+        corpus.categories = sorted({c for df in (background_df, target_df) if category_col in df.columns
+                                    for cats in df[category_col].map(split_categories) for c in cats})
+        corpus.background = corpus._table(background_df)
+        corpus.target = corpus._table(target_df)
+        return corpus
+
+    def _table(self, df):
+        cols = self.columns
+        n = len(df)
+        df = df.reset_index(drop=True)
+
+        def column(role):
+            return df[cols[role]] if cols[role] in df.columns else pd.Series([None] * n, dtype=object)
+
+        doi_ids = self.dois.encode(column('id'))
+        journal_ids = self.journals.encode(column('journal'))
+        if cols['year'] in df.columns:
+            years = pd.Series(df[cols['year']]).astype('Int32').fillna(MISSING_YEAR).to_numpy(dtype=np.int32)
+        else:
+            years = np.full(n, MISSING_YEAR, dtype=np.int32)
+        keyword_ids = self.keywords.encode(column('keywords'))
+        references = Ragged.from_lists([parse_citing(v) for v in column('refs')], self.dois)
+        categories = CategoryEncoding.from_values(column('category'), self.categories)
+        frame = pd.DataFrame({role: df[cols[role]].to_numpy() for role in TEXT_ROLES if cols[role] in df.columns})
+        return PaperTable(self, frame, doi_ids, journal_ids, years, keyword_ids, references, categories)
+
+    def _split_texts(self, splitter):
+        """每种关键词原文只拆分一次：返回 (按原文id索引的词条 Ragged, 词条词表)，两表共用"""
+        key = _splitter_key(splitter)
+        if key not in self._text_terms:
+            vocab = Vocabulary()
+            self._text_terms[key] = (Ragged.from_lists([splitter(v) for v in self.keywords.values], vocab), vocab)
+        return self._text_terms[key]
+
+    def text_terms(self, splitter):
+        """按原文id索引的词条 Ragged"""
+        return self._split_texts(splitter)[0]
+
+    def term_vocabulary(self, splitter):
+        """splitter 对应的词条词表"""
+        return self._split_texts(splitter)[1]
+
+    @classmethod
+    def load(cls, all_path, target_path, columns=None):
+        """从清洗结果加载（优先 Parquet，只读取语料需要的列）"""
+        corpus_columns = {**DEFAULT_COLUMNS, **(columns or {})}
+        wanted = list(corpus_columns.values())
+        log(f"加载全量数据: {all_path}")
+        background_df = load_cleaned(all_path, wanted)
+        if Path(target_path).resolve() == Path(all_path).resolve():
+            target_df = background_df
+        else:
+            log(f"加载目标数据: {target_path}")
+            target_df = load_cleaned(target_path, wanted)
+        corpus = cls.from_frames(background_df, target_df, columns)
+        log(corpus.summary())
+        return corpus
+
+    def save(self, path):
+        """序列化到文件，供其他进程复用（写临时文件后原子替换）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def read(path):
+        """读取 save 写出的语料"""
+        with open(path, 'rb') as f:
+            corpus = pickle.load(f)
+        if getattr(corpus, 'format', None) != CORPUS_FORMAT:
+            raise ValueError(f"语料文件格式已过期，请重新运行 corpus 阶段: {path}")
+        return corpus
+
+    def summary(self):
+        return (f"背景论文 {len(self.background)} 篇, 目标论文 {len(self.target)} 篇, "
+                f"DOI {len(self.dois)} 个, 关键词原文 {len(self.keywords)} 种, "
+                f"期刊 {len(self.journals)} 种, 学科 {len(self.categories)} 个")
+
+# ============================================================================
+#  进程内共享：同一对输入文件只构建一次
+# ============================================================================
+_CORPORA = {}
+
+def _file_key(path):
+    path = Path(path).resolve()
+    stats = [(p.stat().st_mtime_ns, p.stat().st_size) for p in (path, path.with_suffix('.parquet')) if p.exists()]
+    return str(path), tuple(stats)
+
+def get_corpus(all_path, target_path, columns=None):
+    """返回共享语料；输入文件未变化时复用已构建的对象"""
+    key = (_file_key(all_path), _file_key(target_path), tuple(sorted((columns or {}).items())))
+    corpus = _CORPORA.get(key)
+    if corpus is None:
+        _CORPORA.clear()
+        corpus = _CORPORA[key] = Corpus.load(all_path, target_path, columns)
+    return corpus
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/diversity_engine.py
+统一跨学科性计算引擎
+一次加载、一次解析，只构建一次 论文 → 参考文献学科 分布矩阵，
+在单次向量化计算中输出全部多样性指标：
+variety / balance / disparity / Rao-Stirling / TD / Shannon / Leinster-Cobbold(q)
+输出：论文级指标列表 + 期刊级平均指标列表
+"""
+import json
+import ast
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from scipy import sparse
+
+try:
+    from python_analysis.artifact_cache import code_version, frame_fingerprint, get_artifact_cache
+    from python_analysis.category_encoding import CategoryEncoding, co_occurrence_matrix, salton_similarity
+    from python_analysis.columnar import load_cleaned
+    from python_analysis.field_index import MATCHER_CODE
+    from python_analysis.topic_analyzer import (
+        clean_author_keywords, load_field_index, paper_field_matrix, distribution_measures,
+        load_config as load_topic_config
+    )
+except ImportError:
+    from artifact_cache import code_version, frame_fingerprint, get_artifact_cache
+    from category_encoding import CategoryEncoding, co_occurrence_matrix, salton_similarity
+    from columnar import load_cleaned
+    from field_index import MATCHER_CODE
+    from topic_analyzer import (
+        clean_author_keywords, load_field_index, paper_field_matrix, distribution_measures,
+        load_config as load_topic_config
+    )
+
+
+def load_config():
+    """加载配置文件"""
+    config_path = Path(__file__).resolve().parent.parent / 'config.json'
+    if not config_path.exists():
+        raise FileNotFoundError(f"配置文件不存在: {config_path}")
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    return config.get("diversity", {})
+
+def log(msg):
+    print(f"[diversity] {msg}")
+
+def parse_refs(refs):
+    """解析citing列（字符串化的DOI列表）"""
+    if isinstance(refs, (list, np.ndarray)):
+        return list(refs)
+    if isinstance(refs, str) and refs.startswith('['):
+        try:
+            return ast.literal_eval(refs)
+        except (ValueError, SyntaxError):
+            return []
+    return []
+
+def parse_orders(orders):
+    """解析Leinster-Cobbold阶数列表，支持 "inf" """
+    parsed = []
+    for q in orders:
+        if isinstance(q, str) and q.lower() in ('inf', 'infinity'):
+            parsed.append(np.inf)
+        else:
+            parsed.append(float(q))
+    return parsed
+
+def order_label(q):
+    """阶数q对应的列名"""
+    if np.isinf(q):
+        return 'lc_qinf'
+    return f"lc_q{q:g}".replace('.', '_')
+
+# ============================================================================
+#  向量化多样性指标
+# ============================================================================
+def diversity_measures(counts, similarity, orders=(0.0, 1.0, 2.0, np.inf)):
+    """对 论文×学科 计数矩阵一次性计算全部多样性指标
+
+    Args:
+        counts: scipy.sparse 论文×学科 引用计数矩阵
+        similarity: 学科相似性矩阵 S（对称，对角线为1）
+        orders: Leinster-Cobbold 多样性的阶数 q
+
+    Returns:
+        dict: 指标名 → 每篇论文的得分数组
+    """
+    counts = sparse.csr_matrix(counts, dtype=float)
+    counts.eliminate_zeros()
+    n_papers = counts.shape[0]
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    has_refs = totals > 0
+
+    # 行归一化得到学科占比 p
+    P = sparse.diags(np.divide(1.0, totals, out=np.zeros(n_papers), where=has_refs)) @ counts
+    P = P.tocoo()
+    rows, cols, p = P.row, P.col, P.data
+
+    variety = np.bincount(rows, minlength=n_papers).astype(float)
+
+    # Shannon熵（log2，与 topic_analyzer 一致）与均衡度
+    shannon = -np.bincount(rows, weights=p * np.log2(p), minlength=n_papers)
+    balance = np.divide(shannon, np.log2(variety), out=np.zeros(n_papers), where=variety > 1)
+
+    # Zp：每篇论文在各学科上的"相似性加权占比"，只在支撑集上取值
+    P = P.tocsr()
+    ZP = np.asarray(P @ similarity)
+    zp = ZP[rows, cols]
+
+    # p^T S p → Rao-Stirling 与 TD
+    pSp = np.bincount(rows, weights=p * zp, minlength=n_papers)
+    rao_stirling = np.where(has_refs, 1.0 - pSp, 0.0)
+    td = np.divide(1.0, pSp, out=np.ones(n_papers), where=pSp > 0)
+
+    # 差异度：出现学科两两之间 (1 - s_ij) 的均值
+    presence = P.copy()
+    presence.data[:] = 1.0
+    pair_similarity = np.asarray(presence.multiply(presence @ similarity).sum(axis=1)).ravel()
+    pair_count = variety * (variety - 1)
+    disparity = np.divide(pair_count - (pair_similarity - variety), pair_count,
+                          out=np.zeros(n_papers), where=pair_count > 0)
+
+    measures = {
+        'variety': variety,
+        'balance': balance,
+        'disparity': disparity,
+        'rao_stirling': rao_stirling,
+        'td': td,
+        'shannon': shannon,
+    }
+
+    # Leinster-Cobbold 相似性敏感多样性 qD^Z
+    for q in orders:
+        if np.isinf(q):
+            zmax = np.zeros(n_papers)
+            np.maximum.at(zmax, rows, zp)
+            value = np.divide(1.0, zmax, out=np.zeros(n_papers), where=zmax > 0)
+        elif q == 1.0:
+            value = np.exp(-np.bincount(rows, weights=p * np.log(zp), minlength=n_papers))
+        else:
+            inner = np.bincount(rows, weights=p * zp ** (q - 1), minlength=n_papers)
+            value = np.divide(1.0, inner, out=np.zeros(n_papers), where=inner > 0) ** (1.0 / (q - 1))
+        measures[order_label(q)] = np.where(has_refs, value, 0.0)
+
+    return measures
+
+# ============================================================================
+#  主分析器类
+# ============================================================================
+class DiversityEngine:
+    def __init__(self, config=None):
+        self.config = config or load_config()
+        self.params = self.config.get('parameters', {})
+        self.orders = parse_orders(self.params.get('lc_orders', [0, 1, 2, 'inf']))
+        self.similarity_source = self.params.get('similarity_source', 'background')
+        self._field_index = None
+
+        # 创建输出目录
+        output_dir = Path(self.config['output']['diversity_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.output_dir = output_dir
+
+    def field_index(self):
+        """关键词熵使用的领域词表：diversity.parameters.taxonomy_path，
+        未配置时沿用 topic.parameters.taxonomy_path，使两个模块按同一词表映射关键词"""
+        if self._field_index is None:
+            taxonomy_path = self.params.get('taxonomy_path')
+            if taxonomy_path is None:
+                try:
+                    taxonomy_path = load_topic_config().get('parameters', {}).get('taxonomy_path')
+                except FileNotFoundError:
+                    taxonomy_path = None
+            self._field_index = load_field_index(taxonomy_path)
+        return self._field_index
+
+    def load_corpus(self, background_df=None, target_df=None, corpus=None):
+        """加载并解析语料（只做一次）；给定 corpus（共享语料）时直接取用其解析结果"""
+        cols = self.config['columns']
+        id_col, category_col, refs_col = cols['id'], cols['category'], cols['refs']
+
+        if corpus is not None:
+            log("使用共享语料")
+            background_df = corpus.background.to_frame({id_col: 'id', category_col: 'category'})
+            target_roles = {id_col: 'id', cols['journal']: 'journal', refs_col: 'refs'}
+            if cols.get('keywords'):
+                target_roles[cols['keywords']] = 'keywords'
+            target_df = corpus.target.to_frame(target_roles)
+        elif background_df is None or target_df is None:
+            project_root = Path(__file__).resolve().parent.parent
+            all_path = project_root / self.config['data_sources']['all_data']
+            target_path = project_root / self.config['data_sources']['target_data']
+
+            log(f"加载全量数据: {all_path}")
+            log(f"加载目标数据: {target_path}")
+            background_df = load_cleaned(all_path, [id_col, category_col])
+            target_df = load_cleaned(target_path, [c for c in (id_col, cols['journal'], refs_col, cols.get('keywords')) if c])
+
+        self.background_fingerprint = frame_fingerprint(background_df[[id_col, category_col]])
+        self.target_fingerprint = frame_fingerprint(target_df)
+
+        # 背景论文：DOI → 学科（CSR编码）
+        bg = background_df[[id_col, category_col]].dropna(subset=[id_col])
+        bg = bg.assign(**{id_col: bg[id_col].astype(str)}).drop_duplicates(subset=[id_col], keep='last')
+        self.encoding = CategoryEncoding.from_values(bg[category_col])
+        self.categories = self.encoding.categories
+        self.doi_index = pd.Index(bg[id_col].to_numpy())
+
+        # 目标论文：解析引用
+        self.target_df = target_df.reset_index(drop=True)
+        self.target_refs = self.target_df[refs_col].apply(parse_refs)
+
+        log(f"背景论文: {len(self.doi_index)} 篇, 学科数: {len(self.categories)}")
+        log(f"目标论文: {len(self.target_df)} 篇")
+        return self
+
+    def build_distribution(self):
+        """构建 目标论文 × 参考文献学科 计数矩阵（只构建一次）"""
+        exploded = self.target_refs.explode().dropna()
+        paper_rows = exploded.index.to_numpy()
+        bg_rows = self.doi_index.get_indexer(exploded.astype(str).to_numpy())
+        hit = bg_rows >= 0
+
+        owner, cats = self.encoding.gather(bg_rows[hit])
+        rows = paper_rows[hit][owner]
+        self.counts = sparse.csr_matrix((np.ones(len(cats)), (rows, cats)),
+                                        shape=(len(self.target_df), len(self.categories)))
+        log(f"引用学科分布: {self.counts.nnz} 个非零项, 命中引用 {int(hit.sum())}/{len(bg_rows)}")
+        return self.counts
+
+    def build_similarity(self):
+        """构建学科相似性矩阵
+
+        background: 背景论文自身的学科共现（interdisciplinary.py 的口径）
+        citing:     目标论文参考文献学科的共现（run_kua.py 的口径）
+        """
+        if self.similarity_source == 'citing':
+            presence = self.counts.copy()
+            presence.data[:] = 1.0
+            co_occurrence = co_occurrence_matrix(presence)
+        else:
+            co_occurrence = co_occurrence_matrix(self.encoding.incidence(), min_labels=2)
+        self.similarity = salton_similarity(co_occurrence)
+        return self.similarity
+
+    def paper_scores(self):
+        """论文级全部多样性指标"""
+        log("\n[阶段1] 构建论文-学科分布与相似性矩阵...")
+        self.build_distribution()
+        self.build_similarity()
+
+        log("[阶段2] 单次向量化计算全部指标...")
+        measures = diversity_measures(self.counts, self.similarity, self.orders)
+
+        cols = self.config['columns']
+        paper_df = pd.DataFrame({
+            'paper_id': self.target_df[cols['id']].astype(str),
+            'journal': self.target_df[cols['journal']].fillna('Unknown'),
+            'ref_count': np.asarray(self.counts.sum(axis=1)).ravel(),
+        })
+        for name, values in measures.items():
+            paper_df[name] = values
+
+        kw_entropy = self.keyword_entropy()
+        if kw_entropy is not None:
+            paper_df['keyword_entropy'] = kw_entropy
+        return paper_df
+
+    def keyword_entropy(self):
+        """关键词-领域香农熵（topic_analyzer 的口径），复用已加载的数据"""
+        keywords_col = self.config['columns'].get('keywords')
+        if not keywords_col or keywords_col not in self.target_df.columns:
+            return None
+        term_lists = [list(set(clean_author_keywords(v))) for v in self.target_df[keywords_col]]
+        counts, _ = paper_field_matrix(term_lists, self.field_index().field_dict)
+        return distribution_measures(counts)['entropy']
+
+    def run_analysis(self, background_df=None, target_df=None, corpus=None):
+        """运行统一多样性分析"""
+        try:
+            log("=" * 50)
+            log("开始统一跨学科性分析")
+            log("=" * 50)
+
+            self.load_corpus(background_df, target_df, corpus)
+
+            # 论文级指标按输入内容、代码版本与指标参数缓存，重跑时只重新按期刊聚合
+            cache = get_artifact_cache()
+            code = code_version(DiversityEngine, diversity_measures, CategoryEncoding,
+                                co_occurrence_matrix, salton_similarity, paper_field_matrix, distribution_measures,
+                                *MATCHER_CODE)
+            params = {'columns': self.config['columns'], 'orders': [order_label(q) for q in self.orders],
+                      'similarity_source': self.similarity_source, 'taxonomy': self.field_index().digest}
+            inputs = [self.background_fingerprint, self.target_fingerprint]
+            paper_df = cache.cached('diversity_paper_scores', self.paper_scores, inputs, params, code)
+
+            log("[阶段3] 按期刊聚合...")
+            metric_cols = [c for c in paper_df.columns if c not in ('paper_id', 'journal')]
+            journal_agg = paper_df.groupby('journal')[metric_cols].mean()
+            journal_agg.insert(0, 'paper_count', paper_df.groupby('journal').size())
+            journal_agg = journal_agg.sort_values('td', ascending=False).reset_index()
+
+            self.generate_outputs(paper_df, journal_agg)
+
+            log("\n✅ 分析完成！")
+            return journal_agg
+
+        except Exception as e:
+            log(f"[错误] 分析过程中出现异常: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def generate_outputs(self, paper_df, journal_agg):
+        """保存论文级与期刊级指标"""
+        paper_path = self.output_dir / "paper_diversity_scores.csv"
+        paper_df.to_csv(paper_path, index=False, encoding="utf-8-sig", float_format='%.4f')
+        log(f"📄 论文级指标已保存: {paper_path}")
+
+        journal_path = self.output_dir / "journal_diversity_scores.csv"
+        journal_agg.to_csv(journal_path, index=False, encoding="utf-8-sig", float_format='%.4f')
+        log(f"📄 期刊级指标已保存: {journal_path}")
+
+def main():
+    """主函数"""
+    try:
+        engine = DiversityEngine()
+        engine.run_analysis()
+    except Exception as e:
+        print(f"[错误] 程序执行失败: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    main()
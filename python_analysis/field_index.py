@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/field_index.py
+关键词 → 领域 映射索引
+由领域词表（data/taxonomy/*.json|yaml，如 FOS_dict）一次性编译：
+- 精确匹配：词条 → 领域位掩码哈希表（同一词条属于多个领域时合并为一个掩码）
+- 模糊匹配：按长度排序的词条 + 字符三元组倒排索引 + 长度/字符计数上界筛选候选，
+  只对候选词条计算 difflib 相似度，结果与逐词条比较完全一致
+- 映射缓存：进程内LRU + 按词典内容哈希命名的SQLite持久化存储
+- 短语扫描：全部词条编译为一个词级 Aho-Corasick 自动机，单次线性扫描摘要
+编译结果以二进制产物（pickle）缓存于 data/cache，按词表内容哈希命名，供所有进程复用。
+"""
+import difflib
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+import tempfile
+import time
+import numpy as np
+from pathlib import Path
+from collections import defaultdict, deque, OrderedDict
+
+try:
+    from python_analysis.artifact_cache import code_version
+except ImportError:
+    from artifact_cache import code_version
+
+FUZZY_THRESHOLD = 0.75
+# 编译产物格式版本，索引结构变化时递增，使旧产物失效
+ARTIFACT_VERSION = 1
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / 'cache'
+
+def char_trigrams(text):
+    """带首尾填充的字符三元组集合"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def taxonomy_digest(field_dict, threshold=FUZZY_THRESHOLD):
+    """领域词典内容（含模糊阈值）的哈希，词典任何修改都会改变该值"""
+    payload = json.dumps({'threshold': threshold, 'fields': field_dict}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class FieldIndex:
+    """领域词典索引
+
+    Attributes:
+        fields: 领域名列表
+        terms: 去重后的词条列表（首次出现顺序）
+        term_masks: 每个词条所属领域的位掩码（第i位对应 fields[i]）
+        exact: 词条 → 领域位掩码
+        order: 按长度升序排列的词条id，sorted_lengths / char_counts 与之对齐
+        trigram_index: 三元组 → 长度序位置数组（升序）
+        phrases: 全部词条编译成的 PhraseMatcher
+    """
+
+    def __init__(self, field_dict, threshold=FUZZY_THRESHOLD, version=None):
+        self.threshold = threshold
+        self.version = version
+        self.digest = taxonomy_digest(field_dict, threshold)
+        self.field_dict = field_dict
+        self.fields = list(field_dict.keys())
+        self.full_mask = (1 << len(self.fields)) - 1
+
+        masks = {}
+        for field_id, field in enumerate(self.fields):
+            for term in field_dict[field]:
+                masks[term] = masks.get(term, 0) | (1 << field_id)
+
+        self.terms = list(masks.keys())
+        self.term_masks = [masks[t] for t in self.terms]
+        self.exact = masks
+
+        # 按长度排序：长度上界只需检查一个连续区间，词表变大不拖慢单个关键词的查询
+        lengths = np.array([len(t) for t in self.terms], dtype=np.int64)
+        self.order = np.argsort(lengths, kind='stable')
+        self.sorted_lengths = lengths[self.order]
+
+        # 字符计数（用于 difflib 的 real_quick_ratio / quick_ratio 上界）
+        alphabet = sorted({ch for t in self.terms for ch in t})
+        self.char_index = {ch: i for i, ch in enumerate(alphabet)}
+        self.char_counts = np.zeros((len(self.terms), len(alphabet)), dtype=np.int32)
+        for pos, term_id in enumerate(self.order):
+            for ch in self.terms[term_id]:
+                self.char_counts[pos, self.char_index[ch]] += 1
+
+        # 字符三元组倒排索引
+        postings = defaultdict(list)
+        for pos, term_id in enumerate(self.order):
+            for gram in char_trigrams(self.terms[term_id]):
+                postings[gram].append(pos)
+        self.trigram_index = {g: np.array(ids, dtype=np.int64) for g, ids in postings.items()}
+
+        self.phrases = PhraseMatcher(self.terms)
+        self._mask_fields = {}
+
+    def state(self):
+        """可序列化的索引内容（只含内置类型与numpy数组，与模块导入路径无关）"""
+        return {
+            'artifact_version': ARTIFACT_VERSION,
+            'threshold': self.threshold,
+            'version': self.version,
+            'digest': self.digest,
+            'field_dict': self.field_dict,
+            'terms': self.terms,
+            'term_masks': self.term_masks,
+            'order': self.order,
+            'sorted_lengths': self.sorted_lengths,
+            'char_index': self.char_index,
+            'char_counts': self.char_counts,
+            'trigram_index': self.trigram_index,
+            'phrases': self.phrases.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """由 state() 的结果恢复索引，不重新编译"""
+        index = cls.__new__(cls)
+        index.threshold = state['threshold']
+        index.version = state['version']
+        index.digest = state['digest']
+        index.field_dict = state['field_dict']
+        index.fields = list(index.field_dict.keys())
+        index.full_mask = (1 << len(index.fields)) - 1
+        index.terms = state['terms']
+        index.term_masks = state['term_masks']
+        index.exact = dict(zip(index.terms, index.term_masks))
+        index.order = state['order']
+        index.sorted_lengths = state['sorted_lengths']
+        index.char_index = state['char_index']
+        index.char_counts = state['char_counts']
+        index.trigram_index = state['trigram_index']
+        index.phrases = PhraseMatcher.from_state(state['phrases'])
+        index._mask_fields = {}
+        return index
+
+    def mask_fields(self, mask):
+        """位掩码 → 领域名元组（按领域顺序）"""
+        fields = self._mask_fields.get(mask)
+        if fields is None:
+            fields = tuple(f for i, f in enumerate(self.fields) if mask >> i & 1)
+            self._mask_fields[mask] = fields
+        return fields
+
+    def candidates(self, keyword):
+        """返回可能达到阈值的词条id，按共享三元组数量降序
+
+        上界与 difflib.SequenceMatcher 的 real_quick_ratio / quick_ratio 相同，
+        真实相似度不超过上界，因此被排除的词条不可能达到阈值。
+        """
+        k, t = len(keyword), self.threshold
+        # 2·min(l, k) / (l + k) ≥ t  ⇔  t·k / (2 - t) ≤ l ≤ (2 - t)·k / t，两端放宽1后再精确判断
+        lo = np.searchsorted(self.sorted_lengths, int(np.floor(t * k / (2.0 - t))) - 1, side='left')
+        hi = np.searchsorted(self.sorted_lengths, int(np.ceil((2.0 - t) * k / t)) + 1, side='right')
+        lengths = self.sorted_lengths[lo:hi]
+
+        total = lengths + k
+        length_bound = 2.0 * np.minimum(lengths, k) / total
+
+        kw_counts = np.zeros(self.char_counts.shape[1], dtype=np.int32)
+        for ch in keyword:
+            col = self.char_index.get(ch)
+            if col is not None:
+                kw_counts[col] += 1
+        char_bound = 2.0 * np.minimum(self.char_counts[lo:hi], kw_counts).sum(axis=1) / total
+
+        pos = np.flatnonzero((length_bound >= t) & (char_bound >= t))
+        if pos.size == 0:
+            return pos
+
+        shared = np.zeros(hi - lo, dtype=np.int64)
+        for gram in char_trigrams(keyword):
+            posting = self.trigram_index.get(gram)
+            if posting is not None:
+                a, b = np.searchsorted(posting, (lo, hi))
+                shared[posting[a:b] - lo] += 1
+        pos = pos[np.argsort(-shared[pos], kind='stable')]
+        return self.order[pos + lo]
+
+    def fuzzy_match(self, keyword):
+        """模糊匹配：任一词条相似度 ≥ 阈值即命中该领域"""
+        matched = 0
+        for term_id in self.candidates(keyword):
+            mask = self.term_masks[term_id]
+            if matched | mask == matched:
+                continue
+            ratio = difflib.SequenceMatcher(None, keyword, self.terms[term_id]).ratio()
+            if ratio >= self.threshold:
+                matched |= mask
+            if matched == self.full_mask:
+                break
+        return list(self.mask_fields(matched))
+
+    def match(self, keyword):
+        """映射关键词到领域：先精确匹配，未命中再模糊匹配"""
+        keyword = keyword.lower().strip()
+        mask = self.exact.get(keyword)
+        if mask is not None:
+            return list(self.mask_fields(mask))
+        return self.fuzzy_match(keyword)
+
+# ============================================================================
+#  多词短语匹配（Aho-Corasick）
+# ============================================================================
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def phrase_tokens(text):
+    """小写并按非字母数字字符切分为词（"short-term memory" → short / term / memory）"""
+    return _TOKEN_RE.findall(str(text).lower())
+
+class PhraseMatcher:
+    """词级 Aho-Corasick 自动机
+
+    所有短语按词序列插入字典树，BFS 补全失配指针并合并输出，
+    对一段文本只需线性扫描一次即可找出全部短语出现（含相互重叠的短语）。
+    """
+
+    def __init__(self, phrases):
+        self.phrases = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for phrase in dict.fromkeys(phrases):
+            tokens = phrase_tokens(phrase)
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                nxt = self.goto[state].get(token)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][token] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(len(self.phrases))
+            self.phrases.append(phrase)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and token not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(token, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def scan(self, tokens):
+        """扫描词序列，逐个产出 (结束位置, 短语id)"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for pos, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for phrase_id in output[state]:
+                yield pos, phrase_id
+
+    def find(self, text):
+        """返回文本中出现的全部短语（按出现顺序，可重复）"""
+        if text is None or (isinstance(text, float) and np.isnan(text)):
+            return []
+        return [self.phrases[pid] for _, pid in self.scan(phrase_tokens(text))]
+
+    def state(self):
+        return {'phrases': self.phrases, 'goto': self.goto, 'fail': self.fail, 'output': self.output}
+
+    @classmethod
+    def from_state(cls, state):
+        matcher = cls.__new__(cls)
+        matcher.phrases = state['phrases']
+        matcher.goto = state['goto']
+        matcher.fail = state['fail']
+        matcher.output = state['output']
+        return matcher
+
+# ============================================================================
+#  领域词表加载与编译产物缓存
+# ============================================================================
+def load_taxonomy(path):
+    """读取外部领域词表文件（.json / .yaml / .yml）
+
+    文件可以是 {"version": ..., "fields": {领域: [词条, ...]}}，
+    也可以直接是 {领域: [词条, ...]}（此时版本为 None）。
+
+    Returns:
+        (领域词典, 版本号)
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"领域词表不存在: {path}")
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in ('.yaml', '.yml'):
+            import yaml
+            doc = yaml.safe_load(f)
+        else:
+            doc = json.load(f)
+
+    if not isinstance(doc, dict):
+        raise ValueError(f"领域词表格式错误（应为字典）: {path}")
+    if 'fields' in doc:
+        fields, version = doc['fields'], doc.get('version')
+    else:
+        fields, version = doc, None
+    field_dict = {str(field): [str(t).lower().strip() for t in terms] for field, terms in fields.items()}
+    return field_dict, version
+
+def _read_artifact(path):
+    """读取编译产物，格式版本不符或文件损坏时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('artifact_version') != ARTIFACT_VERSION:
+        return None
+    return FieldIndex.from_state(state)
+
+def _write_artifact(index, path):
+    """原子写入编译产物（先写临时文件再替换），多进程并发编译互不干扰
+
+    写入是尽力而为的：缓存目录不可写（如只读检出）时跳过，只是下次需要重新编译。
+    """
+    tmp = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(index.state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None and os.path.exists(tmp):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+def _artifact_path(cache_dir, key):
+    key = hashlib.sha256(f"{ARTIFACT_VERSION}:{key}".encode('utf-8')).hexdigest()
+    return Path(cache_dir) / f"taxonomy_{key[:16]}.pkl"
+
+def compile_taxonomy(field_dict, cache_dir=DEFAULT_CACHE_DIR, version=None, threshold=FUZZY_THRESHOLD):
+    """编译领域词典；相同内容的编译产物已存在时直接加载"""
+    path = _artifact_path(cache_dir, taxonomy_digest(field_dict, threshold)) if cache_dir else None
+    index = _read_artifact(path) if path is not None and path.exists() else None
+    if index is None:
+        index = FieldIndex(field_dict, threshold=threshold, version=version)
+        if path is not None:
+            _write_artifact(index, path)
+    else:
+        # 沿用调用方的词典对象，保证按对象复用索引
+        index.field_dict = field_dict
+    return _register(field_dict, index)
+
+def load_compiled_taxonomy(path, cache_dir=DEFAULT_CACHE_DIR, threshold=FUZZY_THRESHOLD):
+    """加载外部词表的编译产物
+
+    产物按词表文件字节内容哈希命名：文件未变时直接反序列化，
+    不再解析词表、不再重建索引；文件一旦修改即重新编译。
+    """
+    path = Path(path)
+    raw = path.read_bytes() if path.exists() else None
+    if raw is None:
+        raise FileNotFoundError(f"领域词表不存在: {path}")
+
+    artifact = None
+    if cache_dir:
+        artifact = _artifact_path(cache_dir, f"file:{threshold}:{hashlib.sha256(raw).hexdigest()}")
+    index = _read_artifact(artifact) if artifact is not None and artifact.exists() else None
+    if index is None:
+        field_dict, version = load_taxonomy(path)
+        index = FieldIndex(field_dict, threshold=threshold, version=version)
+        if artifact is not None:
+            _write_artifact(index, artifact)
+    return _register(index.field_dict, index)
+
+_INDEXES = {}
+
+def _register(field_dict, index):
+    _INDEXES[id(field_dict)] = (field_dict, index)
+    return index
+
+def get_field_index(field_dict):
+    """按词典对象复用已编译的索引（词典编译后不应再被修改）"""
+    entry = _INDEXES.get(id(field_dict))
+    if entry is None or entry[0] is not field_dict:
+        return compile_taxonomy(field_dict)
+    return entry[1]
+
+def get_phrase_matcher(field_dict):
+    """按词典对象复用已编译的短语自动机"""
+    return get_field_index(field_dict).phrases
+
+# ============================================================================
+#  关键词 → 领域 映射缓存
+# ============================================================================
+class KeywordFieldCache:
+    """关键词 → 领域 的记忆缓存
+
+    进程内为容量受限的LRU；给定 cache_dir 时以SQLite文件持久化，
+    文件名包含词典哈希与 matcher_version()，词典或匹配代码改动后旧缓存不再被使用。其他词典（或其他进程）的缓存文件
+    不在这里删除，过期文件由 prune_keyword_caches 显式清理。
+    """
+
+    def __init__(self, field_dict, cache_dir=None, maxsize=50000, flush_every=1000):
+        self.index = get_field_index(field_dict)
+        self.digest = self.index.digest
+        self.maxsize = maxsize
+        self.flush_every = flush_every
+
+        self._lru = OrderedDict()
+        self._pending = {}
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+        self.db_path = None
+        self._conn = None
+        if cache_dir:
+            cache_dir = Path(cache_dir)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            # 文件名同时包含词典哈希与匹配代码版本，任一变化都不会读到旧映射
+            self.db_path = cache_dir / f"keyword_fields_{self.digest[:16]}_{matcher_version()[:8]}.sqlite"
+            self._conn = sqlite3.connect(str(self.db_path))
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS keyword_fields (keyword TEXT PRIMARY KEY, fields TEXT NOT NULL)"
+            )
+            try:
+                os.utime(self.db_path)  # 只读命中也刷新最近使用时间，避免被 prune_keyword_caches 误删
+            except OSError:
+                pass
+
+    def _remember(self, keyword, fields):
+        self._lru[keyword] = fields
+        self._lru.move_to_end(keyword)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, keyword):
+        """返回关键词对应的领域元组"""
+        keyword = keyword.lower().strip()
+
+        fields = self._lru.get(keyword)
+        if fields is not None:
+            self._lru.move_to_end(keyword)
+            self.hits += 1
+            return fields
+
+        if self._conn is not None:
+            fields = self._pending.get(keyword)
+            if fields is None:
+                row = self._conn.execute(
+                    "SELECT fields FROM keyword_fields WHERE keyword = ?", (keyword,)
+                ).fetchone()
+                if row is not None:
+                    fields = tuple(json.loads(row[0]))
+            if fields is not None:
+                self.disk_hits += 1
+                self._remember(keyword, fields)
+                return fields
+
+        self.misses += 1
+        fields = tuple(self.index.match(keyword))
+        self._remember(keyword, fields)
+        if self._conn is not None:
+            self._pending[keyword] = fields
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+        return fields
+
+    def flush(self):
+        """把新计算的映射写入磁盘"""
+        if self._conn is None or not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO keyword_fields (keyword, fields) VALUES (?, ?)",
+            [(k, json.dumps(list(v), ensure_ascii=False)) for k, v in self._pending.items()]
+        )
+        self._conn.commit()
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            'lookups': total,
+            'memory_hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.disk_hits) / total if total else 0.0,
+            'size': len(self._lru),
+        }
+
+    def stats_line(self):
+        st = self.stats()
+        return (f"关键词映射缓存: 查询 {st['lookups']} 次, 内存命中 {st['memory_hits']}, "
+                f"磁盘命中 {st['disk_hits']}, 计算 {st['misses']}, 淘汰 {st['evictions']}, "
+                f"命中率 {st['hit_rate']:.1%}")
+
+# 决定 关键词 → 领域 映射结果的代码；分析模块把它并入产物缓存的代码版本
+MATCHER_CODE = (char_trigrams, phrase_tokens, FieldIndex, PhraseMatcher, KeywordFieldCache)
+_MATCHER_VERSION = None
+
+def matcher_version():
+    """匹配代码（精确 / 模糊匹配、短语自动机、映射缓存）的源码哈希"""
+    global _MATCHER_VERSION
+    if _MATCHER_VERSION is None:
+        _MATCHER_VERSION = code_version(*MATCHER_CODE)
+    return _MATCHER_VERSION
+
+def prune_keyword_caches(cache_dir=DEFAULT_CACHE_DIR, max_age_days=30):
+    """删除超过 max_age_days 天未修改的关键词映射缓存文件（尽力而为）
+
+    正被其他进程打开的文件（Windows 上无法删除）或无权限的文件会被跳过。
+    Returns:
+        删除的文件数
+    """
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for path in Path(cache_dir).glob("keyword_fields_*.sqlite"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+_CACHES = {}
+
+def get_keyword_cache(field_dict):
+    """取词典对应的映射缓存（未配置时为纯内存LRU）"""
+    entry = _CACHES.get(id(field_dict))
+    if entry is None or entry[0] is not field_dict:
+        entry = (field_dict, KeywordFieldCache(field_dict))
+        _CACHES[id(field_dict)] = entry
+    return entry[1]
+
+def configure_keyword_cache(field_dict, cache_dir=None, maxsize=50000):
+    """为词典配置（可持久化的）映射缓存，替换已有缓存"""
+    entry = _CACHES.get(id(field_dict))
+    if entry is not None and entry[0] is field_dict:
+        entry[1].close()
+    cache = KeywordFieldCache(field_dict, cache_dir=cache_dir, maxsize=maxsize)
+    _CACHES[id(field_dict)] = (field_dict, cache)
+    return cache
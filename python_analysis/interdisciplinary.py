@@ -12,6 +12,19 @@ import matplotlib.pyplot as plt
 from pathlib import Path
 from collections import Counter
 
+try:
+    from python_analysis.category_encoding import (
+        CategoryEncoding, split_categories, co_occurrence_matrix, salton_similarity
+    )
+    from python_analysis.artifact_cache import code_version, frame_fingerprint, get_artifact_cache
+    from python_analysis.columnar import load_cleaned
+except ImportError:
+    from category_encoding import (
+        CategoryEncoding, split_categories, co_occurrence_matrix, salton_similarity
+    )
+    from artifact_cache import code_version, frame_fingerprint, get_artifact_cache
+    from columnar import load_cleaned
+
 plt.rcParams['font.sans-serif'] = ['SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
@@ -39,72 +52,24 @@ class InterdisciplinaryAnalyzer:
         self.output_dir = output_dir
 
     def parse_categories(self, category_str):
-        """解析分类字符串"""
-        if pd.isna(category_str):
-            return []
-        
-        try:
-            if isinstance(category_str, str):
-                cleaned = category_str.strip()
-                if cleaned.startswith('[') and cleaned.endswith(']'):
-                    return ast.literal_eval(cleaned)
-                else:
-                    separators = [';', '|', '/']
-                    for sep in separators:
-                        if sep in cleaned:
-                            return [cat.strip() for cat in cleaned.split(sep) if cat.strip()]
-                    return [cleaned]
-        except:
-            pass
-        
-        return []
+        """解析分类字符串：按 "; " 拆分多标签WoS学科"""
+        return split_categories(category_str)
 
     def calculate_similarity_matrix(self, papers_data):
         """计算学科分类间的相似性矩阵"""
         log("计算学科分类相似性矩阵...")
-        
-        all_categories = set()
-        for categories in papers_data.values():
-            all_categories.update(categories)
-        
-        all_categories = sorted(list(all_categories))
-        
-        n = len(all_categories)
-        co_occurrence = np.zeros((n, n))
-        cat_to_idx = {cat: i for i, cat in enumerate(all_categories)}
-        
-        for categories in papers_data.values():
-            if len(categories) < 2:
-                continue
-            
-            for i in range(len(categories)):
-                idx_i = cat_to_idx[categories[i]]
-                co_occurrence[idx_i, idx_i] += 1
-                
-                for j in range(i+1, len(categories)):
-                    idx_j = cat_to_idx[categories[j]]
-                    co_occurrence[idx_i, idx_j] += 1
-                    co_occurrence[idx_j, idx_i] += 1
-        
-        similarity = np.zeros((n, n))
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    similarity[i, j] = 1.0
-                else:
-                    numerator = np.dot(co_occurrence[i, :], co_occurrence[j, :])
-                    denom_i = np.sqrt(np.sum(co_occurrence[i, :] ** 2))
-                    denom_j = np.sqrt(np.sum(co_occurrence[j, :] ** 2))
-                    
-                    if denom_i > 0 and denom_j > 0:
-                        similarity[i, j] = numerator / (denom_i * denom_j)
-                    else:
-                        similarity[i, j] = 0.0
-        
-        self.all_categories = all_categories
-        self.cat_to_idx = cat_to_idx
+
+        encoding = papers_data if isinstance(papers_data, CategoryEncoding) \
+            else CategoryEncoding.from_values(list(papers_data.values()))
+
+        co_occurrence = co_occurrence_matrix(encoding.incidence(), min_labels=2)
+        similarity = salton_similarity(co_occurrence)
+
+        self.all_categories = encoding.categories
+        self.cat_to_idx = encoding.category_index
         self.similarity_matrix = similarity
-        
+
+        log(f"  学科数: {len(self.all_categories)}")
         return similarity
 
     def calculate_rao_stirling_diversity(self, categories):
@@ -120,14 +85,9 @@ class InterdisciplinaryAnalyzer:
             if cat in self.cat_to_idx:
                 prob_vector[self.cat_to_idx[cat]] = count / total
         
-        diversity = 0.0
-        n = len(self.all_categories)
-        
-        for i in range(n):
-            for j in range(n):
-                similarity = self.similarity_matrix[i, j]
-                diversity += (1 - similarity) * prob_vector[i] * prob_vector[j]
-        
+        similarity_weighted = self.similarity_matrix @ prob_vector
+        diversity = float(prob_vector.sum() ** 2 - prob_vector @ similarity_weighted)
+
         return diversity
 
     def calculate_td_index(self, categories):
@@ -146,15 +106,74 @@ class InterdisciplinaryAnalyzer:
         else:
             return round(scores * 5, 1)
 
-    def run_analysis(self, background_df=None, target_df=None):
-        """运行跨学科性分析"""
+    def build_knowledge_base(self, background_df, id_col, category_col):
+        """阶段1: 构建学科分类知识库与学科相似性矩阵"""
+        log("\n[阶段1] 构建学科分类知识库...")
+        known = background_df.dropna(subset=[id_col])
+        known = known.assign(**{id_col: known[id_col].astype(str)}) \
+            .drop_duplicates(subset=[id_col], keep='last')
+        encoding = CategoryEncoding.from_values(known[category_col])
+        paper_categories = {
+            paper_id: encoding.names(i)
+            for i, paper_id in enumerate(known[id_col])
+            if encoding.indptr[i + 1] > encoding.indptr[i]
+        }
+        
+        log(f"  处理 {len(paper_categories)} 篇论文的分类信息")
+        
+        # 计算学科相似性矩阵
+        similarity = self.calculate_similarity_matrix(encoding)
+        return {'paper_categories': paper_categories, 'categories': encoding.categories, 'similarity': similarity}
+
+    def load_knowledge_base(self, knowledge):
+        """使用（可能来自缓存的）知识库"""
+        self.all_categories = knowledge['categories']
+        self.cat_to_idx = {cat: i for i, cat in enumerate(self.all_categories)}
+        self.similarity_matrix = knowledge['similarity']
+
+    def score_papers(self, target_df, paper_categories, id_col, journal_col, refs_col):
+        """阶段2: 计算目标论文的TD得分"""
+        log("\n[阶段2] 分析目标期刊数据...")
+        paper_results = []
+        
+        target_df = target_df.copy()
+        target_df['parsed_refs'] = target_df[refs_col].apply(
+            lambda x: list(x) if isinstance(x, (list, np.ndarray))
+            else ast.literal_eval(x) if isinstance(x, str) and x.startswith('[') else []
+        )
+        
+        for idx, row in target_df.iterrows():
+            paper_id = str(row[id_col])
+            journal = row[journal_col]
+            refs = row['parsed_refs']
+            
+            ref_categories = []
+            for ref_id in refs:
+                if ref_id in paper_categories:
+                    ref_categories.extend(paper_categories[ref_id])
+            
+            td_score = self.calculate_td_index(ref_categories)
+            
+            paper_results.append({
+                'paper_id': paper_id,
+                'journal': journal,
+                'td_score': td_score
+            })
+            
+            if (idx + 1) % 100 == 0:
+                log(f"  处理进度: {idx + 1}/{len(target_df)}")
+        
+        return pd.DataFrame(paper_results)
+
+    def run_analysis(self, background_df=None, target_df=None, corpus=None):
+        """运行跨学科性分析；给定 corpus（共享语料）时不再读取数据文件"""
         try:
             log("=" * 50)
             log("开始跨学科性分析")
             log("=" * 50)
             
             # 加载数据
-            if background_df is None or target_df is None:
+            if corpus is None and (background_df is None or target_df is None):
                 project_root = Path(__file__).parent.parent
                 all_path = project_root / self.config['data_sources']['all_data']
                 target_path = project_root / self.config['data_sources']['target_data']
@@ -162,15 +181,22 @@ class InterdisciplinaryAnalyzer:
                 log(f"加载全量数据: {all_path}")
                 log(f"加载目标数据: {target_path}")
                 
-                background_df = pd.read_csv(all_path)
-                target_df = pd.read_csv(target_path)
-            
             # 获取列名
             id_col = self.config['columns']['id']
             journal_col = self.config['columns']['journal']
             category_col = self.config['columns']['category']
             refs_col = self.config['columns']['refs']
             
+            if corpus is not None:
+                log("使用共享语料")
+                roles = {id_col: 'id', journal_col: 'journal', category_col: 'category', refs_col: 'refs'}
+                background_df = corpus.background.to_frame(roles)
+                target_df = corpus.target.to_frame(roles)
+            elif background_df is None or target_df is None:
+                columns = [id_col, journal_col, category_col, refs_col]
+                background_df = load_cleaned(all_path, columns)
+                target_df = load_cleaned(target_path, columns)
+            
             # 检查必要列
             required_cols = [id_col, journal_col, category_col, refs_col]
             missing_cols = [col for col in required_cols if col not in background_df.columns]
@@ -183,58 +209,23 @@ class InterdisciplinaryAnalyzer:
             
             log(f"使用列名: ID={id_col}, 期刊={journal_col}, 分类={category_col}, 引用={refs_col}")
             
-            # 阶段1: 构建学科分类知识库
-            log("\n[阶段1] 构建学科分类知识库...")
-            paper_categories = {}
+            # 知识库（学科相似性）与论文级TD得分按输入内容缓存，重跑时只重新聚合
+            cache = get_artifact_cache()
+            code = code_version(InterdisciplinaryAnalyzer.build_knowledge_base,
+                                InterdisciplinaryAnalyzer.score_papers, CategoryEncoding,
+                                co_occurrence_matrix, salton_similarity)
+            column_params = {'id': id_col, 'journal': journal_col, 'category': category_col, 'refs': refs_col}
+            kb_key = cache.key('td_knowledge_base', [frame_fingerprint(background_df)], column_params, code)
+            scores_key = cache.key('td_paper_scores', [kb_key, frame_fingerprint(target_df)], column_params, code)
             
-            for _, row in background_df.iterrows():
-                paper_id = str(row[id_col])
-                if pd.isna(paper_id):
-                    continue
-                
-                categories = self.parse_categories(row[category_col])
-                if categories:
-                    paper_categories[paper_id] = categories
-            
-            log(f"  处理 {len(paper_categories)} 篇论文的分类信息")
-            
-            # 计算学科相似性矩阵
-            self.calculate_similarity_matrix(paper_categories)
-            
-            # 阶段2: 分析目标数据
-            log("\n[阶段2] 分析目标期刊数据...")
-            paper_results = []
-            
-            target_df = target_df.copy()
-            target_df['parsed_refs'] = target_df[refs_col].apply(
-                lambda x: ast.literal_eval(x) if isinstance(x, str) and x.startswith('[') else []
-            )
-            
-            td_scores = []
-            for idx, row in target_df.iterrows():
-                paper_id = str(row[id_col])
-                journal = row[journal_col]
-                refs = row['parsed_refs']
-                
-                ref_categories = []
-                for ref_id in refs:
-                    if ref_id in paper_categories:
-                        ref_categories.extend(paper_categories[ref_id])
-                
-                td_score = self.calculate_td_index(ref_categories)
-                td_scores.append(td_score)
-                
-                paper_results.append({
-                    'paper_id': paper_id,
-                    'journal': journal,
-                    'td_score': td_score
-                })
-                
-                if (idx + 1) % 100 == 0:
-                    log(f"  处理进度: {idx + 1}/{len(target_df)}")
+            def paper_level_scores():
+                knowledge = cache.fetch('td_knowledge_base', kb_key, lambda: self.build_knowledge_base(
+                    background_df, id_col, category_col))
+                self.load_knowledge_base(knowledge)
+                return self.score_papers(target_df, knowledge['paper_categories'], id_col, journal_col, refs_col)
             
-            # 创建论文结果DataFrame
-            paper_df = pd.DataFrame(paper_results)
+            paper_df = cache.fetch('td_paper_scores', scores_key, paper_level_scores)
+            td_scores = paper_df['td_score'].tolist() if 'td_score' in paper_df.columns else []
             
             # 计算归一化百分制分数
             log("\n[阶段3] 计算归一化百分制分数...")
@@ -268,6 +259,7 @@ class InterdisciplinaryAnalyzer:
             log(f"  1. journal_td_original.png - 原始TD得分柱状图")
             log(f"  2. journal_td_percent.png - 百分制得分柱状图")
             log(f"  3. journal_percent_scores.csv - 百分制得分列表")
+            return journal_agg
             
         except Exception as e:
             log(f"[错误] 分析过程中出现异常: {e}")
@@ -11,6 +11,11 @@ import matplotlib.pyplot as plt
 import ast
 from typing import Tuple, List, Dict
 
+try:
+    from python_analysis.category_encoding import CategoryEncoding, salton_similarity
+except ImportError:
+    from category_encoding import CategoryEncoding, salton_similarity
+
 
 class InterdisciplinaryAnalyzer:
     """跨学科性分析器"""
@@ -40,17 +45,30 @@ class InterdisciplinaryAnalyzer:
         self.top10_data = None
         self.df_top10 = None
         self.doi_to_category_map = {}
+        self.category_encoding = None
         
         print(f"根目录: {self.root_dir}")
         print(f"输出目录: {self.output_dir}")
     
-    def load_data(self) -> bool:
+    def load_data(self, corpus=None) -> bool:
         """
         加载数据文件
         
+        Args:
+            corpus: 共享语料；给定时直接取用其全量数据与目标数据
+        
         Returns:
             bool: 是否成功加载
         """
+        if corpus is not None:
+            self.df = corpus.background.to_frame({'DOI': 'id', 'Source Title': 'journal', 'citing': 'refs'})
+            self.top10_data = corpus.target.to_frame({'DOI': 'id', 'Source Title': 'journal',
+                                                      'WoS Categories': 'category'})
+            print(f"使用共享语料")
+            print(f"  - 全量数据: {self.df.shape}")
+            print(f"  - Top10数据: {self.top10_data.shape}")
+            return True
+        
         try:
             # 加载数据
             df_path = os.path.join(self.data_dir, 'data_with_citing.csv')
@@ -81,6 +99,8 @@ class InterdisciplinaryAnalyzer:
         self.df['citing'] = self.df['citing'].fillna('')
         
         def safe_literal_eval(x):
+            if isinstance(x, list):
+                return x
             if pd.isna(x) or x == '' or x == '[]':
                 return []
             try:
@@ -102,41 +122,49 @@ class InterdisciplinaryAnalyzer:
         print(f"  - 过滤后论文数: {self.df_top10.shape[0]}")
         print(f"  - Top10期刊数: {len(top10_journals)}")
     
-    def build_category_mapping(self):
-        """建立DOI到学科的映射"""
-        for _, row in self.top10_data.iterrows():
-            doi = str(row.get('DOI', '')).strip()
-            category = row.get('WoS Categories', '')
-            
-            if doi and doi.lower() != 'nan' and pd.notna(category):
-                # 标准化DOI格式
-                if doi.startswith('https://doi.org/'):
-                    doi = doi.replace('https://doi.org/', '')
-                elif doi.startswith('http://doi.org/'):
-                    doi = doi.replace('http://doi.org/', '')
-                elif doi.startswith('doi:'):
-                    doi = doi.replace('doi:', '')
-                
-                self.doi_to_category_map[doi] = str(category).strip()
-        
-        print(f"🗺️  学科映射建立完成: {len(self.doi_to_category_map)}个")
-    
-    def doi_to_categories(self, doi: str) -> List[str]:
-        """根据DOI返回学科列表"""
-        if not doi or pd.isna(doi):
-            return []
-        
+    @staticmethod
+    def normalize_doi(doi) -> str:
+        """标准化DOI格式"""
         doi_str = str(doi).strip()
-        # 标准化DOI格式
         if doi_str.startswith('https://doi.org/'):
             doi_str = doi_str.replace('https://doi.org/', '')
         elif doi_str.startswith('http://doi.org/'):
             doi_str = doi_str.replace('http://doi.org/', '')
         elif doi_str.startswith('doi:'):
             doi_str = doi_str.replace('doi:', '')
+        return doi_str
+
+    def build_category_mapping(self):
+        """建立DOI到学科的映射
+
+        WoS Categories 按 "; " 拆分为规范学科，以CSR学科id编码保存，
+        doi_to_category_map 记录 DOI → 编码中的行号。
+        """
+        dois = self.top10_data.get('DOI', pd.Series('', index=self.top10_data.index))
+        categories = self.top10_data.get('WoS Categories', pd.Series(np.nan, index=self.top10_data.index))
+        self.category_encoding = CategoryEncoding.from_values(categories)
+        lengths = self.category_encoding.lengths
+
+        for row_id, doi in enumerate(dois):
+            doi = str(doi).strip()
+            if doi and doi.lower() not in ('nan', 'none') and lengths[row_id] > 0:
+                self.doi_to_category_map[self.normalize_doi(doi)] = row_id
         
-        category = self.doi_to_category_map.get(doi_str)
-        return [category] if category else []
+        print(f"🗺️  学科映射建立完成: {len(self.doi_to_category_map)}个, "
+              f"规范学科 {self.category_encoding.n_categories} 个")
+    
+    def doi_to_category_ids(self, doi) -> np.ndarray:
+        """根据DOI返回学科id数组"""
+        if not doi or pd.isna(doi):
+            return self.category_encoding.indices[:0]
+        row_id = self.doi_to_category_map.get(self.normalize_doi(doi))
+        if row_id is None:
+            return self.category_encoding.indices[:0]
+        return self.category_encoding.row(row_id)
+    
+    def doi_to_categories(self, doi: str) -> List[str]:
+        """根据DOI返回学科列表"""
+        return [self.category_encoding.categories[c] for c in self.doi_to_category_ids(doi)]
     
     def get_reference_categories_with_frequency(self, doi_list: List[str]) -> List[str]:
         """获取包含频率的学科列表"""
@@ -162,84 +190,51 @@ class InterdisciplinaryAnalyzer:
         
         return list(set(all_categories))
     
+    def reference_category_ids(self, doi_list: List[str]) -> np.ndarray:
+        """获取包含频率的学科id数组"""
+        if not doi_list:
+            return self.category_encoding.indices[:0]
+        return np.concatenate([self.doi_to_category_ids(doi) for doi in doi_list])
+    
     def build_co_occurrence_matrix(self, df: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
         """构建学科共现矩阵"""
-        all_categories = set()
-        for doi_list in df['citing']:
-            categories = self.get_reference_categories(doi_list)
-            all_categories.update(categories)
-        
-        all_categories = sorted(list(all_categories))
+        all_categories = self.category_encoding.categories
         n_categories = len(all_categories)
-        category_index = {cat: idx for idx, cat in enumerate(all_categories)}
         
         co_occurrence = np.zeros((n_categories, n_categories))
         
         for doi_list in df['citing']:
-            categories = self.get_reference_categories(doi_list)
-            for i in range(len(categories)):
-                idx_i = category_index[categories[i]]
-                co_occurrence[idx_i, idx_i] += 1
-                
-                for j in range(i + 1, len(categories)):
-                    idx_j = category_index[categories[j]]
-                    co_occurrence[idx_i, idx_j] += 1
-                    co_occurrence[idx_j, idx_i] += 1
+            ids = np.unique(self.reference_category_ids(doi_list))
+            if ids.size:
+                co_occurrence[np.ix_(ids, ids)] += 1
         
         return co_occurrence, all_categories
     
     def calculate_salton_similarity(self, co_occurrence_matrix: np.ndarray) -> np.ndarray:
         """计算Salton余弦相似性矩阵"""
-        n = co_occurrence_matrix.shape[0]
-        similarity_matrix = np.zeros((n, n))
-        
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    similarity_matrix[i, j] = 1.0
-                else:
-                    numerator = 0.0
-                    for k in range(n):
-                        numerator += co_occurrence_matrix[i, k] * co_occurrence_matrix[j, k]
-                    
-                    denominator_i = np.sqrt(np.sum(co_occurrence_matrix[i, :]**2))
-                    denominator_j = np.sqrt(np.sum(co_occurrence_matrix[j, :]**2))
-                    denominator = denominator_i * denominator_j
-                    
-                    if denominator > 0:
-                        similarity_matrix[i, j] = numerator / denominator
-                    else:
-                        similarity_matrix[i, j] = 0.0
-        
-        return similarity_matrix
+        return salton_similarity(co_occurrence_matrix)
     
-    def calculate_td_for_paper(self, paper_categories: List[str], 
+    def calculate_td_for_paper(self, paper_categories, 
                               similarity_matrix: np.ndarray, 
                               all_categories: List[str]) -> float:
-        """计算单篇论文的TD指标"""
-        if not paper_categories:
+        """计算单篇论文的TD指标
+
+        paper_categories 可以是学科名列表，也可以是学科id数组（含重复，表示频率）
+        """
+        if len(paper_categories) == 0:
             return 1.0
         
-        category_index = {cat: idx for idx, cat in enumerate(all_categories)}
+        if isinstance(paper_categories, np.ndarray):
+            ids = paper_categories.astype(np.int64)
+        else:
+            category_index = self.category_encoding.category_index
+            ids = np.array([category_index[c] for c in paper_categories if c in category_index], dtype=np.int64)
         
         # 计算学科分布
-        category_counts = {}
-        for cat in paper_categories:
-            category_counts[cat] = category_counts.get(cat, 0) + 1
-        
-        total_refs = len(paper_categories)
-        p_vector = np.zeros(len(all_categories))
-        
-        for cat, count in category_counts.items():
-            if cat in category_index:
-                idx = category_index[cat]
-                p_vector[idx] = count / total_refs
+        p_vector = np.bincount(ids, minlength=len(all_categories)) / len(paper_categories)
         
         # 计算TD指标
-        sum_term = 0.0
-        for i in range(len(all_categories)):
-            for j in range(len(all_categories)):
-                sum_term += similarity_matrix[i, j] * p_vector[i] * p_vector[j]
+        sum_term = float(p_vector @ similarity_matrix @ p_vector)
         
         if sum_term > 0:
             return 1.0 / sum_term
@@ -264,7 +259,7 @@ class InterdisciplinaryAnalyzer:
         td_scores = []
         
         for idx, row in df.iterrows():
-            paper_categories = self.get_reference_categories_with_frequency(row['citing'])
+            paper_categories = self.reference_category_ids(row['citing'])
             td_score = self.calculate_td_for_paper(paper_categories, similarity_matrix, all_categories)
             td_scores.append(td_score)
         
@@ -339,12 +334,12 @@ class InterdisciplinaryAnalyzer:
         
         plt.show()
     
-    def run_analysis(self):
+    def run_analysis(self, corpus=None):
         """运行完整的分析流程"""
         print("跨学科性(TD)分析开始")
         
         # 1. 加载数据
-        if not self.load_data():
+        if not self.load_data(corpus):
             print("❌ 数据加载失败，分析终止")
             return
         
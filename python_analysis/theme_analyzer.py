@@ -1,4 +1,3 @@
-<<<<<<< HEAD
 # -*- coding: utf-8 -*-
 """
 python_analysis/theme_analyzer.py
@@ -7,12 +6,26 @@ python_analysis/theme_analyzer.py
 import os
 import json
 import ast
+import re
+import time
+import random
+import hashlib
+import sqlite3
+import threading
 import pandas as pd
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 from typing import Dict, List
 
+try:
+    from python_analysis.theme_tfidf import TfidfThemeEngine
+    from python_analysis.columnar import load_cleaned
+except ImportError:
+    from theme_tfidf import TfidfThemeEngine
+    from columnar import load_cleaned
+
 # -------------------- 配置 --------------------
 CFG_FILE = Path(__file__).resolve().parent.parent / 'config.json'
 CFG = json.loads(CFG_FILE.read_text(encoding='utf-8')) if CFG_FILE.exists() else {}
@@ -21,6 +34,16 @@ OUT_DIR = Path(THEME_CFG.get('output', {}).get('theme_dir', 'outputs/theme'))
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 API_KEY = THEME_CFG.get('api_key')        # 建议写 config，不传参
+# 可指向本地的流式 chat-completions 替身服务用于测试
+API_URL = THEME_CFG.get('api_url', "https://spark-api-open.xf-yun.com/v2/chat/completions")
+PARAMS = THEME_CFG.get('parameters', {})
+# 默认逐个期刊顺序请求、不限速（max_concurrency = batch_size = 1，rate_limit = null）；
+# 需要提速时在 config.json 的 theme.parameters 中调大 max_concurrency（配合 rate_limit 限速）
+# 和 batch_size（每次请求打包多个期刊，要求JSON输出）
+# 生成参数（同时参与响应缓存的键）
+GEN_PARAMS = {"model": "x1", "max_tokens": 1024, "temperature": 0.7, "reasoning": False}
+# 遇到这些状态码时退避重试
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 def log(msg):
     print(f"[theme] {msg}")
@@ -32,351 +55,607 @@ def _get_col(df, cfg_key: str, default: str) -> str:
     return col if col and col in df.columns else default
 
 # ============================================================================
-#  以下全部是你原来的函数（一字不改）
+#  关键词统计（向量化）
 # ============================================================================
-def _extract_all_keywords(df: pd.DataFrame) -> Dict[str, List[str]]:
-    paper_keywords = {}
-    for idx, row in df.iterrows():
-        paper_id = f"paper_{idx}"
-        keywords = []
-=======
-# python_analysis/theme_analyzer.py
-
-"""
-theme_analyzer.py - 期刊主题分析模块
-功能：
-- 提取每个期刊的Top5高频关键词
-- 调用星火API对期刊研究主题进行描述性分析
-- 输出结构化JSON结果到 outputs/theme/
-"""
-
-import os
-import json
-import pandas as pd
-from collections import Counter
-import requests
-import ast
-from typing import Dict, List
-
-
-def _extract_all_keywords(df: pd.DataFrame) -> Dict[str, List[str]]:
-    """提取所有论文的关键词"""
-    paper_keywords = {}
-
-    for idx, row in df.iterrows():
-        paper_id = f"paper_{idx}"
-        keywords = []
-
->>>>>>> 325a45d1acde271d3e82f31155b95d174bbec114
-        if pd.notna(row.get('Keywords')):
-            try:
-                if isinstance(row['Keywords'], str):
-                    if row['Keywords'].startswith('['):
-                        keywords = ast.literal_eval(row['Keywords'])
-                    else:
-                        if ';' in row['Keywords']:
-                            keywords = [kw.strip() for kw in row['Keywords'].split(';') if kw.strip()]
-                        else:
-                            keywords = [kw.strip() for kw in row['Keywords'].split(',') if kw.strip()]
-                else:
-                    keywords = []
-            except:
-                keywords = []
-<<<<<<< HEAD
-        cleaned_keywords = [str(kw).lower().strip() for kw in keywords if str(kw).strip()]
-        paper_keywords[paper_id] = cleaned_keywords
-    return paper_keywords
-
-def _calculate_journal_keyword_freq(df: pd.DataFrame, paper_keywords: Dict[str, List[str]], min_papers: int = 5) -> Dict[str, Counter]:
-    journal_keywords = {}
-    for paper_id, keywords in paper_keywords.items():
-        idx = int(paper_id.split('_')[1])
-        journal = df.iloc[idx][_get_col(df, 'journal', 'Source Title')]
-        if pd.isna(journal):
-            continue
-        if journal not in journal_keywords:
-            journal_keywords[journal] = []
-        journal_keywords[journal].extend(keywords)
-    journal_keyword_freq = {}
-    for journal, keywords in journal_keywords.items():
-        journal_papers = df[df[_get_col(df, 'journal', 'Source Title')] == journal]
-        if len(journal_papers) >= min_papers and keywords:
-            journal_keyword_freq[journal] = Counter(keywords)
-    return journal_keyword_freq
-
-def analyze_keywords(df: pd.DataFrame, min_papers: int = 5) -> Dict[str, List[str]]:
+def _parse_keywords(value) -> List[str]:
+    """解析单篇论文的关键词字段（列表字符串 / 分号或逗号分隔）"""
+    keywords = []
+    if isinstance(value, str):
+        try:
+            if value.startswith('['):
+                keywords = ast.literal_eval(value)
+            elif ';' in value:
+                keywords = [kw.strip() for kw in value.split(';') if kw.strip()]
+            else:
+                keywords = [kw.strip() for kw in value.split(',') if kw.strip()]
+        except (ValueError, SyntaxError):
+            keywords = []
+    return [str(kw).lower().strip() for kw in keywords if str(kw).strip()]
+
+def _extract_all_keywords(df: pd.DataFrame) -> pd.Series:
+    """每篇论文的关键词列表（与 df 行对齐）"""
+    kw_col = _get_col(df, 'keywords', 'Keywords')
+    if kw_col not in df.columns:
+        return pd.Series([[] for _ in range(len(df))], index=df.index, dtype=object)
+    return df[kw_col].map(_parse_keywords)
+
+def _paper_years(df: pd.DataFrame) -> pd.Series:
+    """出版年份（取字段中的首个四位数字，兼容 2021 / 2021-03-01 等格式）"""
+    year_col = _get_col(df, 'year', 'Publication Year')
+    if year_col not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype='Int64')
+    return df[year_col].astype(str).str.extract(r'(\d{4})', expand=False).astype('Int64')
+
+def _calculate_journal_keyword_freq(df: pd.DataFrame, min_papers: int = 5, by_year: bool = False) -> pd.DataFrame:
+    """按期刊（可选再按年份）统计关键词频次
+
+    关键词只展开一次，一次 groupby 得到全部 (期刊, [年份,] 关键词) 计数；
+    只保留论文数 ≥ min_papers 的期刊。返回的行按期刊首次出现顺序、频次降序排列，
+    同频次按关键词首次出现顺序（与 Counter.most_common 一致）。
+    """
+    journal_col = _get_col(df, 'journal', 'Source Title')
+    journals = df[journal_col]
+    keep = journals.notna() & (journals.map(journals.value_counts()) >= min_papers)
+
+    frame = pd.DataFrame({'journal': journals, 'keyword': _extract_all_keywords(df)})[keep]
+    keys = ['journal']
+    if by_year:
+        frame['year'] = _paper_years(df)[keep]
+        frame = frame.dropna(subset=['year'])
+        keys.append('year')
+    frame = frame.explode('keyword').dropna(subset=['keyword'])
+
+    counts = frame.groupby(keys + ['keyword'], sort=False).size().rename('count').reset_index()
+    journal_order = pd.Index(pd.unique(journals.dropna()))
+    counts['_order'] = journal_order.get_indexer(counts['journal'])
+    sort_keys = ['_order'] + keys[1:] + ['count']
+    counts = counts.sort_values(sort_keys, ascending=[True] * (len(sort_keys) - 1) + [False], kind='stable')
+    return counts.drop(columns='_order').reset_index(drop=True)
+
+def analyze_keywords(df: pd.DataFrame, min_papers: int = 5, top_k: int = 5) -> Dict[str, List[str]]:
+    """每个期刊的 Top-k 高频关键词 {期刊: [关键词]}"""
     log("开始分析期刊关键词频率...")
-    paper_keywords = _extract_all_keywords(df)
-    journal_keyword_freq = _calculate_journal_keyword_freq(df, paper_keywords, min_papers)
-=======
-
-        cleaned_keywords = [str(kw).lower().strip() for kw in keywords if str(kw).strip()]
-        paper_keywords[paper_id] = cleaned_keywords
+    counts = _calculate_journal_keyword_freq(df, min_papers)
+    top = counts.groupby('journal', sort=False).head(top_k)
+    journal_top_keywords = {journal: list(group['keyword']) for journal, group in top.groupby('journal', sort=False)}
+    log(f"关键词分析完成，共 {len(journal_top_keywords)} 个期刊")
+    return journal_top_keywords
 
-    return paper_keywords
+def analyze_keywords_by_year(df: pd.DataFrame, min_papers: int = 5, top_k: int = 5) -> Dict[str, Dict[int, List[str]]]:
+    """每个期刊每年的 Top-k 高频关键词 {期刊: {年份: [关键词]}}，用于主题演化分析"""
+    counts = _calculate_journal_keyword_freq(df, min_papers, by_year=True)
+    top = counts.groupby(['journal', 'year'], sort=False).head(top_k)
+    result = {}
+    for (journal, year), group in top.groupby(['journal', 'year'], sort=False):
+        result.setdefault(journal, {})[int(year)] = list(group['keyword'])
+    return result
 
+# ============================================================================
+#  并发 + 限速调用
+# ============================================================================
+class TokenBucket:
+    """线程安全的令牌桶：每秒补充 rate 个令牌，最多积累 capacity 个"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，桶空时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
 
-def _calculate_journal_keyword_freq(df: pd.DataFrame, paper_keywords: Dict[str, List[str]], min_papers: int = 5) -> Dict[str, Counter]:
-    """按期刊统计关键词频率"""
-    journal_keywords = {}
+# ============================================================================
+#  响应缓存
+# ============================================================================
+class ResponseCache:
+    """LLM 响应的持久化缓存（SQLite）
 
-    for paper_id, keywords in paper_keywords.items():
-        idx = int(paper_id.split('_')[1])
-        journal = df.iloc[idx]['Source Title']
+    键为 模型 + 消息 + 生成参数 的哈希：期刊名与关键词不变时提示词不变，直接复用上次结果；
+    ttl（秒）给定时，超过时限的记录视为失效。
+    """
 
-        if pd.isna(journal):
-            continue
+    def __init__(self, path, ttl: float = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(message: List[Dict], params: Dict = None) -> str:
+        payload = json.dumps({'messages': message, 'params': params or GEN_PARAMS},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                              (key, response, time.time()))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def stats_line(self) -> str:
+        return f"响应缓存: 命中 {self.hits}, 调用API {self.misses}"
 
-        if journal not in journal_keywords:
-            journal_keywords[journal] = []
+# ============================================================================
+#  HTTP 客户端：连接池 + 重试退避 + 结构化失败
+# ============================================================================
+class APIError(Exception):
+    """一次API调用的最终失败
 
-        journal_keywords[journal].extend(keywords)
+    Attributes:
+        kind: http / timeout / connection / parse
+        status: HTTP状态码（若有）
+        attempts: 实际发起的请求次数
+    """
 
-    # 过滤小期刊
-    journal_keyword_freq = {}
-    for journal, keywords in journal_keywords.items():
-        journal_papers = df[df['Source Title'] == journal]
-        if len(journal_papers) >= min_papers and keywords:
-            journal_keyword_freq[journal] = Counter(keywords)
+    def __init__(self, kind: str, message: str, status: int = None, attempts: int = 1, retry_after: str = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+        self.attempts = attempts
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict:
+        return {'kind': self.kind, 'status': self.status, 'attempts': self.attempts, 'message': self.args[0]}
+
+    def __str__(self):
+        status = f" {self.status}" if self.status else ""
+        return f"{self.kind}{status} (尝试 {self.attempts} 次): {self.args[0]}"
+
+class ApiStats:
+    """记录每次调用的耗时、重试次数与失败，线程安全"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.retries = 0
+        self.failures = {}
+
+    def record(self, latency: float, retries: int):
+        with self.lock:
+            self.latencies.append(latency)
+            self.retries += retries
+
+    def fail(self, journal: str, error: APIError):
+        with self.lock:
+            self.failures[journal] = error.to_dict()
+
+    def summary(self) -> Dict:
+        with self.lock:
+            lat = sorted(self.latencies)
+        pick = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 3) if lat else None
+        return {'calls': len(lat), 'retries': self.retries, 'failures': len(self.failures),
+                'latency_p50': pick(0.5), 'latency_p95': pick(0.95),
+                'latency_total': round(sum(lat), 3)}
+
+    def stats_line(self) -> str:
+        st = self.summary()
+        return (f"API调用: {st['calls']} 次, 重试 {st['retries']} 次, 失败 {st['failures']} 个, "
+                f"耗时 p50 {st['latency_p50']}s / p95 {st['latency_p95']}s")
+
+_SESSION = (None, 0)
+_SESSION_LOCK = threading.Lock()
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """进程内共享的 keep-alive 会话（连接池容量至少为并发数）"""
+    global _SESSION
+    with _SESSION_LOCK:
+        session, size = _SESSION
+        if session is None or size < pool_size:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _SESSION = (session, pool_size)
+        return session
+
+def _backoff_delay(attempt: int, base: float, retry_after: str = None) -> float:
+    """第 attempt 次重试前的等待：优先服从 Retry-After，否则为带全抖动的指数退避"""
+    if retry_after:
+        try:
+            return min(float(retry_after), 60.0)
+        except ValueError:
+            pass
+    return random.uniform(0, min(base * 2 ** attempt, 30.0))
 
-    return journal_keyword_freq
+def _read_stream(response, deadline: float, timeout: float) -> str:
+    """解析流式响应；分片格式错误抛出 parse 失败而不是静默丢弃"""
+    full_response = ""
+    for chunk_line in response.iter_lines():
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"请求超过 {timeout}s 未完成")
+        if chunk_line and b'[DONE]' not in chunk_line:
+            data_org = chunk_line[6:] if chunk_line.startswith(b'data: ') else chunk_line
+            try:
+                chunk = json.loads(data_org)
+                content = chunk['choices'][0]['delta'].get('content') or ''
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                raise APIError('parse', f"无法解析的流式分片 {data_org[:80]!r}: {e}")
+            full_response += content
+    return full_response
 
+# ============================================================================
+#  检查点
+# ============================================================================
+class Checkpoint:
+    """逐期刊追加写入的 JSONL 检查点
 
-def analyze_keywords(df: pd.DataFrame, min_papers: int = 5) -> Dict[str, List[str]]:
+    每完成一个期刊立即追加一行 {journal, keywords, analysis, ok} 并落盘；
+    resume=True 时读取已有记录，关键词未变且成功的期刊不再请求，
+    否则清空旧检查点重新开始。最终结果从检查点组装。
     """
-    分析每个期刊的Top5关键词
-    :param df: 输入数据框，需包含 'Keywords' 和 'Source Title'
-    :param min_papers: 最少论文数门槛
-    :return: {期刊名: [Top5关键词]}
-    """
-    print("开始分析期刊关键词频率...")
-
-    paper_keywords = _extract_all_keywords(df)
-    journal_keyword_freq = _calculate_journal_keyword_freq(df, paper_keywords, min_papers)
-
->>>>>>> 325a45d1acde271d3e82f31155b95d174bbec114
-    journal_top_keywords = {}
-    for journal, counter in journal_keyword_freq.items():
-        top5 = [kw for kw, cnt in counter.most_common(5)]
-        journal_top_keywords[journal] = top5
-<<<<<<< HEAD
-    log(f"关键词分析完成，共 {len(journal_top_keywords)} 个期刊")
-    return journal_top_keywords
 
-def get_answer(message: List[Dict], api_key: str) -> str:
-    # 原函数一字不动
-    url = "https://spark-api-open.xf-yun.com/v2/chat/completions"
+    def __init__(self, path, resume: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.entries = self._load() if resume else {}
+        self.file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self) -> Dict[str, Dict]:
+        entries = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 中断时可能留下写了一半的最后一行
+                    continue
+                entries[entry['journal']] = entry
+        return entries
+
+    def finished(self, journal: str, keywords: List[str]):
+        """已成功完成且关键词未变时返回分析文本，否则返回 None"""
+        entry = self.entries.get(journal)
+        if entry and entry.get('ok') and entry.get('keywords') == list(keywords):
+            return entry['analysis']
+        return None
+
+    def record(self, journal: str, keywords: List[str], analysis: str, ok: bool = True):
+        entry = {'journal': journal, 'keywords': list(keywords), 'analysis': analysis, 'ok': ok}
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.entries[journal] = entry
+
+    def results(self, journals) -> Dict[str, str]:
+        """按给定期刊顺序组装检查点中的结果"""
+        with self.lock:
+            return {j: self.entries[j]['analysis'] for j in journals if j in self.entries}
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def get_answer(message: List[Dict], api_key: str, url: str = None, timeout: float = None,
+               retries: int = 3, backoff: float = 1.0, bucket: TokenBucket = None,
+               stats: ApiStats = None, params: Dict = None) -> str:
+    """调用流式 chat-completions 接口
+
+    复用连接池会话；429/5xx、超时与连接错误按带抖动的指数退避最多重试 retries 次，
+    其余错误立即失败。timeout 为单次请求的总时限（秒），bucket 给定时每次请求先取令牌；
+    params 覆盖 GEN_PARAMS 中的生成参数。
+
+    Raises:
+        APIError: 重试耗尽或不可重试的失败
+    """
+    url = url or API_URL
     headers = {'Authorization': api_key, 'content-type': "application/json"}
-    body = {"model": "x1", "user": "journal_analyzer", "messages": message,
-            "stream": True, "max_tokens": 1024, "temperature": 0.7, "reasoning": False}
-=======
+    body = {"user": "journal_analyzer", "messages": message, "stream": True, **GEN_PARAMS, **(params or {})}
+    session = get_session()
+
+    start = time.monotonic()
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(_backoff_delay(attempt - 1, backoff, error.retry_after))
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            deadline = time.monotonic() + timeout if timeout else None
+            with session.post(url=url, json=body, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code != 200:
+                    error = APIError('http', response.reason or 'HTTP错误', status=response.status_code,
+                                     retry_after=response.headers.get('Retry-After'))
+                    if response.status_code in RETRY_STATUS:
+                        continue
+                    break
+                answer = _read_stream(response, deadline, timeout)
+            if stats is not None:
+                stats.record(time.monotonic() - start, attempt)
+            return answer
+        except APIError as e:
+            error = e
+            break
+        except (TimeoutError, requests.Timeout) as e:
+            error = APIError('timeout', str(e))
+        except requests.RequestException as e:
+            error = APIError('connection', str(e))
+
+    error.attempts = attempt + 1
+    if stats is not None:
+        stats.record(time.monotonic() - start, attempt)
+    raise error
+
+def build_prompt(journal: str, keywords: List[str]) -> str:
+    return f"""请根据这个学术期刊的名称和其高频关键词，简要分析该期刊的主要研究方向和主题侧重点。
+期刊名称：{journal}
+高频关键词：{', '.join(keywords)}
+请用100字左右描述该期刊的研究主题特点、技术方法和应用领域。直接输出分析结果，不要有任何思维过程。"""
 
-    print(f" 关键词分析完成，共 {len(journal_top_keywords)} 个期刊")
-    return journal_top_keywords
+def build_batch_prompt(items: List[tuple]) -> str:
+    """把多个 (期刊, 关键词) 打包为一个要求JSON输出的提示词"""
+    lines = [f"{i}. 期刊名称：{journal}；高频关键词：{', '.join(keywords)}"
+             for i, (journal, keywords) in enumerate(items, 1)]
+    return ("请根据下列学术期刊的名称和其高频关键词，分别简要分析每个期刊的主要研究方向和主题侧重点，"
+            "每个期刊用100字左右描述其研究主题特点、技术方法和应用领域。\n"
+            + "\n".join(lines) +
+            "\n只输出一个JSON数组，不要有任何思维过程或其他文字，数组中每个期刊一项，格式为：\n"
+            '[{"id": 序号, "analysis": "分析结果"}]')
+
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.S)
 
+def parse_batch_response(text: str, journals: List[str]) -> Dict[str, str]:
+    """把批量回答拆回各期刊；格式不符时抛出 ValueError
 
-def get_answer(message: List[Dict], api_key: str) -> str:
+    只返回 id 合法且分析非空的期刊，缺失的由调用方单独补请求。
     """
-    调用星火大模型获取回答（禁用思维链）
-    :param message: 消息列表，符合 chat 格式
-    :param api_key: 认证用 Bearer Token
-    :return: 模型返回的字符串
+    match = _JSON_ARRAY_RE.search(text)
+    if match is None:
+        raise ValueError("回答中没有JSON数组")
+    items = json.loads(match.group(0))
+    if not isinstance(items, list):
+        raise ValueError("回答不是JSON数组")
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            idx = int(item.get('id')) - 1
+        except (TypeError, ValueError):
+            continue
+        analysis = str(item.get('analysis') or '').strip()
+        if 0 <= idx < len(journals) and analysis:
+            parsed[journals[idx]] = analysis
+    return parsed
+
+def analyze_journal_topics(journal_top_keywords: Dict[str, List[str]], api_key: str,
+                           max_concurrency: int = 1, rate_limit: float = None,
+                           timeout: float = None, cache: ResponseCache = None,
+                           retries: int = 3, stats: ApiStats = None,
+                           batch_size: int = 1, checkpoint: Checkpoint = None) -> Dict[str, str]:
+    """对每个期刊生成主题分析文本
+
+    max_concurrency > 1 时用线程池并发请求；rate_limit 为每秒请求数上限（令牌桶）；
+    timeout 为单次请求时限；给定 cache 时只为提示词变化的期刊调用API。
+    batch_size > 1 时每次请求打包多个期刊并要求JSON输出，解析失败或缺项的期刊退回单独请求。
+    给定 checkpoint 时每个期刊完成即写入检查点，已完成的期刊直接跳过。
+    失败的期刊记为 "分析失败"，失败详情记录在 stats.failures。
+    结果始终按 journal_top_keywords 的期刊顺序返回。
     """
-    url = "https://spark-api-open.xf-yun.com/v2/chat/completions"
-    headers = {
-        'Authorization': api_key,
-        'content-type': "application/json"
-    }
-    body = {
-        "model": "x1",
-        "user": "journal_analyzer",
-        "messages": message,
-        "stream": True,
-        "max_tokens": 1024,
-        "temperature": 0.7,
-        "reasoning": False
-    }
+    log(f"开始调用AI分析期刊主题... (并发 {max_concurrency}, 限速 {rate_limit or '无'} 次/秒, 批量 {batch_size})")
+    bucket = TokenBucket(rate_limit) if rate_limit else None
+    stats = stats if stats is not None else ApiStats()
+    get_session(max(max_concurrency, 1))
+    start = time.monotonic()
+
+    def _message(journal):
+        return [{"role": "user", "content": build_prompt(journal, journal_top_keywords[journal])}]
+
+    def _store(journal, analysis):
+        # 无论来自单独还是批量请求，都按单期刊提示词的键缓存
+        if cache is not None and analysis:
+            cache.put(ResponseCache.make_key(_message(journal)), analysis)
+        if checkpoint is not None:
+            checkpoint.record(journal, journal_top_keywords[journal], analysis)
+
+    def _analyze(journal):
+        try:
+            analysis = get_answer(_message(journal), api_key, timeout=timeout, retries=retries,
+                                  bucket=bucket, stats=stats).strip()
+        except APIError as e:
+            stats.fail(journal, e)
+            log(f"❌ 失败: {journal} - {e}")
+            if checkpoint is not None:
+                checkpoint.record(journal, journal_top_keywords[journal], "分析失败", ok=False)
+            return "分析失败"
+        _store(journal, analysis)
+        log(f"完成: {journal}")
+        return analysis
+
+    def _analyze_batch(journals):
+        if len(journals) == 1:
+            return {journals[0]: _analyze(journals[0])}
+        message = [{"role": "user", "content": build_batch_prompt(
+            [(journal, journal_top_keywords[journal]) for journal in journals])}]
+        max_tokens = max(GEN_PARAMS['max_tokens'], 512 + 256 * len(journals))
+        try:
+            answer = get_answer(message, api_key, timeout=timeout, retries=retries,
+                                bucket=bucket, stats=stats, params={'max_tokens': max_tokens})
+            parsed = parse_batch_response(answer, journals)
+        except (APIError, ValueError) as e:
+            log(f"批量请求失败，逐个重试 {len(journals)} 个期刊: {e}")
+            parsed = {}
+        out = {}
+        for journal in journals:
+            if journal in parsed:
+                out[journal] = parsed[journal]
+                _store(journal, parsed[journal])
+                log(f"完成: {journal}")
+            else:
+                out[journal] = _analyze(journal)
+        return out
+
+    # 先查检查点与缓存，只为未完成且未命中的期刊发起请求
+    results = {}
+    pending = []
+    for journal, keywords in journal_top_keywords.items():
+        done = checkpoint.finished(journal, keywords) if checkpoint is not None else None
+        if done is not None:
+            results[journal] = done
+            continue
+        cached = cache.get(ResponseCache.make_key(_message(journal))) if cache is not None else None
+        if cached is not None:
+            results[journal] = cached
+            if checkpoint is not None:
+                checkpoint.record(journal, keywords, cached)
+        else:
+            pending.append(journal)
+    if checkpoint is not None and len(pending) < len(journal_top_keywords):
+        log(f"已完成 {len(journal_top_keywords) - len(pending)} 个期刊，待请求 {len(pending)} 个")
+
+    batch_size = max(1, batch_size)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if max_concurrency <= 1:
+        for batch in batches:
+            results.update(_analyze_batch(batch))
+    else:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            for out in pool.map(_analyze_batch, batches):
+                results.update(out)
+    results = {journal: results[journal] for journal in journal_top_keywords}
+
+    log(f"AI分析全部完成，用时 {time.monotonic() - start:.1f}s")
+    log(stats.stats_line())
+    if cache is not None:
+        log(cache.stats_line())
+    return results
 
->>>>>>> 325a45d1acde271d3e82f31155b95d174bbec114
-    full_response = ""
+def _run_api_engine(journal_top_keywords: Dict[str, List[str]], api_key: str, output_dir: Path,
+                    project_root: Path, stats: ApiStats, resume: bool) -> Dict[str, str]:
+    """按配置（缓存 / 检查点 / 并发）调用API分析全部期刊"""
+    cache = None
+    if PARAMS.get('response_cache'):
+        cache_path = Path(PARAMS['response_cache'])
+        cache = ResponseCache(cache_path if cache_path.is_absolute() else project_root / cache_path,
+                              ttl=PARAMS.get('response_cache_ttl'))
+
+    checkpoint = Checkpoint(output_dir / 'journal_analysis.checkpoint.jsonl', resume=resume)
     try:
-        response = requests.post(url=url, json=body, headers=headers, stream=True)
-        for chunk_line in response.iter_lines():
-            if chunk_line and b'[DONE]' not in chunk_line:
-                try:
-<<<<<<< HEAD
-                    data_org = chunk_line[6:] if chunk_line.startswith(b'data: ') else chunk_line
-                    chunk = json.loads(data_org)
-                    content = chunk['choices'][0]['delta'].get('content', '')
-                    full_response += content
-=======
-                    if chunk_line.startswith(b'data: '):
-                        data_org = chunk_line[6:]
-                    else:
-                        data_org = chunk_line
-                    chunk = json.loads(data_org)
-                    text = chunk['choices'][0]['delta']
-                    if 'content' in text and text['content']:
-                        content = text["content"]
-                        full_response += content
->>>>>>> 325a45d1acde271d3e82f31155b95d174bbec114
-                except:
-                    continue
-    except Exception as e:
-        return f"API调用失败: {str(e)}"
-<<<<<<< HEAD
-    return full_response
+        results = analyze_journal_topics(journal_top_keywords, api_key,
+                                         max_concurrency=PARAMS.get('max_concurrency', 1),
+                                         rate_limit=PARAMS.get('rate_limit'),
+                                         timeout=PARAMS.get('request_timeout'),
+                                         cache=cache,
+                                         retries=PARAMS.get('max_retries', 3),
+                                         stats=stats,
+                                         batch_size=PARAMS.get('batch_size', 1),
+                                         checkpoint=checkpoint)
+        results = checkpoint.results(journal_top_keywords)
+    finally:
+        checkpoint.close()
+        if cache is not None:
+            cache.close()
 
-def analyze_journal_topics(journal_top_keywords: Dict[str, List[str]], api_key: str) -> Dict[str, str]:
-    log("开始调用AI分析期刊主题...")
-    results = {}
-    for journal, keywords in journal_top_keywords.items():
-        prompt = f"""请根据这个学术期刊的名称和其高频关键词，简要分析该期刊的主要研究方向和主题侧重点。
-期刊名称：{journal}
-高频关键词：{', '.join(keywords)}
-请用100字左右描述该期刊的研究主题特点、技术方法和应用领域。直接输出分析结果，不要有任何思维过程。"""
-        message = [{"role": "user", "content": prompt}]
-        try:
-            analysis = get_answer(message, api_key)
-            results[journal] = analysis.strip()
-            log(f"完成: {journal}")
-        except Exception as e:
-            log(f"❌ 失败: {e}")
-            results[journal] = "分析失败"
-    log("AI分析全部完成")
     return results
 
 # ============================================================================
 #  仅改动：主入口配置化 + 日志
 # ============================================================================
-def run_theme_analysis(data_path: str = None, output_dir: str = None, api_key: str = None):
+def run_theme_analysis(data_path: str = None, output_dir: str = None, api_key: str = None, resume: bool = False,
+                       corpus=None):
+    # engine: spark = 调用星火API；tfidf = 本地 class-based TF-IDF，无需网络
+    engine = PARAMS.get('engine', 'spark')
     api_key = api_key or API_KEY
-    if not api_key:
+    if engine != 'tfidf' and not api_key:
         raise ValueError("❌ 必须提供 api_key（config 或参数）")
 
     project_root = Path(__file__).resolve().parent.parent
     data_path = data_path or project_root / THEME_CFG.get('data_sources', {}).get('target_data', 'data/cleaned/target_data.csv')
-    output_dir = output_dir or OUT_DIR
-
-    log(f"加载数据: {data_path}")
-    df = pd.read_csv(data_path)
+    output_dir = Path(output_dir) if output_dir else OUT_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if corpus is not None:
+        # 共享语料：按角色取列，默认列名与配置列名都提供
+        log("使用共享语料")
+        roles = {'Source Title': 'journal', 'Keywords': 'keywords', 'Publication Year': 'year',
+                 'Abstract': 'abstract', 'Article Title': 'title'}
+        roles.update({col: role for role, col in THEME_CFG.get('columns', {}).items()})
+        df = corpus.target.to_frame(roles)
+    else:
+        log(f"加载数据: {data_path}")
+        columns = list(THEME_CFG.get('columns', {}).values()) + \
+            ['Source Title', 'Keywords', 'Publication Year', 'Abstract', 'Article Title']
+        df = load_cleaned(data_path, columns)
     log(f"数据形状: {df.shape}")
 
-    journal_top_keywords = analyze_keywords(df, min_papers=5)
-    results = analyze_journal_topics(journal_top_keywords, api_key)
+    min_papers, top_k = PARAMS.get('min_papers', 5), PARAMS.get('top_k', 5)
+    journal_top_keywords = analyze_keywords(df, min_papers=min_papers, top_k=top_k)
+    stats = ApiStats()
+    if engine == 'tfidf':
+        log("使用离线 TF-IDF 引擎分析期刊主题...")
+        start = time.monotonic()
+        results = TfidfThemeEngine(THEME_CFG.get('columns', {}),
+                                   top_terms=PARAMS.get('tfidf_terms', 8),
+                                   top_titles=PARAMS.get('tfidf_titles', 2)).analyze(
+                                       df, journal_top_keywords, _extract_all_keywords(df))
+        log(f"离线分析完成，用时 {time.monotonic() - start:.1f}s")
+    else:
+        results = _run_api_engine(journal_top_keywords, api_key, output_dir, project_root, stats, resume)
 
     # 输出
     meta = {"source_file": Path(data_path).name, "total_journals": len(journal_top_keywords)}
-    (OUT_DIR / 'journal_keywords.json').write_text(json.dumps({"metadata": meta, "data": journal_top_keywords},
+    (output_dir / 'journal_keywords.json').write_text(json.dumps({"metadata": meta, "data": journal_top_keywords},
                                                               ensure_ascii=False, indent=2), encoding='utf-8')
-    (OUT_DIR / 'journal_analysis.json').write_text(json.dumps({"metadata": meta, "data": results},
+    if PARAMS.get('yearly_keywords'):
+        yearly = analyze_keywords_by_year(df, min_papers=min_papers, top_k=top_k)
+        (output_dir / 'journal_keywords_by_year.json').write_text(json.dumps({"metadata": meta, "data": yearly},
+                                                                          ensure_ascii=False, indent=2), encoding='utf-8')
+    meta = {**meta, "engine": engine}
+    if engine != 'tfidf':
+        meta.update({"api": stats.summary(), "failures": stats.failures})
+    (output_dir / 'journal_analysis.json').write_text(json.dumps({"metadata": meta, "data": results},
                                                               ensure_ascii=False, indent=2), encoding='utf-8')
-    log(f"结果已保存 → {OUT_DIR}")
+    log(f"结果已保存 → {output_dir}")
     return {
         'keywords': journal_top_keywords,
         'analysis': results,
-        'output_dir': str(OUT_DIR)
+        'output_dir': str(output_dir)
     }
 
 # -------------------- 脚本入口 --------------------
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='期刊主题分析')
+    parser.add_argument('--resume', action='store_true', help='从检查点继续，跳过已完成的期刊')
+    args = parser.parse_args()
+
     try:
-        run_theme_analysis()
+        run_theme_analysis(resume=args.resume)
     except Exception as e:
         print('[ERROR]', e)
         import traceback
         traceback.print_exc()
-=======
-
-    return full_response
-
-
-def analyze_journal_topics(journal_top_keywords: Dict[str, List[str]], api_key: str) -> Dict[str, str]:
-    """
-    对每个期刊生成主题分析文本
-    :param journal_top_keywords: {期刊名: [关键词]}
-    :param api_key: 星火API密钥
-    :return: {期刊名: 分析文本}
-    """
-    print("开始调用AI分析期刊主题...")
-    results = {}
-
-    for journal, keywords in journal_top_keywords.items():
-        print(f"\n分析期刊: {journal}")
-        prompt = f"""请根据这个学术期刊的名称和其高频关键词，简要分析该期刊的主要研究方向和主题侧重点。
-
-期刊名称：{journal}
-高频关键词：{', '.join(keywords)}
-
-请用100字左右描述该期刊的研究主题特点、技术方法和应用领域。直接输出分析结果，不要有任何思维过程。"""
-
-        message = [{"role": "user", "content": prompt}]
-
-        try:
-            analysis = get_answer(message, api_key)
-            results[journal] = analysis.strip()
-            print(f"完成: {journal}")
-        except Exception as e:
-            print(f"❌ 失败: {e}")
-            results[journal] = "分析失败"
-
-    print("AI分析全部完成")
-    return results
-
-
-def run_theme_analysis(data_path: str = None, output_dir: str = None, api_key: str = None):
-    """
-    主函数：端到端运行期刊主题分析
-    :param data_path: CSV 数据路径，默认为 data/raw/top10_journals_data.csv
-    :param output_dir: 输出目录，默认为 outputs/theme/
-    :param api_key: 星火API密钥，必须提供！
-    """
-    if api_key is None:
-        raise ValueError("❌ 错误: 必须传入 api_key 参数！")
-
-    # 设置路径
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # 上两级是项目根目录
-    data_path = data_path or os.path.join(project_root, 'data', 'raw', 'top10_journals_data.csv')
-    output_dir = output_dir or os.path.join(project_root, 'outputs', 'theme')
-
-    # 加载数据
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"未找到数据文件: {data_path}")
-
-    print(f"加载数据: {data_path}")
-    df = pd.read_csv(data_path)
-
-    # 创建输出目录
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 阶段1: 关键词分析
-    journal_top_keywords = analyze_keywords(df, min_papers=5)
-
-    # 阶段2: AI 主题分析
-    results = analyze_journal_topics(journal_top_keywords, api_key)
-
-    # 阶段3: 输出到 JSON
-    keywords_output = os.path.join(output_dir, 'journal_keywords.json')
-    analysis_output = os.path.join(output_dir, 'journal_analysis.json')
-
-    metadata = {
-        "source_file": os.path.basename(data_path),
-        "total_journals": len(journal_top_keywords)
-    }
-
-    # 输出关键词
-    with open(keywords_output, 'w', encoding='utf-8') as f:
-        json.dump({
-            "metadata": metadata,
-            "data": journal_top_keywords
-        }, f, ensure_ascii=False, indent=2)
-    print(f"期刊关键词表已保存至:\n   {keywords_output}")
-
-    # 输出AI分析
-    with open(analysis_output, 'w', encoding='utf-8') as f:
-        json.dump({
-            "metadata": metadata,
-            "data": results
-        }, f, ensure_ascii=False, indent=2)
-    print(f"期刊主题分析结果已保存至:\n   {analysis_output}")
->>>>>>> 325a45d1acde271d3e82f31155b95d174bbec114
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+python_analysis/theme_tfidf.py
+离线期刊主题分析引擎（无需网络）
+把每个期刊的全部关键词与摘要词视为一个"类文档"，计算 class-based TF-IDF：
+- 特征词：每个期刊 c-TF-IDF 权重最高的词
+- 代表论文：与期刊 c-TF-IDF 向量余弦相似度最高的论文标题
+全部计算在 期刊×词 / 论文×词 稀疏矩阵上向量化完成，输出与 Spark 引擎相同形状的 {期刊: 分析文本}。
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import Dict, List
+
+_WORD_RE = r"[a-z][a-z\-]{2,}"
+
+STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'these', 'those', 'from', 'have', 'has', 'had',
+    'were', 'was', 'are', 'been', 'being', 'its', 'they', 'them', 'their', 'our', 'ours', 'you',
+    'your', 'his', 'her', 'not', 'but', 'can', 'may', 'also', 'which', 'such', 'than', 'then',
+    'there', 'into', 'onto', 'over', 'under', 'between', 'among', 'within', 'without', 'both',
+    'each', 'more', 'most', 'other', 'some', 'only', 'well', 'however', 'while', 'when', 'where',
+    'based', 'using', 'used', 'use', 'study', 'studies', 'paper', 'results', 'result', 'method',
+    'methods', 'proposed', 'propose', 'approach', 'show', 'shows', 'shown', 'found', 'two', 'three',
+    'new', 'different', 'significant', 'significantly', 'high', 'higher', 'low', 'lower', 'compared',
+    'present', 'presents', 'analysis', 'data', 'model', 'models', 'research', 'article', 'here',
+    'all', 'any', 'one', 'via', 'how', 'what', 'who', 'will', 'would', 'could', 'should',
+}
+
+def _top_per_row(rows, scores, n):
+    """对 (行, 得分) 三元组按行取得分最高的 n 项，返回原数组下标（按行、得分降序）"""
+    order = np.lexsort((-scores, rows))
+    sorted_rows = rows[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_rows, sorted_rows, side='left')
+    return order[rank < n]
+
+class TfidfThemeEngine:
+    """基于 class-based TF-IDF 的离线主题分析
+
+    Args:
+        columns: 列名映射（journal / abstract / title）
+        top_terms: 每个期刊输出的特征词数
+        top_titles: 每个期刊输出的代表论文数
+        keyword_weight: 作者关键词相对摘要词的计数权重
+    """
+
+    def __init__(self, columns: Dict[str, str] = None, top_terms: int = 8, top_titles: int = 2,
+                 keyword_weight: float = 2.0):
+        columns = columns or {}
+        self.journal_col = columns.get('journal', 'Source Title')
+        self.abstract_col = columns.get('abstract', 'Abstract')
+        self.title_col = columns.get('title', 'Article Title')
+        self.top_terms = top_terms
+        self.top_titles = top_titles
+        self.keyword_weight = keyword_weight
+
+    def _paper_terms(self, df: pd.DataFrame, paper_keywords: pd.Series) -> pd.DataFrame:
+        """展开为 (论文行号, 词, 权重) 长表：关键词按整个短语计，摘要按单词计"""
+        parts = []
+        if paper_keywords is not None:
+            kw = paper_keywords.explode().dropna()
+            parts.append(pd.DataFrame({'paper': kw.index, 'term': kw.to_numpy(), 'weight': self.keyword_weight}))
+        if self.abstract_col in df.columns:
+            words = df[self.abstract_col].fillna('').str.lower().str.findall(_WORD_RE).explode().dropna()
+            words = words[~words.isin(STOP_WORDS)]
+            parts.append(pd.DataFrame({'paper': words.index, 'term': words.to_numpy(), 'weight': 1.0}))
+        if not parts:
+            return pd.DataFrame({'paper': [], 'term': [], 'weight': []})
+        return pd.concat(parts, ignore_index=True)
+
+    def fit(self, df: pd.DataFrame, journals: List[str], paper_keywords: pd.Series = None):
+        """构建 论文×词 与 期刊×词 矩阵并计算 c-TF-IDF 权重
+
+        paper_keywords 为与 df 行对齐的已解析关键词列表；为 None 时只用摘要词。
+        """
+        keep = df[self.journal_col].isin(journals).to_numpy()
+        df = df[keep].reset_index(drop=True)
+        if paper_keywords is not None:
+            paper_keywords = paper_keywords[keep].reset_index(drop=True)
+        self.journals = list(journals)
+        self.df = df
+        journal_index = pd.Index(self.journals)
+        self.paper_journal = journal_index.get_indexer(df[self.journal_col])
+
+        long = self._paper_terms(df, paper_keywords)
+        codes, self.vocabulary = pd.factorize(long['term'])
+        paper_rows = long['paper'].to_numpy(dtype=np.int64)
+        self.paper_counts = sparse.csr_matrix(
+            (long['weight'].to_numpy(dtype=float), (paper_rows, codes)),
+            shape=(len(df), len(self.vocabulary)))
+
+        # 期刊×词 计数 = 期刊归属矩阵 × 论文×词
+        membership = sparse.csr_matrix(
+            (np.ones(len(df)), (self.paper_journal, np.arange(len(df)))),
+            shape=(len(self.journals), len(df)))
+        class_counts = (membership @ self.paper_counts).tocsr()
+
+        # c-TF-IDF：tf 为类内词频占比，idf = log(1 + 平均类词量 / 词的总频次)
+        totals = np.asarray(class_counts.sum(axis=1)).ravel()
+        term_totals = np.asarray(class_counts.sum(axis=0)).ravel()
+        avg_words = totals.mean() if len(totals) else 0.0
+        self.idf = np.log1p(np.divide(avg_words, term_totals, out=np.zeros_like(term_totals), where=term_totals > 0))
+        tf = sparse.diags(np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)) @ class_counts
+        self.class_weights = (tf @ sparse.diags(self.idf)).tocsr()
+        return self
+
+    def distinctive_terms(self) -> Dict[str, List[str]]:
+        """每个期刊 c-TF-IDF 最高的特征词"""
+        weights = self.class_weights.tocoo()
+        keep = _top_per_row(weights.row, weights.data, self.top_terms)
+        result = {journal: [] for journal in self.journals}
+        for row, col in zip(weights.row[keep], weights.col[keep]):
+            result[self.journals[row]].append(self.vocabulary[col])
+        return result
+
+    def representative_titles(self) -> Dict[str, List[str]]:
+        """每个期刊与其 c-TF-IDF 向量余弦相似度最高的论文标题"""
+        result = {journal: [] for journal in self.journals}
+        if self.title_col not in self.df.columns or len(self.df) == 0:
+            return result
+        paper_vectors = (self.paper_counts @ sparse.diags(self.idf)).tocoo()
+        weights = self.class_weights.tocoo()
+
+        # 论文向量每个非零项 (i, t) 对应的期刊权重 W[j_i, t]：用 (期刊, 词) 组合键在排序数组中二分查找，
+        # 避免为每篇论文复制整行期刊向量
+        n_terms = len(self.vocabulary)
+        class_keys = weights.row.astype(np.int64) * n_terms + weights.col
+        order = np.argsort(class_keys)
+        class_keys, class_values = class_keys[order], weights.data[order]
+        paper_keys = self.paper_journal[paper_vectors.row].astype(np.int64) * n_terms + paper_vectors.col
+        matched = np.zeros(len(paper_keys))
+        if len(class_keys):
+            pos = np.minimum(np.searchsorted(class_keys, paper_keys), len(class_keys) - 1)
+            hit = class_keys[pos] == paper_keys
+            matched[hit] = class_values[pos[hit]]
+
+        n_papers = len(self.df)
+        dots = np.bincount(paper_vectors.row, weights=paper_vectors.data * matched, minlength=n_papers)
+        paper_norms = np.sqrt(np.bincount(paper_vectors.row, weights=paper_vectors.data ** 2, minlength=n_papers))
+        class_norms = np.sqrt(np.bincount(weights.row, weights=weights.data ** 2, minlength=len(self.journals)))
+        norms = paper_norms * class_norms[self.paper_journal]
+        scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+        titles = self.df[self.title_col]
+        valid = np.flatnonzero(titles.notna().to_numpy() & (scores > 0))
+        keep = valid[_top_per_row(self.paper_journal[valid], scores[valid], self.top_titles)]
+        for row, title in zip(self.paper_journal[keep], titles.to_numpy()[keep]):
+            result[self.journals[row]].append(str(title).strip())
+        return result
+
+    def analyze(self, df: pd.DataFrame, journal_top_keywords: Dict[str, List[str]],
+                paper_keywords: pd.Series = None) -> Dict[str, str]:
+        """生成 {期刊: 分析文本}，期刊顺序与 journal_top_keywords 一致"""
+        self.fit(df, list(journal_top_keywords), paper_keywords)
+        terms = self.distinctive_terms()
+        titles = self.representative_titles()
+
+        results = {}
+        for journal, keywords in journal_top_keywords.items():
+            parts = []
+            if keywords:
+                parts.append(f"该期刊的高频关键词为 {', '.join(keywords)}")
+            if terms[journal]:
+                parts.append(f"区别于其他期刊的特征词为 {', '.join(terms[journal])}")
+            if titles[journal]:
+                parts.append("代表性论文：" + "；".join(f"《{t}》" for t in titles[journal]))
+            results[journal] = "离线主题分析：" + ("；".join(parts) if parts else "数据不足") + "。"
+        return results
@@ -10,13 +10,28 @@ import pandas as pd
 import numpy as np
 import ast
 import re
-import difflib
 import matplotlib.pyplot as plt
 from pathlib import Path
 from collections import Counter
+from scipy import sparse
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from python_analysis.field_index import (
+        MATCHER_CODE, get_field_index, get_phrase_matcher, get_keyword_cache, configure_keyword_cache,
+        load_compiled_taxonomy
+    )
+    from python_analysis.artifact_cache import code_version, frame_fingerprint, get_artifact_cache
+    from python_analysis.columnar import load_cleaned
+except ImportError:
+    from field_index import (
+        MATCHER_CODE, get_field_index, get_phrase_matcher, get_keyword_cache, configure_keyword_cache,
+        load_compiled_taxonomy
+    )
+    from artifact_cache import code_version, frame_fingerprint, get_artifact_cache
+    from columnar import load_cleaned
+
 # 设置中文字体
 import matplotlib.font_manager as fm
 try:
@@ -46,168 +61,37 @@ def log(msg):
     print(f"[topic] {msg}")
 
 # ============================================================================
-#  完整的领域分类字典（使用完整的字典）
+#  领域分类字典（外部词表文件，编译产物缓存于 data/cache，跨进程复用）
 # ============================================================================
-FOS_dict = {
-    "psychology": [
-        "cognition", "cognitive", "executive function", "working memory",
-        "memory retrieval", "attention", "selective attention",
-        "decision making", "problem solving", "reasoning",
-        "mental representation", "information processing",
-        "cognitive control", "metacognition", "inhibition",
-        "visual perception", "auditory perception", "language processing",
-        "skill acquisition", "implicit learning", "explicit learning",
-        "concept formation", "judgment", "mental imagery",
-        "semantic processing", "episodic memory", "short-term memory",
-        "neural", "neural basis", "neural processing", "brain activity",
-        "neurocognition", "neuropsychology", "neurobehavioral",
-        "prefrontal cortex", "hippocampus", "amygdala", "cortical",
-        "neuroplasticity", "brain networks", "neuroimaging",
-        "erp", "p300", "n400", "fmri", "eeg", "p600",
-        "emotion", "emotional processing", "affect",
-        "emotion regulation", "emotional arousal",
-        "empathy", "mood", "affective response",
-        "emotion recognition", "emotional cognition",
-        "motivation", "intrinsic motivation", "extrinsic motivation",
-        "goal orientation", "reward processing", "novelty seeking",
-        "sensation seeking", "value processing", "self-efficacy",
-        "creativity", "creative thinking", "creative cognition",
-        "divergent thinking", "convergent thinking", "idea generation",
-        "personality", "personality traits", "big five", "neuroticism",
-        "extraversion", "openness", "agreeableness", "conscientiousness",
-        "behavior", "behavioral response", "behavioral performance",
-        "social cognition", "social interaction", "social influence",
-        "developmental psychology", "child development",
-        "clinical psychology", "mental health", "psychopathology",
-        "depression", "anxiety", "stress", "trauma",
-        "educational psychology", "learning motivation", "learning strategies",
-    ],
-
-    "neuroscience": [
-        "brain", "neural", "neuron", "neural networks",
-        "central nervous system", "cns", "neuroscience",
-        "synaptic", "neuroplasticity", "neural pathway",
-        "neural circuit", "neural dynamics", "neurophysiology",
-        "dopamine", "serotonin", "norepinephrine", "acetylcholine",
-        "glutamate", "gaba", "oxytocin", "vasopressin",
-        "prefrontal cortex", "pfc", "orbitofrontal cortex", "ofc",
-        "anterior cingulate cortex", "acc", "posterior cingulate cortex",
-        "hippocampus", "amygdala", "insula", "basal ganglia",
-        "striatum", "cerebellum", "thalamus", "hypothalamus",
-        "synaptic plasticity", "long-term potentiation", "ltp",
-        "long-term depression", "ltd", "signal transmission",
-        "action potential", "spike train", "neural oscillation",
-        "working memory", "executive function", "decision making",
-        "reward processing", "attention network",
-        "emotion regulation", "perception", "sensory processing",
-        "eeg", "erp", "p300", "n400", "p600",
-        "meg", "fmri", "bold signal", "pet scan",
-        "neuroimaging", "diffusion tensor imaging", "dti",
-        "ion channel", "synapse", "axon", "dendrite",
-        "behavioral neuroscience", "neurobehavioral",
-        "fear conditioning", "reinforcement learning",
-        "computational model", "spiking model",
-        "neural computation", "neural coding",
-        "alzheimer", "parkinson", "adhd",
-        "autism", "epilepsy", "schizophrenia",
-    ],
-
-    "computer_science": [
-        "algorithm", "algorithms", "optimization", "approximation",
-        "graph algorithm", "graph theory",
-        "search algorithm", "sorting", "complexity",
-        "data structure", "tree", "graph", "hashing",
-        "machine learning", "supervised learning", "unsupervised learning",
-        "reinforcement learning", "deep learning",
-        "neural network", "neural networks",
-        "convolutional neural network", "cnn",
-        "recurrent neural network", "rnn", "transformer",
-        "representation learning", "feature extraction",
-        "classification", "regression", "clustering",
-        "data mining", "data analysis", "data processing",
-        "big data", "data visualization",
-        "natural language processing", "nlp",
-        "text mining", "text classification", "sentiment analysis",
-        "language model", "word embedding", "transformer model",
-        "computer vision", "image processing", "object detection",
-        "image classification", "image recognition",
-        "human computer interaction", "hci",
-        "robotics", "autonomous system", "autonomous agents",
-        "software engineering", "software architecture",
-        "operating system", "distributed system",
-        "parallel computing", "cloud computing",
-        "computer network", "network protocol",
-        "cybersecurity", "cryptography", "encryption",
-        "simulation", "agent-based model",
-        "computational model", "numerical simulation",
-    ],
-
-    "education": [
-        "education", "educational practice", "educational research",
-        "learning", "instruction", "teaching", "pedagogy",
-        "instructional design", "curriculum design", "learning outcomes",
-        "student performance", "academic performance",
-        "learning behavior", "classroom environment",
-        "learning process", "knowledge acquisition",
-        "constructivism", "social constructivism",
-        "experiential learning", "active learning",
-        "collaborative learning", "problem-based learning",
-        "self-directed learning", "self-regulated learning",
-        "educational psychology", "motivation", "learning motivation",
-        "self-efficacy", "goal orientation", "engagement",
-        "assessment", "evaluation", "formative assessment",
-        "summative assessment", "rubric", "performance assessment",
-        "learning analytics", "measurement", "testing",
-        "instructional method", "instructional strategy",
-        "scaffolding", "differentiated instruction",
-        "educational technology", "technology-enhanced learning",
-        "digital learning", "online learning", "blended learning",
-        "e-learning", "mobile learning", "virtual learning",
-        "higher education", "tertiary education",
-        "k-12 education", "primary education", "secondary education",
-        "teacher education", "teacher training", "teacher development",
-        "curriculum", "curriculum implementation",
-        "educational policy", "education reform",
-        "creative behavior", "creative learning",
-    ],
-
-    "biomedical_sciences": [
-        "dopamine", "serotonin", "glutamate", "gaba", "acetylcholine",
-        "genetics", "genomics", "epigenetics", "gene expression",
-        "gene regulation", "transcription factor", "molecular pathway",
-        "protein expression", "protein folding", "protein interaction",
-        "biochemical", "biochemical pathway", "biomarker", "cytokine",
-        "inflammation", "inflammatory response", "immune system",
-        "immunity", "innate immunity", "adaptive immunity",
-        "neural basis", "neural circuit", "neurobiological",
-        "neurochemical", "neurophysiological", "synaptic plasticity",
-        "synapse", "axon", "dendrite", "neural signaling",
-        "cellular process", "cell culture",
-        "cell proliferation", "cell differentiation", "stem cell",
-        "neural stem cell", "neurogenesis",
-        "oxidative stress", "mitochondria", "mitochondrial function",
-        "apoptosis", "cell death", "autophagy",
-        "endocrine", "hormone", "hormonal regulation",
-        "cortisol", "testosterone", "estrogen",
-        "neurodevelopmental", "developmental biology",
-        "neurodegeneration", "neurodegenerative disease",
-        "alzheimer's disease", "parkinson's disease",
-        "schizophrenia", "depression", "mental disorder",
-        "pharmacology", "drug response", "drug metabolism",
-        "metabolism", "metabolic pathway", "lipid metabolism",
-        "glucose metabolism", "metabolomics",
-        "proteomics", "transcriptomics", "multiomics",
-        "microbiome", "gut microbiota",
-        "immune response", "cell signaling",
-        "signal transduction", "receptor activation",
-        "blood brain barrier", "neurovascular",
-        "cerebral cortex", "hippocampus", "amygdala",
-        "in vivo", "in vitro", "animal model",
-        "mouse model", "rat model",
-        "biostatistics", "epidemiology",
-        "public health", "clinical research",
-    ],
-}
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TAXONOMY = PROJECT_ROOT / 'data' / 'taxonomy' / 'fos_dict.json'
+TAXONOMY_CACHE_DIR = PROJECT_ROOT / 'data' / 'cache'
+
+_FOS_INDEX = None
+
+def default_field_index():
+    """内置领域词表的编译索引（首次使用时才加载，导入模块不读写文件）"""
+    global _FOS_INDEX
+    if _FOS_INDEX is None:
+        _FOS_INDEX = load_compiled_taxonomy(DEFAULT_TAXONOMY, cache_dir=TAXONOMY_CACHE_DIR)
+    return _FOS_INDEX
+
+def load_field_index(taxonomy_path=None):
+    """按配置的 taxonomy_path（相对路径以项目根目录为基准）加载词表索引，未配置时使用内置词表"""
+    if not taxonomy_path:
+        return default_field_index()
+    taxonomy_path = Path(taxonomy_path)
+    if not taxonomy_path.is_absolute():
+        taxonomy_path = PROJECT_ROOT / taxonomy_path
+    return load_compiled_taxonomy(taxonomy_path, cache_dir=TAXONOMY_CACHE_DIR)
+
+def __getattr__(name):
+    # FOS_INDEX / FOS_dict 仍可作为模块属性访问，首次访问时才编译词表
+    if name == 'FOS_INDEX':
+        return default_field_index()
+    if name == 'FOS_dict':
+        return default_field_index().field_dict
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ============================================================================
 #  关键词处理函数
@@ -279,34 +163,20 @@ def extract_keywords_from_text(text, min_length=3, max_keywords=20):
     return top_keywords
 
 def map_keyword_to_fields(keyword, field_dict):
-    """映射关键词到领域"""
-    keyword = keyword.lower().strip()
-    
-    # 精确匹配
-    matched_fields = []
-    for field, words in field_dict.items():
-        if keyword in words:
-            matched_fields.append(field)
-    
-    if matched_fields:
-        return list(set(matched_fields))
-    
-    # 模糊匹配
-    for field, words in field_dict.items():
-        for w in words:
-            ratio = difflib.SequenceMatcher(None, keyword, w).ratio()
-            if ratio >= 0.75:  # 降低阈值以提高匹配率
-                matched_fields.append(field)
-                break
-    
-    return list(set(matched_fields))
+    """映射关键词到领域
+
+    精确匹配走词条哈希表；未命中时只对三元组/字符上界筛出的候选词条
+    计算相似度（阈值 0.75），结果与逐词条比较一致。
+    """
+    return get_field_index(field_dict).match(keyword)
 
 def field_distribution(keyword_list, field_dict):
     """计算领域分布"""
     field_counter = Counter()
+    cache = get_keyword_cache(field_dict)
 
     for kw in keyword_list:
-        fields = map_keyword_to_fields(kw, field_dict)
+        fields = cache.lookup(kw)
         for f in fields:
             field_counter[f] += 1
     
@@ -333,6 +203,70 @@ def calculate_shannon_entropy(shares_dict):
     
     return float(entropy)
 
+def paper_field_matrix(term_lists, field_dict):
+    """批量构建 论文 × 领域 计数稀疏矩阵
+
+    所有论文的去重术语先统一映射为领域id（每个不同术语只查一次缓存），
+    再一次性组装为CSR矩阵，计数口径与 field_distribution 相同。
+
+    Returns:
+        (csr_matrix, 领域名列表)
+    """
+    fields = list(field_dict.keys())
+    field_ids = {f: i for i, f in enumerate(fields)}
+    cache = get_keyword_cache(field_dict)
+
+    lengths = np.fromiter((len(t) for t in term_lists), dtype=np.int64, count=len(term_lists))
+    flat_terms = pd.Series([t for terms in term_lists for t in terms], dtype=object)
+    paper_rows = np.repeat(np.arange(len(term_lists)), lengths)
+
+    codes, uniques = pd.factorize(flat_terms)
+    term_field_ids = [[field_ids[f] for f in cache.lookup(t)] for t in uniques]
+    per_term = np.fromiter((len(x) for x in term_field_ids), dtype=np.int64, count=len(term_field_ids))
+    term_indptr = np.concatenate([[0], np.cumsum(per_term)])
+    term_indices = np.fromiter((f for x in term_field_ids for f in x), dtype=np.int64, count=int(per_term.sum()))
+
+    # 展开 (论文, 术语) → (论文, 领域)
+    n_fields_each = per_term[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+    rows = np.repeat(paper_rows, n_fields_each)
+    starts = np.repeat(term_indptr[codes], n_fields_each) if len(codes) else np.zeros(0, dtype=np.int64)
+    offsets = np.arange(n_fields_each.sum()) - np.repeat(np.cumsum(n_fields_each) - n_fields_each, n_fields_each)
+    cols = term_indices[starts + offsets]
+
+    counts = sparse.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(len(term_lists), len(fields)))
+    return counts, fields
+
+def distribution_measures(counts):
+    """对 论文 × 领域 计数矩阵批量计算占比与多样性指标
+
+    Returns:
+        dict: entropy（香农熵, log2）/ simpson（1 - Σp²）/ gini（领域占比的基尼系数）/ field_count
+    """
+    counts = sparse.csr_matrix(counts, dtype=float)
+    counts.eliminate_zeros()
+    n_papers, n_fields = counts.shape
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    has_terms = totals > 0
+
+    shares = sparse.diags(np.divide(1.0, totals, out=np.zeros(n_papers), where=has_terms)) @ counts
+    shares = shares.tocoo()
+    rows, p = shares.row, shares.data
+
+    entropy = -np.bincount(rows, weights=p * np.log2(p), minlength=n_papers)
+    simpson = np.where(has_terms, 1.0 - np.bincount(rows, weights=p * p, minlength=n_papers), 0.0)
+
+    # 基尼系数：G = Σ(2i - n - 1)·x_(i) / (n·Σx)，x 为升序排列的领域占比
+    dense = np.sort(shares.toarray(), axis=1)
+    ranks = 2 * np.arange(1, n_fields + 1) - n_fields - 1
+    gini = np.where(has_terms, dense @ ranks / max(n_fields, 1), 0.0)
+
+    return {
+        'entropy': entropy,
+        'simpson': simpson,
+        'gini': gini,
+        'field_count': np.bincount(rows, minlength=n_papers),
+    }
+
 def calculate_percent_score(entropy):
     """计算百分制得分：原始熵值 × 100 × 5"""
     percent_score = entropy * 100 * 5
@@ -347,6 +281,8 @@ class InterdisciplinaryEntropyAnalyzer:
         
         # 从配置获取术语来源设置
         self.term_source = self.config.get('parameters', {}).get('term_source', 'keywords')
+        # 摘要处理方式：words（默认，原有行为）= 单词切分 + 模糊匹配；phrases = 词典短语自动机扫描（需在配置中显式开启）
+        self.abstract_mode = self.config.get('parameters', {}).get('abstract_mode', 'words')
         
         # 创建输出目录
         output_dir_key = 'topic_dir'
@@ -359,31 +295,67 @@ class InterdisciplinaryEntropyAnalyzer:
         
         log(f"输出目录: {self.output_dir}")
         log(f"术语来源: {self.term_source}")
+        if self.term_source in ['abstract', 'both']:
+            log(f"摘要处理方式: {self.abstract_mode}")
+
+        # 领域词表：未配置 taxonomy_path 时使用内置 FOS_dict
+        params = self.config.get('parameters', {})
+        taxonomy_path = params.get('taxonomy_path')
+        self.field_index = load_field_index(taxonomy_path)
+        self.field_dict = self.field_index.field_dict
+        log(f"领域词表: {taxonomy_path or DEFAULT_TAXONOMY} (版本 {self.field_index.version}, "
+            f"{len(self.field_index.fields)} 个领域, {len(self.field_index.terms)} 个词条)")
 
-    def extract_terms_from_paper(self, row):
-        """从单篇论文中提取术语"""
-        terms = []
+        # 关键词 → 领域 映射缓存（按词表内容哈希持久化）
+        cache_dir = params.get('keyword_cache_dir', 'data/cache')
+        if cache_dir and not Path(cache_dir).is_absolute():
+            cache_dir = PROJECT_ROOT / cache_dir
+        self.keyword_cache = configure_keyword_cache(
+            self.field_dict, cache_dir=cache_dir, maxsize=params.get('keyword_cache_size', 50000)
+        )
+
+    def extract_terms(self, df):
+        """按列批量提取全部论文的去重术语列表"""
+        sources = []
         
-        # 从关键词提取
         if self.term_source in ['keywords', 'both']:
             keywords_col = self.config['columns']['keywords'] if 'keywords' in self.config['columns'] else 'Keywords'
-            if keywords_col in row:
-                author_keywords = clean_author_keywords(row[keywords_col])
-                terms.extend(author_keywords)
+            if keywords_col in df.columns:
+                sources.append(df[keywords_col].map(clean_author_keywords))
         
-        # 从摘要提取
-        if self.term_source in ['abstract', 'both']:
-            if 'Abstract' in row:
-                clean_abstract = clean_text(row['Abstract'])
-                abstract_keywords = extract_keywords_from_text(clean_abstract, max_keywords=15)
-                terms.extend(abstract_keywords)
+        if self.term_source in ['abstract', 'both'] and 'Abstract' in df.columns:
+            if self.abstract_mode == 'phrases':
+                matcher = get_phrase_matcher(self.field_dict)
+                sources.append(df['Abstract'].map(matcher.find))
+            else:
+                sources.append(df['Abstract'].map(
+                    lambda text: extract_keywords_from_text(clean_text(text), max_keywords=15)))
         
-        # 去重并返回
-        unique_terms = list(set(terms))
-        return unique_terms
+        if not sources:
+            return [[] for _ in range(len(df))]
+        return [list(set(t for terms in per_paper for t in terms)) for per_paper in zip(*sources)]
 
-    def run_analysis(self):
-        """运行分析"""
+    def paper_scores(self, target_df, id_col, journal_col):
+        """论文级领域分布指标"""
+        log("\n📊 计算论文熵值...")
+        term_lists = self.extract_terms(target_df)
+        counts, _ = paper_field_matrix(term_lists, self.field_dict)
+        measures = distribution_measures(counts)
+        
+        results = {
+            'paper_id': [str(pid) if pd.notna(pid) else f"paper_{idx}"
+                         for idx, pid in zip(target_df.index, target_df[id_col])],
+            'journal': target_df[journal_col].where(target_df[journal_col].notna(), "Unknown").to_numpy(),
+            'entropy': measures['entropy'],
+            'field_count': measures['field_count'],
+            'term_count': [len(terms) for terms in term_lists],
+            'simpson': measures['simpson'],
+            'gini': measures['gini'],
+        }
+        return pd.DataFrame(results)
+
+    def run_analysis(self, corpus=None):
+        """运行分析；给定 corpus（共享语料）时不再读取数据文件"""
         try:
             log("=" * 50)
             log("开始期刊跨学科性分析（香农熵方法）")
@@ -393,49 +365,35 @@ class InterdisciplinaryEntropyAnalyzer:
             project_root = Path(__file__).parent.parent
             target_path = project_root / self.config['data_sources']['target_data']
             
-            log(f"加载数据: {target_path}")
-            target_df = pd.read_csv(target_path)
-            log(f"数据形状: {target_df.shape}")
-            
             # 获取列名
             id_col = self.config['columns']['id']
             journal_col = self.config['columns']['journal']
+            keywords_col = self.config['columns'].get('keywords', 'Keywords')
             
-            log(f"使用列: ID={id_col}, 期刊={journal_col}")
-            
-            # 计算每篇论文的熵值
-            log("\n📊 计算论文熵值...")
-            results = []
+            if corpus is not None:
+                log("使用共享语料")
+                target_df = corpus.target.to_frame({id_col: 'id', journal_col: 'journal',
+                                                    keywords_col: 'keywords', 'Abstract': 'abstract'})
+            else:
+                log(f"加载数据: {target_path}")
+                target_df = load_cleaned(target_path, [id_col, journal_col, keywords_col, 'Abstract'])
+            log(f"数据形状: {target_df.shape}")
             
-            total_papers = len(target_df)
-            for idx, row in target_df.iterrows():
-                paper_id = str(row[id_col]) if pd.notna(row.get(id_col)) else f"paper_{idx}"
-                journal = row[journal_col] if pd.notna(row.get(journal_col)) else "Unknown"
-                
-                # 提取术语
-                terms = self.extract_terms_from_paper(row)
-                
-                # 计算领域分布
-                field_counts, field_shares = field_distribution(terms, FOS_dict)
-                
-                # 计算香农熵
-                entropy = calculate_shannon_entropy(field_shares)
-                
-                results.append({
-                    'paper_id': paper_id,
-                    'journal': journal,
-                    'entropy': entropy,
-                    'field_count': len(field_counts),
-                    'term_count': len(terms)
-                })
-                
-                # 进度显示
-                if (idx + 1) % 100 == 0 or (idx + 1) == total_papers:
-                    progress = (idx + 1) / total_papers * 100
-                    log(f"进度: {idx + 1}/{total_papers} ({progress:.1f}%)")
+            log(f"使用列: ID={id_col}, 期刊={journal_col}")
             
-            paper_df = pd.DataFrame(results)
+            # 批量计算全部论文的领域分布与熵值；论文级结果按输入内容、词表与代码版本缓存
+            cache = get_artifact_cache()
+            code = code_version(InterdisciplinaryEntropyAnalyzer.extract_terms, InterdisciplinaryEntropyAnalyzer.paper_scores,
+                                clean_author_keywords, clean_text, extract_keywords_from_text,
+                                paper_field_matrix, distribution_measures, *MATCHER_CODE)
+            params = {'id': id_col, 'journal': journal_col, 'keywords': keywords_col,
+                      'term_source': self.term_source, 'abstract_mode': self.abstract_mode,
+                      'taxonomy': self.field_index.digest}
+            paper_df = cache.cached('topic_paper_scores', lambda: self.paper_scores(target_df, id_col, journal_col),
+                                    [frame_fingerprint(target_df)], params, code)
+            self.keyword_cache.flush()
             log(f"论文计算完成，共 {len(paper_df)} 篇论文")
+            log(self.keyword_cache.stats_line())
             log(f"平均每篇论文术语数: {paper_df['term_count'].mean():.1f}")
             log(f"平均每篇论文领域数: {paper_df['field_count'].mean():.1f}")
             
@@ -444,10 +402,12 @@ class InterdisciplinaryEntropyAnalyzer:
             journal_agg = paper_df.groupby('journal').agg({
                 'entropy': 'mean',
                 'field_count': 'mean',
-                'paper_id': 'count'
+                'paper_id': 'count',
+                'simpson': 'mean',
+                'gini': 'mean'
             }).reset_index()
             
-            journal_agg.columns = ['期刊名称', '原始熵值', '平均领域数', '论文数量']
+            journal_agg.columns = ['期刊名称', '原始熵值', '平均领域数', '论文数量', 'Simpson指数', 'Gini系数']
             
             # 计算百分制得分：原始熵值 × 100 × 5
             log("🎯 计算百分制得分...")
@@ -491,6 +451,8 @@ class InterdisciplinaryEntropyAnalyzer:
         output_df = journal_data.copy()
         output_df['原始熵值'] = output_df['原始熵值'].round(4)
         output_df['平均领域数'] = output_df['平均领域数'].round(2)
+        output_df['Simpson指数'] = output_df['Simpson指数'].round(4)
+        output_df['Gini系数'] = output_df['Gini系数'].round(4)
         output_df['百分制得分'] = output_df['百分制得分'].round(1)
         
         output_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
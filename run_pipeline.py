@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+run_pipeline.py
+端到端分析流水线
+阶段依赖图：clean → corpus → disruption / novelty / interdisciplinary / diversity / topic / theme → report
+- 互不依赖的分析阶段在独立进程中并发运行（--jobs），共享 corpus 阶段构建的语料
+- 运行结束写出 outputs/analysis_summary.json：每个阶段的状态与耗时
+用法：
+    python run_pipeline.py                         # 按 config.json 的 pipeline 配置运行全部阶段
+    python run_pipeline.py --only novelty topic    # 只运行指定阶段（所需语料自动构建）
+    python run_pipeline.py --jobs 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# 子进程中不弹出图表窗口
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from python_analysis.corpus import Corpus
+
+def log(msg):
+    print(f"[pipeline] {msg}", flush=True)
+
+def load_config():
+    """加载配置文件"""
+    config_path = PROJECT_ROOT / 'config.json'
+    if not config_path.exists():
+        raise FileNotFoundError(f"配置文件不存在: {config_path}")
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# ============================================================================
+#  阶段定义
+#  requires: 硬依赖，依赖失败时本阶段跳过；after: 仅约束顺序
+# ============================================================================
+ANALYSIS_STAGES = ['disruption', 'novelty', 'interdisciplinary', 'diversity', 'topic', 'theme']
+
+STAGES = {
+    'clean': {'requires': [], 'after': []},
+    'corpus': {'requires': ['clean'], 'after': []},
+    **{name: {'requires': ['corpus'], 'after': []} for name in ANALYSIS_STAGES},
+    'report': {'requires': [], 'after': ANALYSIS_STAGES},
+}
+
+# 分析阶段 → (config.json 小节, 输出目录键)
+OUTPUT_DIRS = {
+    'disruption': ('disrupt', 'disrupt_dir'),
+    'novelty': ('novelty', 'novelty_dir'),
+    'interdisciplinary': ('interdisciplinary', 'interdisciplinary_dir'),
+    'diversity': ('diversity', 'diversity_dir'),
+    'topic': ('topic', 'topic_dir'),
+    'theme': ('theme', 'theme_dir'),
+}
+
+# 汇总报告取用的期刊得分：阶段 → (文件名, 期刊列, 得分列, 报告列名)
+REPORT_SCORES = {
+    'disruption': ('journal_disruption_scores.csv', '期刊名称', '百分制得分', '颠覆性得分'),
+    'novelty': ('journal_novelty_scores.csv', '期刊名称', '百分制得分', '新颖性得分'),
+    'interdisciplinary': ('journal_percent_scores.csv', '期刊名称', '百分制得分', '跨学科性TD得分'),
+    'diversity': ('journal_diversity_scores.csv', 'journal', 'rao_stirling', 'Rao-Stirling多样性'),
+    'topic': ('journal_entropy_scores.csv', '期刊名称', '百分制得分', '主题熵得分'),
+}
+
+def topological_order(stages):
+    """按依赖关系排序（requires 与 after 都参与排序）"""
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"阶段依赖存在环: {name}")
+        visiting.add(name)
+        for dep in STAGES[name]['requires'] + STAGES[name]['after']:
+            if dep in stages:
+                visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in STAGES:
+        if name in stages:
+            visit(name)
+    return order
+
+def select_stages(config, only=None):
+    """确定要运行的阶段
+
+    未指定 --only 时运行 clean、corpus、配置中启用的分析模块和 report；
+    指定 --only 时只运行列出的阶段，需要语料的阶段自动加入 corpus，
+    未选中的上游阶段视为已完成（直接使用磁盘上的已有结果）。
+    """
+    if only:
+        unknown = [name for name in only if name not in STAGES]
+        if unknown:
+            raise ValueError(f"未知阶段: {unknown}，可选: {list(STAGES)}")
+        selected = set(only)
+        if selected & set(ANALYSIS_STAGES):
+            selected.add('corpus')
+    else:
+        modules = config.get('pipeline', {}).get('parameters', {}).get('modules', {})
+        selected = {'clean', 'corpus', 'report'} | {name for name in ANALYSIS_STAGES if modules.get(name, True)}
+    return topological_order(selected)
+
+# ============================================================================
+#  阶段实现（在工作进程中执行）
+# ============================================================================
+_CORPUS = {}
+
+def _pipeline_paths(config):
+    pipeline = config.get('pipeline', {})
+    sources = pipeline.get('data_sources', {})
+    output = pipeline.get('output', {})
+    return {
+        'all_data': PROJECT_ROOT / sources.get('all_data', 'data/cleaned/all_data.csv'),
+        'target_data': PROJECT_ROOT / sources.get('target_data', 'data/cleaned/target_data.csv'),
+        'summary': PROJECT_ROOT / output.get('summary', 'outputs/analysis_summary.json'),
+        'report_dir': PROJECT_ROOT / output.get('report_dir', 'outputs/report'),
+        'corpus_cache': PROJECT_ROOT / output.get('corpus_cache', 'data/cache/corpus.pkl'),
+    }
+
+def _shared_corpus(config):
+    """本进程的共享语料：优先用已在内存中的对象，否则读取 corpus 阶段写出的文件"""
+    path = _pipeline_paths(config)['corpus_cache']
+    if path not in _CORPUS:
+        if not path.exists():
+            raise FileNotFoundError(f"共享语料不存在，请先运行 corpus 阶段: {path}")
+        _CORPUS[path] = Corpus.read(path)
+    return _CORPUS[path]
+
+def _stage_clean(config):
+    sys.path.insert(0, str(PROJECT_ROOT / 'scripts'))
+    from preprocess_wos_excel import run_clean
+    all_path, target_path = run_clean()
+    if all_path is None:
+        raise RuntimeError("数据清洗失败（详见日志）")
+    return {'all_data': str(all_path), 'target_data': str(target_path)}
+
+def _stage_corpus(config):
+    paths = _pipeline_paths(config)
+    corpus = Corpus.load(paths['all_data'], paths['target_data'])
+    corpus.save(paths['corpus_cache'])
+    _CORPUS[paths['corpus_cache']] = corpus
+    return {'background_papers': len(corpus.background), 'target_papers': len(corpus.target)}
+
+def _stage_disruption(config):
+    from python_analysis import disrupt_calculator
+    return disrupt_calculator.run_analysis(config['disrupt'], corpus=_shared_corpus(config))
+
+def _stage_novelty(config):
+    from python_analysis.novelty_analyzer import NoveltyAnalyzer
+    return NoveltyAnalyzer(config['novelty']).run_analysis(corpus=_shared_corpus(config))
+
+def _stage_interdisciplinary(config):
+    from python_analysis.interdisciplinary import InterdisciplinaryAnalyzer
+    return InterdisciplinaryAnalyzer(config['interdisciplinary']).run_analysis(corpus=_shared_corpus(config))
+
+def _stage_diversity(config):
+    from python_analysis.diversity_engine import DiversityEngine
+    return DiversityEngine(config['diversity']).run_analysis(corpus=_shared_corpus(config))
+
+def _stage_topic(config):
+    from python_analysis.topic_analyzer import InterdisciplinaryEntropyAnalyzer
+    return InterdisciplinaryEntropyAnalyzer(config['topic']).run_analysis(corpus=_shared_corpus(config))
+
+def _stage_theme(config):
+    from python_analysis.theme_analyzer import run_theme_analysis
+    return run_theme_analysis(corpus=_shared_corpus(config))
+
+def _stage_report(config):
+    """合并各模块的期刊得分为一张汇总表"""
+    import pandas as pd
+
+    merged = None
+    for stage, (filename, journal_col, score_col, label) in REPORT_SCORES.items():
+        section, key = OUTPUT_DIRS[stage]
+        path = PROJECT_ROOT / config.get(section, {}).get('output', {}).get(key, '') / filename
+        if not path.is_file():
+            continue
+        scores = pd.read_csv(path, encoding='utf-8-sig', usecols=[journal_col, score_col])
+        scores = scores.rename(columns={journal_col: '期刊名称', score_col: label})
+        merged = scores if merged is None else merged.merge(scores, on='期刊名称', how='outer')
+    if merged is None:
+        raise RuntimeError("没有可汇总的期刊得分文件")
+
+    report_dir = _pipeline_paths(config)['report_dir']
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_path = report_dir / 'journal_report.csv'
+    merged.to_csv(report_path, index=False, encoding='utf-8-sig', float_format='%.4f')
+    log(f"📄 汇总报告已保存: {report_path}")
+    return {'journals': len(merged), 'columns': list(merged.columns[1:])}
+
+STAGE_FUNCS = {
+    'clean': _stage_clean,
+    'corpus': _stage_corpus,
+    'disruption': _stage_disruption,
+    'novelty': _stage_novelty,
+    'interdisciplinary': _stage_interdisciplinary,
+    'diversity': _stage_diversity,
+    'topic': _stage_topic,
+    'theme': _stage_theme,
+    'report': _stage_report,
+}
+
+def run_stage(name, config):
+    """运行单个阶段，返回状态记录（异常被捕获并记录，不向上抛出）"""
+    os.chdir(PROJECT_ROOT)  # 各模块的输出目录是相对项目根目录的路径
+    started = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    record = {'status': 'completed', 'started': started, 'pid': os.getpid()}
+    try:
+        result = STAGE_FUNCS[name](config)
+        # 各分析模块内部捕获异常后返回 None
+        if result is None:
+            record['status'] = 'failed'
+            record['error'] = '模块未返回结果（详见日志）'
+        elif isinstance(result, dict) and name in ('clean', 'corpus', 'report'):
+            record['details'] = result
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+# ============================================================================
+#  调度
+# ============================================================================
+def _blocked_by(name, records):
+    """返回导致本阶段无法运行的失败上游阶段"""
+    return [dep for dep in STAGES[name]['requires'] if records.get(dep, {}).get('status') in ('failed', 'skipped')]
+
+def _ready(name, stages, records):
+    waits = STAGES[name]['requires'] + STAGES[name]['after']
+    return all(dep not in stages or dep in records for dep in waits)
+
+def run_pipeline(stages, config, jobs=1):
+    """按依赖图运行阶段；jobs > 1 时就绪的阶段在进程池中并发执行"""
+    records = {}
+    pending = list(stages)
+    running = {}
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        while pending or running:
+            for name in list(pending):
+                if not _ready(name, stages, records):
+                    continue
+                pending.remove(name)
+                blocked = _blocked_by(name, records)
+                if blocked:
+                    records[name] = {'status': 'skipped', 'error': f"上游阶段未完成: {blocked}", 'seconds': 0.0}
+                    log(f"⏭  {name} 跳过（上游阶段未完成: {', '.join(blocked)}）")
+                    continue
+                log(f"▶  {name} 开始")
+                if pool is None:
+                    records[name] = run_stage(name, config)
+                    log(f"■  {name} {records[name]['status']} ({records[name]['seconds']:.1f}s)")
+                else:
+                    running[pool.submit(run_stage, name, config)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    records[name] = future.result()
+                except Exception as e:  # 工作进程异常退出
+                    records[name] = {'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'seconds': 0.0}
+                log(f"■  {name} {records[name]['status']} ({records[name]['seconds']:.1f}s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return {name: records[name] for name in stages}
+
+def write_summary(records, config, jobs, total_seconds):
+    """写出运行汇总 analysis_summary.json"""
+    paths = _pipeline_paths(config)
+    output_dirs = {stage: config.get(section, {}).get('output', {}).get(key)
+                   for stage, (section, key) in OUTPUT_DIRS.items()}
+    output_dirs['report'] = str(paths['report_dir'].relative_to(PROJECT_ROOT))
+    summary = {
+        'status': 'completed' if all(r['status'] == 'completed' for r in records.values()) else 'failed',
+        'timestamp': datetime.now().isoformat(),
+        'inputs': {
+            'background_data': str(paths['all_data'].relative_to(PROJECT_ROOT)),
+            'target_data': str(paths['target_data'].relative_to(PROJECT_ROOT)),
+        },
+        'modules': {name: name in records for name in ANALYSIS_STAGES},
+        'output_dirs': output_dirs,
+        'jobs': jobs,
+        'total_seconds': round(total_seconds, 3),
+        'stages': records,
+    }
+    paths['summary'].parent.mkdir(parents=True, exist_ok=True)
+    paths['summary'].write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding='utf-8')
+    log(f"📄 运行汇总已保存: {paths['summary']}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='期刊分析流水线')
+    parser.add_argument('--only', nargs='+', metavar='STAGE',
+                        help=f"只运行指定阶段，可选: {', '.join(STAGES)}")
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='并发进程数（默认取 config.json 的 pipeline.parameters.jobs）')
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    jobs = args.jobs or config.get('pipeline', {}).get('parameters', {}).get('jobs', 1)
+    stages = select_stages(config, args.only)
+    log(f"阶段: {' → '.join(stages)} | 并发进程数: {jobs}")
+
+    start = time.perf_counter()
+    records = run_pipeline(stages, config, jobs=max(1, jobs))
+    summary = write_summary(records, config, jobs, time.perf_counter() - start)
+
+    log("=" * 50)
+    for name, record in records.items():
+        log(f"  {name:<18} {record['status']:<10} {record['seconds']:>8.1f}s  {record.get('error', '')}")
+    log(f"总用时: {summary['total_seconds']:.1f}s | 状态: {summary['status']}")
+    return 0 if summary['status'] == 'completed' else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,11 +4,26 @@ preprocess_wos_data.py
 功能：从clean_config.yaml读取配置，处理数据（支持Excel和数据库）
 所有参数都从配置文件读取
 """
+import numpy as np
 import pandas as pd
-import os, glob, re, yaml, json
+import os, glob, re, yaml, json, time, hashlib, tempfile
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import sys
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import types as sqltypes
+
+try:
+    from python_analysis.columnar import (
+        ParquetAppender, columnar_path, flatten_list_columns, load_cleaned, parquet_available, parse_year,
+        write_parquet
+    )
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from python_analysis.columnar import (
+        ParquetAppender, columnar_path, flatten_list_columns, load_cleaned, parquet_available, parse_year,
+        write_parquet
+    )
 
 def load_clean_config(config_path=None):
     """加载清洗配置文件"""
@@ -48,41 +63,98 @@ def load_analysis_config():
             return json.load(f)
     return None
 
-def extract_dois_from_references(ref):
-    """从参考文献中提取DOI"""
-    if pd.isna(ref): 
-        return []
-    
-    patterns = [
-        r'DOI\s+([^\s;,\]]+)',
-        r'doi:\s*([^\s;,\]]+)',
-        r'10\.\d{4,9}/[-._;()/:A-Z0-9]+',
-    ]
-    
-    dois = []
-    for pattern in patterns:
-        found = re.findall(pattern, str(ref), re.IGNORECASE)
-        if found:
-            for d in found:
-                d_clean = d.strip().lstrip('[').rstrip(',;]')
-                if d_clean.startswith('10.') and len(d_clean) > 10:
-                    dois.append(d_clean)
-    
-    return list(set(dois))
-
-def is_conference(title):
-    """判断是否为会议论文"""
-    if pd.isna(title): 
-        return False
-    
-    t = str(title).upper()
-    conference_keywords = [
-        'CONFERENCE', 'PROCEEDINGS', 'SYMPOSIUM',
-        'MEETING', 'CONGRESS', 'WORKSHOP',
-        'PROC.', 'CONF.', 'SYMP.'
-    ]
-    
-    return any(w in t for w in conference_keywords) or bool(re.search(r'20\d{2}', t))
+# DOI 主体：10.注册号/后缀，后缀到空白、分号、逗号或方括号为止。
+# 覆盖 "DOI 10.x/y"、"doi:10.x/y"、"DOI [10.x/y, 10.x/z]"、"https://doi.org/10.x/y" 以及裸DOI，
+# 前缀不进入匹配结果
+DOI_PATTERN = re.compile(r'(10\.\d{4,9}/[^\s;,\[\]]+)', re.IGNORECASE)
+DOI_PREFIX_PATTERN = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+MIN_DOI_LENGTH = 11
+
+def canonical_doi(doi):
+    """规范化单个DOI：去首尾空白、去 doi:/https://doi.org/ 前缀、转小写（DOI不区分大小写）"""
+    if pd.isna(doi):
+        return doi
+    return DOI_PREFIX_PATTERN.sub('', str(doi).strip()).lower()
+
+def _find_dois(refs):
+    """整列匹配DOI：返回 (行位置, 原始DOI) 两个数组，按行有序"""
+    refs = pd.Series(refs, dtype=object).reset_index(drop=True)
+    found = refs.dropna().astype(str).str.findall(DOI_PATTERN).explode().dropna()
+    found = found[found.str.len() >= MIN_DOI_LENGTH]
+    return found.index.to_numpy(dtype=np.int64), found.to_numpy(dtype=object)
+
+def extract_citing_column(refs, workers=1, chunk_rows=20000):
+    """整列提取参考文献DOI，返回与 refs 对齐的DOI列表（列表元素为驻留字符串）
+
+    一个合并后的正则在整列上执行 str.findall，按行去重用 (行, DOI编号) 整数键完成；
+    workers > 1 时按 chunk_rows 分块并行匹配。同一DOI在所有论文的引用列表中共享同一个字符串对象，
+    构建引文网络时比较与哈希更省内存。
+    """
+    refs = pd.Series(refs, dtype=object).reset_index(drop=True)
+    n = len(refs)
+    if workers and workers > 1 and n > chunk_rows:
+        starts = range(0, n, chunk_rows)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_find_dois, (refs.iloc[i:i + chunk_rows] for i in starts)))
+        rows = np.concatenate([part_rows + start for start, (part_rows, _) in zip(starts, parts)])
+        dois = np.concatenate([part_dois for _, part_dois in parts])
+    else:
+        rows, dois = _find_dois(refs)
+
+    # 规范化只作用于去重后的原始DOI：小写并驻留，再把大小写不同的编号合并。
+    # 相同DOI因此只保留一个字符串对象
+    codes, uniques = pd.factorize(dois)
+    lowered = np.empty(len(uniques), dtype=object)
+    lowered[:] = [sys.intern(str(doi).lower()) for doi in uniques]
+    lower_codes, canonical = pd.factorize(lowered)
+    codes = lower_codes[codes]
+
+    # 同一论文内重复引用只保留首次出现
+    _, first = np.unique(rows * max(len(canonical), 1) + codes, return_index=True)
+    keep = np.sort(first)
+    rows, values = rows[keep], np.asarray(canonical, dtype=object)[codes[keep]]
+
+    bounds = np.searchsorted(rows, np.arange(n + 1))
+    return [values[bounds[i]:bounds[i + 1]].tolist() for i in range(n)]
+
+# 会议来源判定：一个合并后的正则
+# - 会议类词汇（词首匹配，CONFERENCES / SYMPOSIUMS 等变体也命中）及其缩写 PROC. / CONF. / SYMP.
+# - 年份只在会议特有的位置才算：以 "2019 IEEE ..." 这类"年份+主办方"开头，
+#   或 "(ICRA 2019)" / "(ICRA '19)" / "CVPR 2020" 这类"缩写+年份"；期刊名中出现的年份不再误判
+# - 只有词汇部分不区分大小写；缩写必须为大写，两位年份须带撇号，
+#   避免 "(Part 12)" / "(PART 12)" / "(NN22)" 这类期刊名被误判
+CONFERENCE_PATTERN = re.compile(
+    r"(?i:\b(?:CONFERENCE|PROCEEDINGS|SYMPOSIUM|MEETING|CONGRESS|WORKSHOP)"
+    r"|\b(?:PROC|CONF|SYMP)\."
+    r"|^\s*(?:19|20)\d{2}\s+(?:IEEE|ACM|IFAC|IET|SPIE|INTERNATIONAL|ANNUAL|EUROPEAN|ASIAN?)\b)"
+    r"|\(\s*[A-Z][A-Z0-9&-]{1,14}(?:\s*'?(?:19|20)\d{2}|\s*'\d{2})\s*\)"
+    r"|^\s*[A-Z][A-Z0-9&-]{1,14}[\s-]*'?(?:19|20)\d{2}\s*$")
+
+def normalize_source_title(title):
+    """来源名规范化：去首尾空白、合并连续空白"""
+    if pd.isna(title):
+        return title
+    return ' '.join(str(title).split())
+
+def conference_mask(titles, allow=(), deny=()):
+    """整列判断会议来源：只对去重后的来源名求值，再按编号映射回每一行
+
+    Args:
+        titles: 来源名列
+        allow: 总不视为会议的来源名（不区分大小写），优先级最高
+        deny: 总视为会议的来源名（不区分大小写）
+    """
+    codes, uniques = pd.factorize(titles)
+    names = pd.Series(uniques, dtype=object).map(normalize_source_title)
+    # 保留原大小写匹配：正则中的缩写部分区分大小写
+    flags = names.str.contains(CONFERENCE_PATTERN).to_numpy(dtype=bool, copy=True)
+    upper = names.str.upper()
+    if deny:
+        flags |= upper.isin({normalize_source_title(t).upper() for t in deny}).to_numpy()
+    if allow:
+        flags &= ~upper.isin({normalize_source_title(t).upper() for t in allow}).to_numpy()
+    # 空值编号为 -1，不视为会议
+    return np.append(flags, False)[codes]
 
 def find_actual_column(df, possible_names):
     """在DataFrame中查找实际存在的列名"""
@@ -121,63 +193,256 @@ def get_needed_columns_from_configs(clean_config, analysis_config):
     
     return list(needed_columns)
 
-def load_excel_data(excel_dir, field_mapping):
-    """从Excel文件加载数据"""
-    # 获取所有可能的列名
-    all_possible_columns = set()
-    for possible_names in field_mapping.values():
-        all_possible_columns.update(possible_names)
-    
-    print(f"\n[字段筛选] 只读取以下字段:")
-    for col in sorted(all_possible_columns):
-        print(f"  - {col}")
-    
-    # 查找Excel文件
-    excel_files = glob.glob(os.path.join(excel_dir, "*.xls*"))
+def _read_excel_file(excel_file, wanted_columns):
+    """读取单个Excel文件（只打开一次，按列名回调筛选列），供进程池调用
+
+    Returns:
+        (文件名, DataFrame或None, 耗时秒, 错误信息或None)
+    """
+    start = time.perf_counter()
+    name = os.path.basename(excel_file)
+    try:
+        df = pd.read_excel(excel_file, usecols=lambda col: col in wanted_columns)
+    except Exception as e:
+        return name, None, time.perf_counter() - start, str(e)
+    if df.shape[1] == 0:
+        return name, None, time.perf_counter() - start, "没有找到目标列"
+    df['source_file'] = name
+    return name, df, time.perf_counter() - start, None
+
+def find_excel_files(excel_dir):
+    """列出目录中的Excel文件（排序保证合并顺序确定）"""
+    excel_files = sorted(glob.glob(os.path.join(excel_dir, "*.xls*")))
     if not excel_files:
         # 如果路径不存在，尝试相对路径
         root_dir = Path(__file__).parent.parent
         excel_dir = root_dir / excel_dir
-        excel_files = glob.glob(os.path.join(str(excel_dir), "*.xls*"))
+        excel_files = sorted(glob.glob(os.path.join(str(excel_dir), "*.xls*")))
     
     if not excel_files:
         raise FileNotFoundError(f"未找到Excel文件: {excel_dir}")
+    return excel_files
+
+def read_excel_files(excel_files, field_mapping, workers=None):
+    """并行读取一组Excel文件
+
+    Returns:
+        与 excel_files 顺序一致的 (文件名, DataFrame或None, 耗时秒, 错误信息或None) 列表
+    """
+    all_possible_columns = set()
+    for possible_names in field_mapping.values():
+        all_possible_columns.update(possible_names)
+    if not excel_files:
+        return []
     
-    print(f"\n[数据源] 找到 {len(excel_files)} 个Excel文件:")
+    workers = min(workers or os.cpu_count() or 1, len(excel_files))
+    print(f"\n[数据源] 读取 {len(excel_files)} 个Excel文件，使用 {workers} 个进程:")
+    
+    # 读取每个文件（executor.map 按提交顺序返回结果）
+    columns = [all_possible_columns] * len(excel_files)
+    if workers > 1:
+        chunksize = max(1, len(excel_files) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_read_excel_file, excel_files, columns, chunksize=chunksize))
+    else:
+        results = list(map(_read_excel_file, excel_files, columns))
+    
+    for name, df_temp, elapsed, error in results:
+        if error:
+            print(f"  [警告] {name} 读取失败: {error} ({elapsed:.2f}s)")
+        else:
+            print(f"  读取 {name}... 成功 ({df_temp.shape[0]}行, {elapsed:.2f}s)")
+    return results
+
+def load_excel_data(excel_dir, field_mapping, workers=None):
+    """从Excel文件加载数据
+
+    Args:
+        workers: 并行读取的进程数；None 为CPU核数，1 为串行
+    """
+    print(f"\n[字段筛选] 只读取以下字段:")
+    for col in sorted({name for names in field_mapping.values() for name in names}):
+        print(f"  - {col}")
     
-    # 读取每个文件
-    dfs = []
-    for excel_file in excel_files:
-        try:
-            # 检查文件中的列
-            temp_df = pd.read_excel(excel_file, nrows=0)
-            existing_columns = [col for col in all_possible_columns if col in temp_df.columns]
-            
-            if not existing_columns:
-                print(f"  [警告] {os.path.basename(excel_file)} 中没有找到目标列")
-                continue
-            
-            print(f"  读取 {os.path.basename(excel_file)}...", end="")
-            
-            # 只读取存在的列
-            df_temp = pd.read_excel(excel_file, usecols=existing_columns)
-            df_temp['source_file'] = os.path.basename(excel_file)
-            dfs.append(df_temp)
-            
-            print(f" 成功 ({df_temp.shape[0]}行)")
-            
-        except Exception as e:
-            print(f" 失败: {e}")
+    start = time.perf_counter()
+    results = read_excel_files(find_excel_files(excel_dir), field_mapping, workers)
+    dfs = [df_temp for _, df_temp, _, error in results if not error]
     
     if not dfs:
         raise ValueError("未能读取任何Excel文件的数据")
     
     # 合并数据
     df = pd.concat(dfs, ignore_index=True)
-    print(f"\n[数据加载] Excel数据: {df.shape[0]}行 × {df.shape[1]}列")
+    parse_time = sum(r[2] for r in results)
+    print(f"\n[数据加载] Excel数据: {df.shape[0]}行 × {df.shape[1]}列 "
+          f"(解析 {parse_time:.1f}s, 墙钟 {time.perf_counter() - start:.1f}s)")
     
     return df
 
+# ============================================================================
+#  增量导入：清单记录每个源文件的哈希、行数与输出分区
+# ============================================================================
+MANIFEST_VERSION = 1
+
+def file_sha256(path, block_size=1 << 20):
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cleaning_signature(field_mapping, needed_columns, cleaning):
+    """影响分区内容的配置摘要；变化时全部分区作废
+
+    target_journals / top_n 只影响目标期刊的选取，去重在合并分区时进行，均不计入。
+    """
+    rules = {k: v for k, v in cleaning.items() if k not in ('target_journals', 'top_n', 'doi_workers', 'dedup')}
+    payload = json.dumps({'version': MANIFEST_VERSION, 'field_mapping': field_mapping,
+                          'needed_columns': sorted(needed_columns), 'cleaning': rules},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_manifest(path):
+    """读取导入清单；不存在或版本不符时返回空清单"""
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'signature': None, 'files': {}}
+
+def save_manifest(manifest, path):
+    """原子写入导入清单（先写临时文件再替换）"""
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def run_incremental_clean(excel_files, field_mapping, needed_columns, cleaning, cleaned_dir, workers=None):
+    """增量清洗Excel导出：只读取并清洗新增或内容变化的文件
+
+    每个源文件清洗后写为 partitions/part-<内容哈希>.parquet，清单 manifest.json 记录
+    文件名 → sha256、大小与修改时间、原始行数、清洗后行数和分区名。大小与修改时间未变的文件
+    不重新计算哈希；源文件删除后其分区一并删除。清洗规则或字段配置变化时全部重建。
+
+    Returns:
+        按文件名顺序合并全部分区得到的清洗后数据
+    """
+    partition_dir = cleaned_dir / "partitions"
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = cleaned_dir / "manifest.json"
+    manifest = load_manifest(manifest_path)
+    signature = cleaning_signature(field_mapping, needed_columns, cleaning)
+    
+    entries = manifest['files']
+    if manifest['signature'] != signature:
+        if entries:
+            print("\n[增量] 清洗规则或字段配置已变化，全部文件重新清洗")
+        entries = {}
+    
+    current, pending = {}, []
+    for path in excel_files:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        entry = entries.get(name)
+        has_partition = entry is not None and (partition_dir / entry['partition']).exists()
+        if has_partition and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            current[name] = entry
+            continue
+        sha = file_sha256(path)
+        if has_partition and entry['sha256'] == sha:
+            current[name] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            continue
+        pending.append((path, name, sha, stat))
+    
+    removed = sorted(set(entries) - {os.path.basename(p) for p in excel_files})
+    print(f"\n[增量] 共 {len(excel_files)} 个文件：未变化 {len(current)}，"
+          f"新增或变化 {len(pending)}，已删除 {len(removed)}")
+    
+    # 只读取并清洗新增/变化的文件，每个文件一个分区
+    results = read_excel_files([p for p, _, _, _ in pending], field_mapping, workers)
+    for (path, name, sha, stat), (_, df_file, _, error) in zip(pending, results):
+        if error:
+            continue  # 不写入清单，下次运行重试
+        cleaned = clean_frame(df_file, field_mapping, needed_columns, cleaning, verbose=False)
+        partition = f"part-{sha[:16]}.parquet"
+        write_parquet(cleaned, partition_dir / partition)
+        current[name] = {'sha256': sha, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                         'rows': len(df_file), 'cleaned_rows': len(cleaned), 'partition': partition}
+        print(f"  [分区] {name} → {partition} ({len(df_file)} → {len(cleaned)}行)")
+    
+    # 删除不再被引用的分区
+    live = {entry['partition'] for entry in current.values()}
+    for stale in partition_dir.glob("part-*.parquet"):
+        if stale.name not in live:
+            stale.unlink()
+    
+    save_manifest({'version': MANIFEST_VERSION, 'signature': signature,
+                   'files': dict(sorted(current.items()))}, manifest_path)
+    print(f"[增量] 清单已保存: {manifest_path}")
+    
+    if not current:
+        raise ValueError("未能读取任何Excel文件的数据")
+    parts = [load_cleaned(partition_dir / current[name]['partition']) for name in sorted(current)]
+    df = pd.concat(parts, ignore_index=True)
+    print(f"[增量] 合并 {len(parts)} 个分区: {df.shape[0]}行")
+    return df
+
+def create_db_engine(db_config):
+    """按配置创建数据库引擎并测试连接"""
+    # 处理方言映射
+    dialect_map = {
+        'mysql': 'mysql+pymysql',
+        'postgresql': 'postgresql',
+        'sqlite': 'sqlite'
+    }
+    
+    dialect = db_config.get('dialect', '').lower()
+    if dialect not in dialect_map:
+        raise ValueError(f"不支持的数据库类型: {dialect}")
+    
+    actual_dialect = dialect_map[dialect]
+    password = ''
+    
+    # 构建连接字符串
+    if dialect == 'sqlite':
+        # SQLite
+        database_path = db_config.get('database', '')
+        if not database_path:
+            raise ValueError("SQLite需要指定数据库文件路径")
+        conn_str = f"sqlite:///{database_path}"
+    else:
+        # MySQL/PostgreSQL
+        user = db_config.get('user', '')
+        password = db_config.get('password', '')
+        host = db_config.get('host', 'localhost')
+        port = str(db_config.get('port', ''))
+        database = db_config.get('database', '')
+        
+        # 构建连接字符串
+        if dialect == 'mysql':
+            # MySQL额外参数（处理中文）
+            conn_str = f"{actual_dialect}://{user}:{password}@{host}:{port}/{database}?charset=utf8mb4"
+        else:
+            conn_str = f"{actual_dialect}://{user}:{password}@{host}:{port}/{database}"
+    
+    print(f"  连接字符串: {conn_str.replace(password, '***') if password else conn_str}")  # 安全显示
+    
+    # 创建引擎
+    engine = create_engine(conn_str, echo=False)
+    
+    # 测试连接
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print("  ✓ 数据库连接成功")
+    return engine
+
 def load_database_data(db_config, field_mapping):
     """从数据库加载数据"""
     print("\n[数据源] 从数据库读取数据...")
@@ -188,50 +453,7 @@ def load_database_data(db_config, field_mapping):
         for possible_names in field_mapping.values():
             all_possible_columns.extend(possible_names)
         
-        # 处理方言映射
-        dialect_map = {
-            'mysql': 'mysql+pymysql',
-            'postgresql': 'postgresql',
-            'sqlite': 'sqlite'
-        }
-        
-        dialect = db_config.get('dialect', '').lower()
-        if dialect not in dialect_map:
-            raise ValueError(f"不支持的数据库类型: {dialect}")
-        
-        actual_dialect = dialect_map[dialect]
-        
-        # 构建连接字符串
-        if dialect == 'sqlite':
-            # SQLite
-            database_path = db_config.get('database', '')
-            if not database_path:
-                raise ValueError("SQLite需要指定数据库文件路径")
-            conn_str = f"sqlite:///{database_path}"
-        else:
-            # MySQL/PostgreSQL
-            user = db_config.get('user', '')
-            password = db_config.get('password', '')
-            host = db_config.get('host', 'localhost')
-            port = str(db_config.get('port', ''))
-            database = db_config.get('database', '')
-            
-            # 构建连接字符串
-            if dialect == 'mysql':
-                # MySQL额外参数（处理中文）
-                conn_str = f"{actual_dialect}://{user}:{password}@{host}:{port}/{database}?charset=utf8mb4"
-            else:
-                conn_str = f"{actual_dialect}://{user}:{password}@{host}:{port}/{database}"
-        
-        print(f"  连接字符串: {conn_str.replace(password, '***')}")  # 安全显示
-        
-        # 创建引擎
-        engine = create_engine(conn_str, echo=False)
-        
-        # 测试连接
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        print("  ✓ 数据库连接成功")
+        engine = create_db_engine(db_config)
         
         # 决定使用SQL查询还是直接读表
         if 'sql' in db_config and db_config['sql']:
@@ -278,17 +500,73 @@ def load_database_data(db_config, field_mapping):
         import traceback
         traceback.print_exc()
         raise
-def map_and_filter_columns(df, field_mapping, needed_columns):
+
+def _year_pushdown(engine, table_name, year_column, min_year):
+    """按年份列的类型生成可下推到SQL的过滤条件
+
+    整数/数值列用 >= 年份，日期列用 >= 该年1月1日；文本等其他类型不下推，
+    只在 pandas 中过滤。SQL过滤只是预筛选，pandas 中的年份筛选仍然生效。
+
+    Returns:
+        (WHERE子句, 参数) 或 (None, {})
+    """
+    if not min_year or not year_column:
+        return None, {}
+    column_types = {c['name']: c['type'] for c in inspect(engine).get_columns(table_name)}
+    col_type = column_types.get(year_column)
+    quoted = engine.dialect.identifier_preparer.quote(year_column)
+    if isinstance(col_type, (sqltypes.Integer, sqltypes.Numeric)):
+        return f"{quoted} >= :min_year", {'min_year': int(min_year)}
+    if isinstance(col_type, (sqltypes.Date, sqltypes.DateTime)):
+        return f"{quoted} >= :min_date", {'min_date': f"{int(min_year)}-01-01"}
+    return None, {}
+
+def stream_database_data(db_config, field_mapping, min_year=None, chunksize=50000):
+    """分块流式读取数据库（服务端游标），逐块产出 DataFrame
+
+    读整表时只 SELECT 字段映射中出现的列，并在年份列类型允许时把 min_year 下推到 WHERE。
+    """
+    print(f"\n[数据源] 从数据库流式读取数据（每块 {chunksize} 行）...")
+    all_possible_columns = [name for names in field_mapping.values() for name in names]
+    engine = create_db_engine(db_config)
+    quote = engine.dialect.identifier_preparer.quote
+    params = {}
+    
+    if 'sql' in db_config and db_config['sql']:
+        query = db_config['sql']
+        print(f"  执行SQL查询: {query[:100]}...")
+    elif 'table' in db_config and db_config['table']:
+        table_name = db_config['table']
+        table_columns = [c['name'] for c in inspect(engine).get_columns(table_name)]
+        columns_to_read = [col for col in table_columns if col in all_possible_columns] or table_columns
+        year_column = next((name for name in field_mapping.get('Publication Year', []) if name in table_columns), None)
+        where, params = _year_pushdown(engine, table_name, year_column, min_year)
+        
+        query = f"SELECT {', '.join(quote(c) for c in columns_to_read)} FROM {quote(table_name)}"
+        if where:
+            query += f" WHERE {where}"
+        print(f"  读取表: {table_name}（{len(columns_to_read)} 个列）")
+        print(f"  年份条件下推: {where if where else '否'}")
+    else:
+        raise ValueError("数据库配置中必须指定 'sql' 或 'table'")
+    
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(text(query), conn, params=params, chunksize=chunksize):
+            yield chunk
+
+def map_and_filter_columns(df, field_mapping, needed_columns, verbose=True):
     """映射列名并过滤不需要的列"""
     column_mapping = {}
     
-    print("\n[字段映射] 正在映射列名:")
+    if verbose:
+        print("\n[字段映射] 正在映射列名:")
     for target_col, possible_names in field_mapping.items():
         actual_col = find_actual_column(df, possible_names)
         if actual_col:
             column_mapping[actual_col] = target_col
-            print(f"  ✓ {actual_col} → {target_col}")
-        else:
+            if verbose:
+                print(f"  ✓ {actual_col} → {target_col}")
+        elif verbose:
             print(f"  ✗ 未找到: {target_col}")
     
     # 应用列名映射
@@ -299,11 +577,287 @@ def map_and_filter_columns(df, field_mapping, needed_columns):
     available_columns = [col for col in needed_columns if col in df.columns]
     df = df[available_columns]
     
-    print(f"\n[字段过滤] 最终保留 {len(df.columns)} 个列: {list(df.columns)}")
+    if verbose:
+        print(f"\n[字段过滤] 最终保留 {len(df.columns)} 个列: {list(df.columns)}")
     
     return df
 
-def run_clean(clean_config_path=None):
+def clean_frame(df, field_mapping, needed_columns, cleaning, verbose=True):
+    """对一批原始记录执行字段映射、会议论文去除、年份筛选与DOI提取
+
+    DOI提取放在筛选之后，只处理保留下来的记录。
+    """
+    drop_conference = cleaning.get('drop_conference', True)
+    min_year = cleaning.get('min_year')
+    
+    # 映射和过滤列
+    df = map_and_filter_columns(df, field_mapping, needed_columns, verbose=verbose)
+    
+    if verbose:
+        print(f"\n[清洗] 原始数据: {df.shape[0]}行")
+    
+    # 1. 去除会议论文
+    if 'Source Title' in df.columns:
+        # 来源名规范化同样只作用于去重后的取值
+        codes, uniques = pd.factorize(df['Source Title'])
+        normalized = np.array([normalize_source_title(t) for t in uniques] + [None], dtype=object)
+        df['Source Title'] = normalized[codes]
+    
+    if drop_conference and 'Source Title' in df.columns:
+        before_count = len(df)
+        filter_lists = cleaning.get('conference_filter') or {}
+        df = df[~conference_mask(df['Source Title'], filter_lists.get('allow') or (),
+                                 filter_lists.get('deny') or ())]
+        after_count = len(df)
+        removed = before_count - after_count
+        if removed > 0 and verbose:
+            print(f"[清洗] 去除会议论文: {before_count} → {after_count} (-{removed})")
+    
+    # 2. 年份筛选（只有当min_year不为None或空时才应用）
+    if min_year and 'Publication Year' in df.columns:
+        try:
+            df['Publication Year'] = pd.to_numeric(df['Publication Year'], errors='coerce')
+            before_count = len(df)
+            df = df[df['Publication Year'] >= min_year]
+            after_count = len(df)
+            removed = before_count - after_count
+            if verbose:
+                if removed > 0:
+                    print(f"[清洗] 年份筛选(≥{min_year}): {before_count} → {after_count} (-{removed})")
+                else:
+                    print(f"[清洗] 所有数据年份均≥{min_year}")
+        except Exception as e:
+            print(f"[警告] 年份筛选失败: {e}")
+    elif min_year is None and verbose:
+        print("[清洗] 未设置年份限制，跳过年份筛选")
+    
+    # 3. 生成citing列，并把论文DOI规范化为与引用一致的形式
+    if 'Cited References' in df.columns:
+        if verbose:
+            print("[清洗] 正在从参考文献中提取DOI...")
+        df['citing'] = extract_citing_column(df['Cited References'], workers=cleaning.get('doi_workers', 1))
+        if verbose:
+            total_dois = sum(len(dois) for dois in df['citing'])
+            print(f"[清洗] 成功提取 {total_dois} 个DOI引用")
+    else:
+        if verbose:
+            print("[警告] 未找到'Cited References'列，无法提取DOI")
+        df['citing'] = [[] for _ in range(len(df))]
+    if 'DOI' in df.columns:
+        df['DOI'] = df['DOI'].map(canonical_doi)
+    
+    return df
+
+# ============================================================================
+#  去重：按规范化DOI合并记录，无DOI时按 标题+年份+期刊 的哈希合并
+# ============================================================================
+def record_keys(df):
+    """每条记录的64位去重键
+
+    有DOI的记录以规范化DOI为键；无DOI但有标题的记录以 规范化标题|年份|期刊 为键；
+    两者都没有的记录不参与去重。标题等字段只对无DOI的记录做规范化。
+
+    Returns:
+        (uint64 键数组, 键类型数组：'doi' / 'meta' / '')
+    """
+    n = len(df)
+    kind = np.full(n, '', dtype=object)
+    key_text = np.full(n, '', dtype=object)
+    
+    if 'DOI' in df.columns:
+        doi = df['DOI'].astype('string').str.strip().str.lower()
+        prefixed = doi.str.startswith(('http', 'doi')).fillna(False)
+        if prefixed.any():
+            doi[prefixed] = doi[prefixed].str.replace(DOI_PREFIX_PATTERN, '', regex=True)
+        has_doi = (doi.notna() & (doi != '')).to_numpy(dtype=bool)
+        kind[has_doi] = 'doi'
+        key_text[has_doi] = ('doi:' + doi[has_doi]).to_numpy(dtype=object)
+    else:
+        has_doi = np.zeros(n, dtype=bool)
+    
+    if 'Article Title' in df.columns and not has_doi.all():
+        rest = df[~has_doi]
+        title = rest['Article Title'].astype('string').str.lower().str.replace(r'[^0-9a-z]+', '', regex=True)
+        year = parse_year(rest['Publication Year']).astype('string') if 'Publication Year' in rest.columns \
+            else pd.Series('', index=rest.index, dtype='string')
+        journal = rest['Source Title'].astype('string').str.upper().str.replace(r'\s+', ' ', regex=True).str.strip() \
+            if 'Source Title' in rest.columns else pd.Series('', index=rest.index, dtype='string')
+        meta = 'meta:' + title + '|' + year.fillna('') + '|' + journal.fillna('')
+        has_title = (title.notna() & (title != '')).to_numpy(dtype=bool)
+        positions = np.flatnonzero(~has_doi)[has_title]
+        kind[positions] = 'meta'
+        key_text[positions] = meta[has_title].to_numpy(dtype=object)
+    
+    return pd.util.hash_array(key_text), kind
+
+def deduplicate_records(df, verbose=True):
+    """合并重复记录：同一键的多条记录合并为一条（各列取组内第一个非空值），保持首次出现的顺序"""
+    keys, kind = record_keys(df)
+    candidate = kind != ''
+    dup = np.zeros(len(df), dtype=bool)
+    dup[candidate] = pd.Series(keys[candidate]).duplicated(keep=False).to_numpy()
+    if not dup.any():
+        if verbose:
+            print(f"[去重] 未发现重复记录（{len(df)}条）")
+        return df
+    
+    # 只对重复组做合并；空引用列表视为缺失，取组内第一个非空列表
+    group_rows = df[dup]
+    if 'citing' in group_rows.columns:
+        group_rows = group_rows.assign(citing=group_rows['citing'].map(lambda v: v if isinstance(v, list) and v else None))
+    merged = group_rows.groupby(keys[dup], sort=False).first()
+    if 'citing' in merged.columns:
+        merged['citing'] = merged['citing'].map(lambda v: v if isinstance(v, list) else [])
+    
+    # 合并后的记录放在组内首次出现的位置
+    dup_positions = np.flatnonzero(dup)
+    first_positions = dup_positions[~pd.Series(keys[dup]).duplicated().to_numpy()]
+    merged.index = first_positions
+    kept = df[~dup].set_axis(np.flatnonzero(~dup))
+    result = pd.concat([kept, merged[df.columns]]).sort_index().reset_index(drop=True)
+    
+    if verbose:
+        removed = len(df) - len(result)
+        by_doi = int(pd.Series(keys[kind == 'doi']).duplicated().sum())
+        print(f"[去重] 合并重复记录: {len(df)} → {len(result)} (-{removed})，"
+              f"其中DOI匹配 {by_doi}，标题/年份/期刊匹配 {removed - by_doi}")
+    return result
+
+class KeyIndex:
+    """跨数据块的去重键索引：有序 uint64 数组（每条记录8字节），用二分查找判断是否已出现"""
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
+
+    def add(self, keys):
+        """登记一批互不重复的键，返回其中此前未出现过的掩码"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        pos = np.searchsorted(self.keys, keys)
+        seen = np.zeros(len(keys), dtype=bool)
+        inside = pos < len(self.keys)
+        seen[inside] = self.keys[pos[inside]] == keys[inside]
+        new = ~seen
+        order = np.argsort(keys[new])
+        self.keys = np.insert(self.keys, pos[new][order], keys[new][order])
+        return new
+
+    def __len__(self):
+        return len(self.keys)
+
+def select_target_journals(journal_counts, target_journals, top_n):
+    """按指定列表或论文数 Top-N 确定目标期刊"""
+    if target_journals:
+        print(f"\n[期刊筛选] 使用指定期刊列表: {len(target_journals)} 种期刊")
+        return list(target_journals)
+    
+    print(f"\n[期刊筛选] 自动选取Top-{top_n}期刊:")
+    for i, (journal, count) in enumerate(journal_counts.head(top_n).items(), 1):
+        print(f"          {i:2d}. {journal}: {count}篇")
+    return journal_counts.head(top_n).index.tolist()
+
+def run_streaming_clean(db_config, field_mapping, needed_columns, cleaning, cleaned_dir, parquet=False):
+    """数据库流式清洗：逐块清洗并直接追加写入 all_data.csv，内存峰值只取决于块大小
+
+    目标期刊数据由第二遍分块扫描 all_data.csv 生成；parquet 为真时同时分块写出列式文件。
+    """
+    chunksize = int(db_config['chunksize'])
+    all_data_path = cleaned_dir / "all_data.csv"
+    target_data_path = cleaned_dir / "target_data.csv"
+    journal_counts = pd.Series(dtype='int64')
+    total_in = total_out = 0
+    all_parquet = ParquetAppender(columnar_path(all_data_path)) if parquet else None
+    dedup = cleaning.get('dedup', True)
+    key_index, merged = KeyIndex(), 0
+    
+    for i, chunk in enumerate(stream_database_data(db_config, field_mapping,
+                                                   cleaning.get('min_year'), chunksize)):
+        total_in += len(chunk)
+        chunk = clean_frame(chunk, field_mapping, needed_columns, cleaning, verbose=(i == 0))
+        if dedup:
+            # 块内合并重复记录，跨块丢弃此前块中已出现的记录（已写出的行无法再合并）
+            before = len(chunk)
+            chunk = deduplicate_records(chunk, verbose=False)
+            keys, kind = record_keys(chunk)
+            keep = kind == ''
+            keep[~keep] = key_index.add(keys[~keep])
+            chunk = chunk[keep]
+            merged += before - len(chunk)
+        total_out += len(chunk)
+        # 首块带表头与BOM，后续块追加
+        chunk.to_csv(all_data_path, index=False, mode='w' if i == 0 else 'a', header=(i == 0),
+                     encoding='utf-8-sig' if i == 0 else 'utf-8')
+        if all_parquet:
+            all_parquet.write(chunk)
+        if 'Source Title' in chunk.columns:
+            journal_counts = journal_counts.add(chunk['Source Title'].value_counts(), fill_value=0)
+        print(f"  [块 {i + 1}] 读取 {len(chunk)} 行已写出，累计 {total_out}/{total_in}")
+    
+    if all_parquet:
+        all_parquet.close()
+    print(f"\n[保存] 全量数据已保存: {all_data_path}")
+    print(f"      数据行数: {total_out}（读取 {total_in}）")
+    if dedup:
+        print(f"[去重] 合并重复记录 {merged} 条，键索引 {len(key_index)} 个")
+    
+    if total_out == 0 or journal_counts.empty:
+        print("\n[警告] 无法生成目标期刊数据")
+        return all_data_path, None
+    
+    journal_counts = journal_counts.astype('int64').sort_values(ascending=False, kind='stable')
+    journals = select_target_journals(journal_counts, cleaning.get('target_journals', []),
+                                      cleaning.get('top_n', 10))
+    target_rows = 0
+    target_parquet = ParquetAppender(columnar_path(target_data_path)) if parquet else None
+    for i, chunk in enumerate(pd.read_csv(all_data_path, chunksize=chunksize)):
+        chunk = chunk[chunk['Source Title'].isin(journals)]
+        chunk.to_csv(target_data_path, index=False, mode='w' if i == 0 else 'a', header=(i == 0),
+                     encoding='utf-8-sig' if i == 0 else 'utf-8')
+        if target_parquet:
+            target_parquet.write(chunk)
+        target_rows += len(chunk)
+    if target_parquet:
+        target_parquet.close()
+    print(f"          共找到 {target_rows} 条记录")
+    print(f"[保存] 目标期刊数据已保存: {target_data_path}")
+    return all_data_path, target_data_path
+
+def write_outputs(df, cleaned_dir, cleaning, write_columnar):
+    """写出全量数据与目标期刊数据（CSV，可选Parquet）"""
+    target_journals = cleaning.get('target_journals', [])
+    top_n = cleaning.get('top_n', 10)
+    
+    if cleaning.get('dedup', True):
+        df = deduplicate_records(df)
+    
+    # 保存全量数据
+    all_data_path = cleaned_dir / "all_data.csv"
+    flatten_list_columns(df).to_csv(all_data_path, index=False, encoding='utf-8-sig')
+    print(f"\n[保存] 全量数据已保存: {all_data_path}")
+    print(f"      数据形状: {df.shape}")
+    if write_columnar:
+        print(f"[保存] 列式数据已保存: {write_parquet(df, columnar_path(all_data_path))}")
+    print(f"      包含列: {list(df.columns)}")
+    
+    # 生成目标期刊数据
+    if 'Source Title' in df.columns and df.shape[0] > 0:
+        journals = select_target_journals(df['Source Title'].value_counts(), target_journals, top_n)
+        target_df = df[df['Source Title'].isin(journals)]
+        print(f"          共找到 {len(target_df)} 条记录")
+        
+        # 保存target_data.csv
+        target_data_path = cleaned_dir / "target_data.csv"
+        flatten_list_columns(target_df).to_csv(target_data_path, index=False, encoding='utf-8-sig')
+        print(f"[保存] 目标期刊数据已保存: {target_data_path}")
+        print(f"      数据形状: {target_df.shape}")
+        if write_columnar:
+            print(f"[保存] 列式数据已保存: {write_parquet(target_df, columnar_path(target_data_path))}")
+    else:
+        print("\n[警告] 无法生成目标期刊数据")
+        target_data_path = None
+    
+    return all_data_path, target_data_path
+
+def run_clean(clean_config_path=None, output_dir=None):
     """主清洗函数"""
     print("=" * 60)
     print("WOS数据清洗工具")
@@ -335,13 +889,19 @@ def run_clean(clean_config_path=None):
         else:
             print(f"  - 自动选取Top: {top_n}")
         
+        # 列式输出（Parquet）
+        write_columnar = clean_config.get('output', {}).get('parquet', True)
+        if write_columnar and not parquet_available():
+            print("[警告] 未安装 pyarrow，只输出CSV")
+            write_columnar = False
+        
         # 获取需要的列
         needed_columns = get_needed_columns_from_configs(clean_config, analysis_config)
         print(f"\n[字段需求] 需要字段: {needed_columns}")
         
         # 设置输出路径
         root_dir = Path(__file__).parent.parent
-        cleaned_dir = root_dir / "data" / "cleaned"
+        cleaned_dir = Path(output_dir) if output_dir else root_dir / "data" / "cleaned"
         cleaned_dir.mkdir(parents=True, exist_ok=True)
         
         # 根据数据源类型加载数据
@@ -350,92 +910,41 @@ def run_clean(clean_config_path=None):
             if not os.path.isabs(excel_dir):
                 excel_dir = str(root_dir / excel_dir)
             
-            df = load_excel_data(excel_dir, field_mapping)
+            workers = clean_config['data_source'].get('excel_workers')
+            if clean_config['data_source'].get('incremental') and write_columnar:
+                # 增量模式：分区已清洗，直接写出
+                df = run_incremental_clean(find_excel_files(excel_dir), field_mapping, needed_columns,
+                                           cleaning, cleaned_dir, workers)
+                all_data_path, target_data_path = write_outputs(df, cleaned_dir, cleaning, write_columnar)
+                print("\n" + "=" * 60)
+                print("清洗完成！")
+                print("=" * 60)
+                return all_data_path, target_data_path
+            if clean_config['data_source'].get('incremental'):
+                print("[警告] 增量模式需要 pyarrow 写分区，改为全量清洗")
+            df = load_excel_data(excel_dir, field_mapping, workers=workers)
             
         elif source_type.lower() == 'database':
             if 'database' not in clean_config['data_source']:
                 raise ValueError("数据库配置缺失，请检查clean_config.yaml")
             
             db_config = clean_config['data_source']['database']
+            if db_config.get('chunksize'):
+                # 流式模式：分块读取、清洗并直接写出
+                all_data_path, target_data_path = run_streaming_clean(
+                    db_config, field_mapping, needed_columns, cleaning, cleaned_dir, parquet=write_columnar)
+                print("\n" + "=" * 60)
+                print("清洗完成！")
+                print("=" * 60)
+                return all_data_path, target_data_path
             df = load_database_data(db_config, field_mapping)
             
         else:
             raise ValueError(f"不支持的数据源类型: {source_type}")
         
-        # 映射和过滤列
-        df = map_and_filter_columns(df, field_mapping, needed_columns)
+        df = clean_frame(df, field_mapping, needed_columns, cleaning)
         
-        print(f"\n[清洗] 原始数据: {df.shape[0]}行")
-        
-        # 1. 生成citing列
-        if 'Cited References' in df.columns:
-            print("[清洗] 正在从参考文献中提取DOI...")
-            df['citing'] = df['Cited References'].apply(extract_dois_from_references)
-            total_dois = df['citing'].apply(len).sum()
-            print(f"[清洗] 成功提取 {total_dois} 个DOI引用")
-        else:
-            print("[警告] 未找到'Cited References'列，无法提取DOI")
-            df['citing'] = [[] for _ in range(len(df))]
-        
-        # 2. 去除会议论文
-        if drop_conference and 'Source Title' in df.columns:
-            before_count = len(df)
-            df = df[~df['Source Title'].apply(is_conference)]
-            after_count = len(df)
-            removed = before_count - after_count
-            if removed > 0:
-                print(f"[清洗] 去除会议论文: {before_count} → {after_count} (-{removed})")
-        
-        # 3. 年份筛选（只有当min_year不为None或空时才应用）
-        if min_year and 'Publication Year' in df.columns:
-            try:
-                df['Publication Year'] = pd.to_numeric(df['Publication Year'], errors='coerce')
-                before_count = len(df)
-                df = df[df['Publication Year'] >= min_year]
-                after_count = len(df)
-                removed = before_count - after_count
-                if removed > 0:
-                    print(f"[清洗] 年份筛选(≥{min_year}): {before_count} → {after_count} (-{removed})")
-                else:
-                    print(f"[清洗] 所有数据年份均≥{min_year}")
-            except Exception as e:
-                print(f"[警告] 年份筛选失败: {e}")
-        elif min_year is None:
-            print("[清洗] 未设置年份限制，跳过年份筛选")
-        
-        # 保存全量数据
-        all_data_path = cleaned_dir / "all_data.csv"
-        df.to_csv(all_data_path, index=False, encoding='utf-8-sig')
-        print(f"\n[保存] 全量数据已保存: {all_data_path}")
-        print(f"      数据形状: {df.shape}")
-        print(f"      包含列: {list(df.columns)}")
-        
-        # 生成目标期刊数据
-        if 'Source Title' in df.columns and df.shape[0] > 0:
-            if target_journals:
-                # 使用指定期刊
-                target_df = df[df['Source Title'].isin(target_journals)]
-                print(f"\n[期刊筛选] 使用指定期刊列表: {len(target_journals)} 种期刊")
-            else:
-                # 自动取Top-N期刊
-                journal_counts = df['Source Title'].value_counts()
-                top_journals = journal_counts.head(top_n).index.tolist()
-                target_df = df[df['Source Title'].isin(top_journals)]
-                
-                print(f"\n[期刊筛选] 自动选取Top-{top_n}期刊:")
-                for i, (journal, count) in enumerate(journal_counts.head(top_n).items(), 1):
-                    print(f"          {i:2d}. {journal}: {count}篇")
-            
-            print(f"          共找到 {len(target_df)} 条记录")
-            
-            # 保存target_data.csv
-            target_data_path = cleaned_dir / "target_data.csv"
-            target_df.to_csv(target_data_path, index=False, encoding='utf-8-sig')
-            print(f"[保存] 目标期刊数据已保存: {target_data_path}")
-            print(f"      数据形状: {target_df.shape}")
-        else:
-            print("\n[警告] 无法生成目标期刊数据")
-            target_data_path = None
+        all_data_path, target_data_path = write_outputs(df, cleaned_dir, cleaning, write_columnar)
         
         print("\n" + "=" * 60)
         print("清洗完成！")